@@ -0,0 +1,69 @@
+import argparse
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Gerar de uma vez os relatorios do dia (carregamentos, oficinas, escala CD e folgas) em um zip."
+    )
+    parser.add_argument(
+        "--data",
+        help="Data (AAAA-MM-DD). Padrao: amanha.",
+    )
+    parser.add_argument(
+        "--fim",
+        help="Data final (AAAA-MM-DD) para gerar um periodo a partir de --data.",
+    )
+    parser.add_argument(
+        "--tipos",
+        nargs="+",
+        help="Relatorios a gerar (carregamentos, oficinas, escala_cd, folgas). Padrao: todos.",
+    )
+    parser.add_argument(
+        "--processos",
+        type=int,
+        help="Processos de desenho em paralelo. Padrao: um por CPU.",
+    )
+    parser.add_argument(
+        "--saida",
+        help="Arquivo zip de saida. Padrao: REPORTS_DIR/<nome do lote>.zip.",
+    )
+    args = parser.parse_args()
+
+    from web import db
+    from web.reports_batch import TIPOS_RELATORIO, gerar_relatorios_lote
+
+    inicio = args.data or (date.today() + timedelta(days=1)).isoformat()
+    db.ensure_schema()
+    try:
+        lote = gerar_relatorios_lote(inicio, args.fim, args.tipos or TIPOS_RELATORIO, args.processos)
+    except ValueError as exc:
+        print(exc)
+        return 1
+
+    if args.saida:
+        caminho = Path(args.saida)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        caminho.write_bytes(lote.arquivo.conteudo)
+    else:
+        caminho = lote.arquivo.salvar()
+
+    for tempo in lote.tempos:
+        print(
+            f"{tempo.data_iso}  {tempo.tipo:<14} coleta {tempo.coleta_ms:8.1f} ms  "
+            f"desenho {tempo.render_ms:8.1f} ms  {tempo.tamanho / 1024:8.1f} KB"
+            + ("  (cache)" if tempo.em_cache else "")
+        )
+    print(f"Coleta: {lote.coleta_ms:.1f} ms | Total: {lote.total_ms:.1f} ms")
+    print(f"Arquivo: {caminho}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,34 @@
+import argparse
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Criar/atualizar o schema do banco (rodar apos cada deploy)."
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Apenas compara a versao do banco com a do codigo, sem executar DDL.",
+    )
+    args = parser.parse_args()
+
+    from web import db
+
+    if args.check:
+        versao = db.read_schema_version()
+        print(f"Schema do banco: v{versao} | codigo: v{db.SCHEMA_VERSION}")
+        return 0 if versao >= db.SCHEMA_VERSION else 1
+
+    versao = db.ensure_schema(force=True)
+    print(f"Schema atualizado: v{versao}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,6 +2,7 @@ import argparse
 import os
 import sqlite3
 import sys
+from datetime import datetime
 from pathlib import Path
 from typing import Iterable, Sequence
 
@@ -55,6 +56,20 @@ def _fetch_table(conn: sqlite3.Connection, table: str) -> tuple[list[str], list[
     return cols, rows
 
 
+def _normalizar_datas(row: tuple, posicoes: list[int]) -> tuple:
+    # Colunas DATE no Postgres nao aceitam texto vazio nem dd/mm/aaaa.
+    valores = list(row)
+    for pos in posicoes:
+        texto = (valores[pos] or "").strip() if isinstance(valores[pos], str) else valores[pos]
+        if isinstance(texto, str) and "/" in texto:
+            try:
+                texto = datetime.strptime(texto, "%d/%m/%Y").strftime("%Y-%m-%d")
+            except ValueError:
+                pass
+        valores[pos] = texto or None
+    return tuple(valores)
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(
         description="Migrar dados SQLite para Neon/Postgres preservando IDs."
@@ -125,6 +140,9 @@ def main() -> int:
             if not rows:
                 print(f"{table}: 0 registros")
                 continue
+            datas = [pos for pos, col in enumerate(cols) if col in db.DATE_COLUMNS.get(table, ())]
+            if datas:
+                rows = [_normalizar_datas(row, datas) for row in rows]
 
             placeholders = ", ".join(["%s"] * len(cols))
             col_list = ", ".join(cols)
@@ -147,6 +165,13 @@ def main() -> int:
             )
         dest.commit()
 
+        # Bancos SQLite anteriores as colunas de viagem chegam com elas vazias.
+        from web.services import recalcular_viagens
+
+        total = recalcular_viagens(cur, "car.duracao_efetiva IS NULL")
+        dest.commit()
+        print(f"carregamentos: {total} viagens recalculadas")
+
     src.close()
     print("Migracao concluida.")
     return 0
@@ -0,0 +1,86 @@
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Executar as cargas principais das paginas com a instrumentacao SQL ligada e listar os contadores."
+    )
+    parser.add_argument(
+        "--data",
+        help="Data base (AAAA-MM-DD). Padrao: hoje.",
+    )
+    parser.add_argument(
+        "--dias",
+        type=int,
+        default=7,
+        help="Dias do periodo de disponibilidade a partir da data base.",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=15,
+        help="Quantidade de comandos SQL listados (pelo tempo total).",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Imprime os contadores completos em JSON.",
+    )
+    args = parser.parse_args()
+
+    from web import db, services as svc
+
+    data_base = svc.parse_date(args.data) if args.data else date.today()
+    if not data_base:
+        print(f"Data invalida: {args.data}")
+        return 1
+    data_iso = data_base.isoformat()
+    fim_iso = (data_base + timedelta(days=max(args.dias, 1) - 1)).isoformat()
+
+    db.ensure_schema()
+    db.set_query_metrics(True)
+    db.query_stats.reset()
+
+    svc.carregar_pacote_dia(data_iso)
+    svc.verificar_disponibilidade(data_iso)
+    svc.verificar_disponibilidade_periodo(data_iso, fim_iso)
+    svc.montar_matriz_disponibilidade(data_iso, fim_iso)
+    svc.consultar_log_carregamentos_pagina({"status": "Todos"})
+    svc.consultar_log_carregamentos_pagina({"status": "Em andamento"})
+
+    stats = db.query_stats.snapshot()
+    if args.json:
+        print(json.dumps(stats, indent=2, ensure_ascii=False))
+        return 0
+
+    acquire = stats["acquire"]
+    print(
+        f"Conexoes: {acquire['count']} | media {acquire['avg_ms']:.2f} ms | max {acquire['max_ms']:.2f} ms"
+    )
+    print(f"Lentas (>= {stats['threshold_ms']:.0f} ms): {stats['slow']}")
+    print()
+    print("Por funcao:")
+    for item in stats["callers"]:
+        print(
+            f"  {item['total_ms']:9.2f} ms  {item['count']:5d}x  {item['rows']:7d} linhas  {item['caller']}"
+        )
+    print()
+    print(f"Comandos (top {args.top}):")
+    for item in stats["statements"][: args.top]:
+        print(
+            f"  {item['total_ms']:9.2f} ms  {item['count']:5d}x  max {item['max_ms']:7.2f} ms  "
+            f"{item['caller']}  {item['statement'][:120]}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,56 @@
+import argparse
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Gerar carregamentos das rotas semanais para um periodo (ex: rodar no cron a noite)."
+    )
+    parser.add_argument(
+        "--inicio",
+        help="Data inicial (AAAA-MM-DD). Padrao: amanha.",
+    )
+    parser.add_argument(
+        "--fim",
+        help="Data final (AAAA-MM-DD). Padrao: inicio + --dias - 1.",
+    )
+    parser.add_argument(
+        "--dias",
+        type=int,
+        default=7,
+        help="Quantidade de dias quando --fim nao e informado.",
+    )
+    args = parser.parse_args()
+
+    from web import db, services as svc
+
+    inicio = args.inicio or (date.today() + timedelta(days=1)).isoformat()
+    fim = args.fim
+    if not fim:
+        data_inicio = svc.parse_date(inicio)
+        if not data_inicio:
+            print(f"Data inicial invalida: {inicio}")
+            return 1
+        fim = (data_inicio + timedelta(days=max(args.dias, 1) - 1)).isoformat()
+
+    db.ensure_schema()
+    try:
+        inseridos = svc.pre_gerar_carregamentos(inicio, fim)
+    except ValueError as exc:
+        print(exc)
+        return 1
+
+    for data_iso, total in inseridos.items():
+        print(f"{data_iso} ({svc.obter_dia_semana_por_data(data_iso)}): {total} inseridos")
+    print(f"Total: {sum(inseridos.values())} carregamentos")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
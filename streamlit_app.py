@@ -8,14 +8,18 @@ from pathlib import Path
 import streamlit as st
 
 from web import services as svc
-from web.db import LOGO_PATH, UPLOAD_DIR, init_db
+from web import services_async as svc_async
+from web.cache import cache_app
+from web import db
+from web.db import LOGO_PATH, UPLOAD_DIR, ensure_schema
 from web.reports import (
     _linha_relatorio_carregamento,
-    desenhar_relatorio_carregamentos,
-    exportar_log_para_excel,
-    gerar_relatorio_escala_cd,
-    gerar_relatorio_folgas,
-    gerar_relatorio_oficinas,
+    cache_relatorios,
+    renderizar_log_excel,
+    renderizar_relatorio_carregamentos,
+    renderizar_relatorio_escala_cd,
+    renderizar_relatorio_folgas,
+    renderizar_relatorio_oficinas,
 )
 
 
@@ -353,34 +357,65 @@ def _init_state() -> None:
     st.session_state.setdefault("colab_edit_id", None)
 
 
-@st.cache_data(ttl=10)
 def _cache_listar_carregamentos(data_iso: str) -> list[dict]:
-    return svc.listar_carregamentos(data_iso)
-
-
-@st.cache_data(ttl=30)
-def _cache_listar_colaboradores_por_funcao(funcao: str, data_iso: str | None = None) -> list[dict]:
-    return svc.listar_colaboradores_por_funcao(funcao, data_iso)
+    return cache_app.obter(
+        ("listar_carregamentos", data_iso),
+        lambda: svc.listar_carregamentos(data_iso),
+        [("carregamentos", data_iso), ("colaboradores", None)],
+        ttl=10,
+    )
 
 
-@st.cache_data(ttl=30)
-def _cache_listar_caminhoes_ativos() -> list[dict]:
-    return svc.listar_caminhoes_ativos()
+def _cache_pacote_dia(data_iso: str) -> svc.PacoteDia:
+    return cache_app.obter(
+        ("pacote_dia", data_iso),
+        lambda: svc.carregar_pacote_dia(data_iso),
+        [
+            ("carregamentos", data_iso),
+            ("colaboradores", None),
+            ("caminhoes", None),
+            ("disponibilidade", data_iso),
+        ],
+        ttl=10,
+    )
 
 
-@st.cache_data(ttl=10)
 def _cache_disponibilidade(data_iso: str, ignorar_items: tuple[tuple[str, int], ...]) -> dict:
     ignorar = dict(ignorar_items) if ignorar_items else None
-    return svc.verificar_disponibilidade(data_iso, ignorar)
+    return cache_app.obter(
+        ("verificar_disponibilidade", data_iso, ignorar_items),
+        lambda: svc.verificar_disponibilidade(data_iso, ignorar),
+        [("disponibilidade", data_iso)],
+        ttl=10,
+    )
+
+
+def _invalidar_disponibilidade(inicio: str | None = None, fim: str | None = None) -> None:
+    cache_app.invalidar("disponibilidade", inicio, fim)
+
 
+def _invalidar_disponibilidade_dias(*datas: str | None) -> None:
+    for data_iso in {d for d in datas if d}:
+        _invalidar_disponibilidade(data_iso, data_iso)
 
-def _clear_cached_data() -> None:
-    st.cache_data.clear()
+
+def _invalidar_carregamentos(*datas: str | None) -> None:
+    # Um carregamento bloqueia do registro em diante (viagem e ajustes), entao a
+    # disponibilidade e invalidada a partir da menor data afetada.
+    datas_validas = sorted(d for d in datas if d)
+    if not datas_validas:
+        cache_app.invalidar("carregamentos")
+        _invalidar_disponibilidade()
+        return
+    for data_iso in datas_validas:
+        cache_app.invalidar("carregamentos", data_iso, data_iso)
+    _invalidar_disponibilidade(datas_validas[0])
 
 
 def _assistentes_sidebar(data_iso: str) -> None:
+    pacote = _cache_pacote_dia(data_iso)
     with st.sidebar.expander("Rotas pendentes", expanded=False):
-        registros = _cache_listar_carregamentos(data_iso)
+        registros = pacote.carregamentos
         pendentes = []
         for item in registros:
             if item.get("revisado"):
@@ -402,8 +437,8 @@ def _assistentes_sidebar(data_iso: str) -> None:
                 st.write(f"- {item['label']}")
 
     with st.sidebar.expander("Disponíveis do dia", expanded=False):
-        motoristas = _cache_listar_colaboradores_por_funcao("Motorista", data_iso)
-        ajudantes = _cache_listar_colaboradores_por_funcao("Ajudante", data_iso)
+        motoristas = pacote.motoristas_disponiveis()
+        ajudantes = pacote.ajudantes_disponiveis()
         st.write("Motoristas")
         if motoristas:
             for item in sorted([m.get("nome") for m in motoristas if m.get("nome")]):
@@ -417,6 +452,33 @@ def _assistentes_sidebar(data_iso: str) -> None:
         else:
             st.write("Nenhum ajudante.")
 
+    with st.sidebar.expander("Cache", expanded=False):
+        stats = cache_app.estatisticas()
+        st.caption(
+            f"Itens: {stats['itens']} | Hits: {stats['hits']} | Misses: {stats['misses']} | "
+            f"Evictions: {stats['evictions']} | Invalidações: {stats['invalidacoes']}"
+        )
+        relatorios = cache_relatorios.estatisticas()
+        st.caption(
+            f"Relatórios: {relatorios['itens']} ({relatorios['bytes'] / 1024 / 1024:.1f} MB) | "
+            f"Hits: {relatorios['hits']} | Misses: {relatorios['misses']} | Evictions: {relatorios['evictions']}"
+        )
+
+    if db.QUERY_METRICS:
+        with st.sidebar.expander("Consultas SQL", expanded=False):
+            consultas = db.query_stats.snapshot()
+            acquire = consultas["acquire"]
+            st.caption(
+                f"Conexões: {acquire['count']} (média {acquire['avg_ms']:.1f} ms, máx {acquire['max_ms']:.1f} ms) | "
+                f"Lentas (≥ {consultas['threshold_ms']:.0f} ms): {consultas['slow']}"
+            )
+            for item in consultas["callers"][:10]:
+                nome = item["caller"].rsplit(".", 1)[-1]
+                st.caption(f"{nome}: {item['count']}x | {item['total_ms']:.1f} ms | máx {item['max_ms']:.1f} ms")
+            if st.button("Zerar contadores", key="sidebar_zerar_consultas"):
+                db.query_stats.reset()
+                st.rerun()
+
 
 def page_carregamentos() -> None:
     st.subheader("Carregamentos")
@@ -452,11 +514,12 @@ def page_carregamentos() -> None:
     st.session_state["carreg_data_iso"] = data_iso
     st.session_state["carreg_data_saida_iso"] = data_saida_iso
 
-    registros = _cache_listar_carregamentos(data_iso)
-    if not registros:
+    pacote = _cache_pacote_dia(data_iso)
+    if not pacote.carregamentos:
         svc.preencher_carregamentos_automaticos(data_iso, data_saida_iso)
-        _clear_cached_data()
-        registros = _cache_listar_carregamentos(data_iso)
+        _invalidar_carregamentos(data_iso)
+        pacote = _cache_pacote_dia(data_iso)
+    registros = pacote.carregamentos
 
     for item in registros:
         item["data_saida"] = svc.obter_data_saida_registro(item)
@@ -486,7 +549,7 @@ def page_carregamentos() -> None:
                     _set_flash("success", "Todas as rotas semanais ja estao carregadas.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao recarregar rotas semanais: {exc}")
-            _clear_cached_data()
+            _invalidar_carregamentos(data_iso)
             st.rerun()
     elif st.session_state.get("carreg_confirm_limpar"):
         if _confirm_prompt(
@@ -510,7 +573,7 @@ def page_carregamentos() -> None:
                 _set_flash("success", msg)
             except Exception as exc:
                 _set_flash("error", f"Erro ao limpar alterações: {exc}")
-            _clear_cached_data()
+            _invalidar_carregamentos(data_iso)
             st.rerun()
     elif st.session_state.get("carreg_confirm_dup") is not None:
         dup_id = st.session_state.get("carreg_confirm_dup")
@@ -523,21 +586,18 @@ def page_carregamentos() -> None:
             except Exception as exc:
                 _set_flash("error", f"Erro ao duplicar: {exc}")
             st.session_state["carreg_edit_id"] = None
-            _clear_cached_data()
+            _invalidar_carregamentos(data_iso)
             st.rerun()
     elif st.session_state.get("carreg_confirm_excluir") is not None:
         excluir_id = st.session_state.get("carreg_confirm_excluir")
         if _confirm_prompt("carreg_confirm_excluir", f"Excluir carregamento #{excluir_id}?"):
             try:
-                registro = svc.obter_carregamento(excluir_id)
-                if registro:
-                    svc.registrar_rota_suprimida(registro.get("data"), registro.get("rota"))
-                svc.remover_carregamento_completo(excluir_id)
+                svc.excluir_carregamento_completo(excluir_id)
                 _set_flash("success", "Carregamento excluído.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao excluir: {exc}")
             st.session_state["carreg_edit_id"] = None
-            _clear_cached_data()
+            _invalidar_carregamentos(data_iso)
             st.rerun()
 
     action_cols = st.columns([2, 2, 2])
@@ -555,17 +615,16 @@ def page_carregamentos() -> None:
                 valores, cor = _linha_relatorio_carregamento(item)
                 linhas.append(valores)
                 cores_obs.append(cor)
-            caminho = desenhar_relatorio_carregamentos(
+            relatorio = renderizar_relatorio_carregamentos(
                 data_iso, data_saida_iso, linhas, len(registros), cores_obs
             )
-            if caminho.exists():
-                st.download_button(
-                    "Baixar relatório",
-                    data=caminho.read_bytes(),
-                    file_name=caminho.name,
-                    mime="image/png",
-                    key="carreg_relatorio_download",
-                )
+            st.download_button(
+                "Baixar relatório",
+                data=relatorio.conteudo,
+                file_name=relatorio.nome_arquivo,
+                mime=relatorio.mime,
+                key="carreg_relatorio_download",
+            )
 
     st.markdown("### Carregamentos do dia")
     form_keys = [
@@ -636,7 +695,9 @@ def page_carregamentos() -> None:
     st.caption("PEND = pendente, OK = revisado")
 
     edit_id = st.session_state.get("carreg_edit_id")
-    edit_item = svc.obter_carregamento(edit_id) if edit_id else None
+    edit_item = pacote.carregamento(edit_id)
+    if edit_id and not edit_item:
+        st.session_state["carreg_edit_id"] = None
     edit_data = svc.parse_date(edit_item.get("data") or "") if edit_item else None
     base_data = svc.parse_date(data_iso)
     if edit_item and edit_data and base_data and edit_data != base_data:
@@ -656,11 +717,13 @@ def page_carregamentos() -> None:
         else:
             rota_num = rota_texto.strip()
 
-    ignorar = (("carregamento_id", edit_id),) if edit_id else ()
-    disponibilidade = _cache_disponibilidade(data_iso, ignorar)
+    if edit_item:
+        disponibilidade = _cache_disponibilidade(data_iso, (("carregamento_id", edit_item["id"]),))
+    else:
+        disponibilidade = pacote.disponibilidade
 
-    motoristas = _cache_listar_colaboradores_por_funcao("Motorista")
-    ajudantes_base = _cache_listar_colaboradores_por_funcao("Ajudante")
+    motoristas = pacote.motoristas
+    ajudantes_base = pacote.ajudantes
     ajudantes_ids = {a.get("id") for a in ajudantes_base}
     ajudantes = ajudantes_base + [
         {
@@ -675,7 +738,7 @@ def page_carregamentos() -> None:
     if not permitir_mot_aj:
         ajudantes = [a for a in ajudantes if not a.get("mot_aj")]
 
-    caminhoes = _cache_listar_caminhoes_ativos()
+    caminhoes = pacote.caminhoes
 
     def _filtrar_disponiveis(lista, indisponiveis, selecionado):
         resultado = []
@@ -819,8 +882,9 @@ def page_carregamentos() -> None:
             _set_flash("error", "Informe rota e destino.")
             st.rerun()
         rota_texto = f"{rota_num_valor.strip()} - {rota_destino_valor.strip()}"
-        ignorar = (("carregamento_id", edit_id),) if edit_id else ()
-        disponibilidade_submit = _cache_disponibilidade(form_data_iso, ignorar)
+        disponibilidade_submit = svc.verificar_disponibilidade(
+            form_data_iso, {"carregamento_id": edit_id} if edit_id else None, usar_indice=False
+        )
         indis = disponibilidade_submit.get("motoristas", set()).union(
             disponibilidade_submit.get("ajudantes", set())
         )
@@ -834,47 +898,22 @@ def page_carregamentos() -> None:
             _set_flash("error", "Caminhão indisponível nesta data.")
             st.rerun()
         try:
-            if edit_item:
-                registro_anterior = svc.obter_carregamento(edit_item["id"])
-                svc.atualizar_carregamento(
-                    edit_item["id"],
-                    form_data_iso,
-                    form_data_saida,
-                    rota_texto,
-                    placa_valor,
-                    motorista_id,
-                    ajudante_id,
-                    observacao_valor,
-                    obs_extra,
-                    observacao_cor,
-                )
-                if registro_anterior and registro_anterior.get("rota") != rota_texto:
-                    svc.registrar_rota_suprimida(registro_anterior.get("data"), registro_anterior.get("rota"))
-                svc.remover_bloqueios_por_carregamento(edit_item["id"])
-                svc.criar_bloqueios_para_carregamento(
-                    edit_item["id"], form_data_iso, [motorista_id, ajudante_id], observacao_valor
-                )
-                _set_flash("success", "Carregamento atualizado.")
-            else:
-                novo_id = svc.salvar_carregamento(
-                    form_data_iso,
-                    rota_texto,
-                    placa_valor,
-                    motorista_id,
-                    ajudante_id,
-                    observacao_valor,
-                    obs_extra,
-                    observacao_cor,
-                    form_data_saida,
-                    revisado=True,
-                )
-                svc.criar_bloqueios_para_carregamento(
-                    novo_id, form_data_iso, [motorista_id, ajudante_id], observacao_valor
-                )
-                _set_flash("success", "Carregamento salvo.")
+            svc.salvar_carregamento_completo(
+                edit_item["id"] if edit_item else None,
+                form_data_iso,
+                rota_texto,
+                placa_valor,
+                motorista_id,
+                ajudante_id,
+                observacao_valor,
+                obs_extra,
+                observacao_cor,
+                form_data_saida,
+            )
+            _set_flash("success", "Carregamento atualizado." if edit_item else "Carregamento salvo.")
         except Exception as exc:
             _set_flash("error", f"Erro ao salvar: {exc}")
-        _clear_cached_data()
+        _invalidar_carregamentos(data_iso, form_data_iso)
         st.session_state["carreg_edit_id"] = None
         st.rerun()
 
@@ -956,32 +995,35 @@ def page_oficinas() -> None:
         st.session_state["oficina_edit_id"] = None
     st.session_state["oficina_data_iso"] = data_iso
 
-    registros = svc.listar_oficinas(data_iso)
-    disponibilidade = svc.verificar_disponibilidade(
-        data_iso,
-        {"oficina_id": st.session_state.get("oficina_edit_id")} if st.session_state.get("oficina_edit_id") else None,
+    pagina = db.run_async(
+        svc_async.carregar_pagina_oficinas(
+            data_iso,
+            {"oficina_id": st.session_state.get("oficina_edit_id")} if st.session_state.get("oficina_edit_id") else None,
+        )
     )
-    motoristas = svc.listar_colaboradores_por_funcao("Motorista")
-    caminhoes = svc.listar_caminhoes_ativos()
+    registros = pagina["registros"]
+    disponibilidade = pagina["disponibilidade"]
+    motoristas = pagina["motoristas"]
+    caminhoes = pagina["caminhoes"]
 
     if st.button("Gerar relatório", key="oficina_relatorio"):
         data_ref = data_saida_iso or data_iso
         reg_saida = svc.listar_oficinas_por_data_saida(data_ref)
-        caminho = gerar_relatorio_oficinas(data_iso, data_saida_iso, reg_saida)
-        if caminho.exists():
-            st.download_button(
-                "Baixar relatório",
-                data=caminho.read_bytes(),
-                file_name=caminho.name,
-                mime="image/png",
-                key="oficina_relatorio_download",
-            )
+        relatorio = renderizar_relatorio_oficinas(data_iso, data_saida_iso, reg_saida)
+        st.download_button(
+            "Baixar relatório",
+            data=relatorio.conteudo,
+            file_name=relatorio.nome_arquivo,
+            mime=relatorio.mime,
+            key="oficina_relatorio_download",
+        )
 
     if st.session_state.get("oficina_confirm_excluir") is not None:
         excluir_id = st.session_state.get("oficina_confirm_excluir")
         if _confirm_prompt("oficina_confirm_excluir", f"Excluir oficina #{excluir_id}?"):
             try:
                 svc.excluir_oficina(excluir_id)
+                _invalidar_disponibilidade()
                 _set_flash("success", "Oficina excluída.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao excluir: {exc}")
@@ -1108,6 +1150,7 @@ def page_oficinas() -> None:
                     form_saida,
                     cor_map.get(observacao_cor),
                 )
+                _invalidar_disponibilidade_dias(edit_item.get("data"), form_data)
                 _set_flash("success", "Oficina atualizada.")
             else:
                 svc.salvar_oficina(
@@ -1119,6 +1162,7 @@ def page_oficinas() -> None:
                     form_saida,
                     cor_map.get(observacao_cor),
                 )
+                _invalidar_disponibilidade_dias(form_data)
                 _set_flash("success", "Oficina salva.")
         except Exception as exc:
             _set_flash("error", f"Erro ao salvar: {exc}")
@@ -1177,21 +1221,21 @@ def page_folgas() -> None:
     if st.button("Gerar relatório", key="folga_relatorio"):
         data_ref = data_saida_iso or data_iso
         reg_saida = svc.listar_folgas_por_data_saida(data_ref)
-        caminho = gerar_relatorio_folgas(data_iso, data_saida_iso, reg_saida)
-        if caminho.exists():
-            st.download_button(
-                "Baixar relatório",
-                data=caminho.read_bytes(),
-                file_name=caminho.name,
-                mime="image/png",
-                key="folga_relatorio_download",
-            )
+        relatorio = renderizar_relatorio_folgas(data_iso, data_saida_iso, reg_saida)
+        st.download_button(
+            "Baixar relatório",
+            data=relatorio.conteudo,
+            file_name=relatorio.nome_arquivo,
+            mime=relatorio.mime,
+            key="folga_relatorio_download",
+        )
 
     if st.session_state.get("folga_confirm_excluir") is not None:
         excluir_id = st.session_state.get("folga_confirm_excluir")
         if _confirm_prompt("folga_confirm_excluir", f"Excluir folga #{excluir_id}?"):
             try:
                 svc.remover_folga(excluir_id)
+                _invalidar_disponibilidade()
                 _set_flash("success", "Folga excluída.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao excluir: {exc}")
@@ -1263,6 +1307,7 @@ def page_folgas() -> None:
                     None,
                     None,
                 )
+                _invalidar_disponibilidade_dias(edit_item.get("data"), form_data)
                 _set_flash("success", "Folga atualizada.")
             else:
                 svc.salvar_folga(
@@ -1274,6 +1319,7 @@ def page_folgas() -> None:
                     None,
                     None,
                 )
+                _invalidar_disponibilidade_dias(form_data)
                 _set_flash("success", "Folga salva.")
         except Exception as exc:
             _set_flash("error", f"Erro ao salvar: {exc}")
@@ -1352,21 +1398,21 @@ def page_escala_cd() -> None:
     ]
 
     if st.button("Gerar relatório", key="escala_relatorio"):
-        caminho = gerar_relatorio_escala_cd(data_iso, data_saida_iso, registros)
-        if caminho.exists():
-            st.download_button(
-                "Baixar relatório",
-                data=caminho.read_bytes(),
-                file_name=caminho.name,
-                mime="image/png",
-                key="escala_relatorio_download",
-            )
+        relatorio = renderizar_relatorio_escala_cd(data_iso, data_saida_iso, registros)
+        st.download_button(
+            "Baixar relatório",
+            data=relatorio.conteudo,
+            file_name=relatorio.nome_arquivo,
+            mime=relatorio.mime,
+            key="escala_relatorio_download",
+        )
 
     if st.session_state.get("escala_confirm_excluir") is not None:
         excluir_id = st.session_state.get("escala_confirm_excluir")
         if _confirm_prompt("escala_confirm_excluir", f"Excluir escala #{excluir_id}?"):
             try:
                 svc.excluir_escala_cd(excluir_id)
+                _invalidar_disponibilidade()
                 _set_flash("success", "Escala (CD) excluída.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao excluir: {exc}")
@@ -1450,7 +1496,7 @@ def page_escala_cd() -> None:
 
     if submit:
         disponibilidade_submit = svc.verificar_disponibilidade(
-            form_data, {"escala_cd_id": edit_id} if edit_id else None
+            form_data, {"escala_cd_id": edit_id} if edit_id else None, usar_indice=False
         )
         indis = disponibilidade_submit.get("motoristas", set()).union(
             disponibilidade_submit.get("ajudantes", set())
@@ -1464,9 +1510,11 @@ def page_escala_cd() -> None:
         try:
             if edit_item:
                 svc.editar_escala_cd(edit_id, motorista_id, ajudante_id, observacao)
+                _invalidar_disponibilidade_dias(edit_item.get("data"), form_data)
                 _set_flash("success", "Escala (CD) atualizada.")
             else:
                 svc.adicionar_escala_cd(form_data, motorista_id, ajudante_id, observacao)
+                _invalidar_disponibilidade_dias(form_data)
                 _set_flash("success", "Escala (CD) salva.")
         except Exception as exc:
             _set_flash("error", f"Erro ao salvar: {exc}")
@@ -1670,9 +1718,11 @@ def page_caminhoes() -> None:
         try:
             if edit_item:
                 svc.editar_caminhao(edit_id, placa, modelo, observacao, ativo)
+                cache_app.invalidar("caminhoes")
                 _set_flash("success", "Caminhão atualizado.")
             else:
                 svc.add_caminhao(placa, modelo, observacao)
+                cache_app.invalidar("caminhoes")
                 _set_flash("success", "Caminhão salvo.")
         except Exception as exc:
             _set_flash("error", f"Erro ao salvar: {exc}")
@@ -1684,6 +1734,7 @@ def page_caminhoes() -> None:
         if _confirm_prompt("caminhao_confirm_excluir", f"Excluir caminhão #{excluir_id}?"):
             try:
                 svc.remover_caminhao(excluir_id)
+                cache_app.invalidar("caminhoes")
                 _set_flash("success", "Caminhão excluído.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao excluir: {exc}")
@@ -1796,7 +1847,7 @@ def page_ferias() -> None:
             _set_flash("error", "Informe colaborador e período.")
             st.rerun()
         disponibilidade_submit = svc.verificar_disponibilidade(
-            data_inicio, {"ferias_id": edit_id} if edit_id else None
+            data_inicio, {"ferias_id": edit_id} if edit_id else None, usar_indice=False
         )
         indis = disponibilidade_submit.get("motoristas", set()).union(
             disponibilidade_submit.get("ajudantes", set())
@@ -1807,9 +1858,14 @@ def page_ferias() -> None:
         try:
             if edit_item:
                 svc.atualizar_ferias(edit_id, colaborador_id, data_inicio, data_fim, observacao or None)
+                _invalidar_disponibilidade(
+                    min(data_inicio, edit_item.get("data_inicio") or data_inicio),
+                    max(data_fim, edit_item.get("data_fim") or data_fim),
+                )
                 _set_flash("success", "Férias atualizadas.")
             else:
                 svc.adicionar_ferias(colaborador_id, data_inicio, data_fim, observacao or None)
+                _invalidar_disponibilidade(data_inicio, data_fim)
                 _set_flash("success", "Férias salvas.")
         except Exception as exc:
             _set_flash("error", f"Erro ao salvar: {exc}")
@@ -1821,6 +1877,7 @@ def page_ferias() -> None:
         if _confirm_prompt("ferias_confirm_excluir", f"Excluir férias #{excluir_id}?"):
             try:
                 svc.remover_ferias(excluir_id)
+                _invalidar_disponibilidade()
                 _set_flash("success", "Férias excluídas.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao excluir: {exc}")
@@ -1910,9 +1967,11 @@ def page_colaboradores() -> None:
                 svc.atualizar_colaborador(
                     edit_id, nome, funcao, observacao, edit_item.get("foto"), ativo
                 )
+                cache_app.invalidar("colaboradores")
                 _set_flash("success", "Colaborador atualizado.")
             else:
                 svc.add_colaborador(nome, funcao, observacao, None)
+                cache_app.invalidar("colaboradores")
                 _set_flash("success", "Colaborador salvo.")
         except Exception as exc:
             _set_flash("error", f"Erro ao salvar: {exc}")
@@ -1924,6 +1983,7 @@ def page_colaboradores() -> None:
         if _confirm_prompt("colab_confirm_desativar", f"Desativar colaborador #{desativar_id}?"):
             try:
                 svc.desativar_colaborador(desativar_id)
+                cache_app.invalidar("colaboradores")
                 _set_flash("success", "Colaborador desativado.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao desativar: {exc}")
@@ -1938,6 +1998,8 @@ def page_colaboradores() -> None:
         ):
             try:
                 foto_path = svc.excluir_colaborador(excluir_id)
+                cache_app.invalidar("colaboradores")
+                _invalidar_carregamentos()
                 if foto_path:
                     try:
                         (UPLOAD_DIR / foto_path).unlink()
@@ -2036,7 +2098,14 @@ def page_log() -> None:
         "placa": placa,
     }
 
-    registros = svc.consultar_log_carregamentos(filtros)
+    # Paginacao por keyset: guarda o cursor de inicio de cada pagina ja visitada.
+    filtros_chave = tuple(sorted(filtros.items()))
+    if st.session_state.get("log_filtros") != filtros_chave:
+        st.session_state["log_filtros"] = filtros_chave
+        st.session_state["log_cursores"] = [None]
+    cursores = st.session_state["log_cursores"]
+    pagina = svc.consultar_log_carregamentos_pagina(filtros, cursores[-1])
+    registros = pagina["registros"]
 
     if st.session_state.get("log_confirm_liberar") is not None:
         liberar_id = st.session_state.get("log_confirm_liberar")
@@ -2046,17 +2115,13 @@ def page_log() -> None:
                 if not registro:
                     _set_flash("error", "Carregamento não encontrado.")
                     st.rerun()
-                observacao_padrao = (registro.get("observacao") or "0").strip()
-                duracao_planejada = svc.OBSERVACAO_DURACAO.get(observacao_padrao, 0)
-                ajustes_map = svc.listar_ajustes_por_carregamentos([liberar_id])
-                ajustes = ajustes_map.get(liberar_id, [])
-                duracao_atual = ajustes[-1]["duracao_nova"] if ajustes else duracao_planejada
+                duracao_atual = registro.get("duracao_efetiva") or 0
                 svc.registrar_ajuste_rota(liberar_id, duracao_atual, 0, "Liberado agora")
-                data_inicio_iso = svc.obter_data_saida_registro(registro)
-                inicio_dt = svc.parse_date(data_inicio_iso) or date.today()
+                inicio_dt = svc.parse_date(registro.get("data_inicio_viagem")) or date.today()
                 svc.atualizar_bloqueios_para_ajuste(
                     liberar_id, inicio_dt.isoformat(), liberar_imediato=True
                 )
+                _invalidar_carregamentos(registro.get("data"))
                 _set_flash("success", "Carregamento liberado.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao liberar: {exc}")
@@ -2066,26 +2131,36 @@ def page_log() -> None:
         if _confirm_prompt("log_confirm_excluir", f"Excluir carregamento #{excluir_id}?"):
             try:
                 svc.remover_carregamento_completo(excluir_id)
+                _invalidar_carregamentos()
                 _set_flash("success", "Carregamento excluído.")
             except Exception as exc:
                 _set_flash("error", f"Erro ao excluir: {exc}")
             st.rerun()
 
     if st.button("Exportar Excel", key="log_exportar"):
-        caminho = exportar_log_para_excel(registros)
-        if caminho.exists():
-            st.download_button(
-                "Baixar Excel",
-                data=caminho.read_bytes(),
-                file_name=caminho.name,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="log_exportar_download",
-            )
+        planilha = renderizar_log_excel(svc.consultar_log_carregamentos(filtros))
+        st.download_button(
+            "Baixar Excel",
+            data=planilha.conteudo,
+            file_name=planilha.nome_arquivo,
+            mime=planilha.mime,
+            key="log_exportar_download",
+        )
 
     if not registros:
         st.info("Nenhum registro encontrado para os filtros.")
         return
 
+    total_paginas = max(1, -(-pagina["total"] // svc.LOG_PAGINA_TAMANHO))
+    nav_cols = st.columns([2, 1, 1])
+    nav_cols[0].caption(f"{pagina['total']} registro(s) | Página {len(cursores)} de {total_paginas}")
+    if nav_cols[1].button("Anterior", key="log_pagina_anterior", disabled=len(cursores) <= 1):
+        cursores.pop()
+        st.rerun()
+    if nav_cols[2].button("Próxima", key="log_pagina_proxima", disabled=not pagina["proximo"]):
+        cursores.append(pagina["proximo"])
+        st.rerun()
+
     for item in registros:
         with st.container():
             st.markdown(f"**{item.get('data_br')}** - {item.get('rota')} - {item.get('placa')}")
@@ -2147,7 +2222,7 @@ def page_log() -> None:
                         st.rerun()
                     data_base_iso = svc.obter_data_saida_registro(registro)
                     disponibilidade = svc.verificar_disponibilidade(
-                        data_base_iso, {"carregamento_id": item["id"]}
+                        data_base_iso, {"carregamento_id": item["id"]}, usar_indice=False
                     )
                     indis = disponibilidade.get("motoristas", set()).union(
                         disponibilidade.get("ajudantes", set())
@@ -2159,26 +2234,8 @@ def page_log() -> None:
                         _set_flash("error", "Ajudante indisponível nesta data.")
                         st.rerun()
                     try:
-                        observacao = (registro.get("observacao") or "0").strip() or "0"
-                        svc.atualizar_carregamento(
-                            item["id"],
-                            registro.get("data") or date.today().isoformat(),
-                            registro.get("data_saida"),
-                            registro.get("rota") or "",
-                            registro.get("placa"),
-                            motorista_id,
-                            ajudante_id,
-                            observacao,
-                            registro.get("observacao_extra"),
-                            registro.get("observacao_cor"),
-                        )
-                        svc.remover_bloqueios_por_carregamento(item["id"])
-                        svc.criar_bloqueios_para_carregamento(
-                            item["id"],
-                            registro.get("data") or date.today().isoformat(),
-                            [motorista_id, ajudante_id],
-                            observacao,
-                        )
+                        svc.atualizar_colaboradores_carregamento(item["id"], motorista_id, ajudante_id)
+                        _invalidar_carregamentos(registro.get("data"))
                         _set_flash("success", "Colaboradores atualizados.")
                     except Exception as exc:
                         _set_flash("error", f"Erro ao atualizar colaboradores: {exc}")
@@ -2203,18 +2260,14 @@ def page_log() -> None:
                         if not registro:
                             _set_flash("error", "Carregamento não encontrado.")
                             st.rerun()
-                        observacao_padrao = (registro.get("observacao") or "0").strip()
-                        duracao_planejada = svc.OBSERVACAO_DURACAO.get(observacao_padrao, 0)
-                        ajustes_map = svc.listar_ajustes_por_carregamentos([item["id"]])
-                        ajustes = ajustes_map.get(item["id"], [])
-                        duracao_atual = ajustes[-1]["duracao_nova"] if ajustes else duracao_planejada
+                        duracao_atual = registro.get("duracao_efetiva") or 0
                         svc.registrar_ajuste_rota(item["id"], duracao_atual, int(duracao_nova), observacao)
-                        data_inicio_iso = svc.obter_data_saida_registro(registro)
-                        inicio_dt = svc.parse_date(data_inicio_iso) or date.today()
+                        inicio_dt = svc.parse_date(registro.get("data_inicio_viagem")) or date.today()
                         nova_data_fim = inicio_dt + timedelta(days=int(duracao_nova))
                         svc.atualizar_bloqueios_para_ajuste(
                             item["id"], nova_data_fim.isoformat(), False
                         )
+                        _invalidar_carregamentos(registro.get("data"))
                         _set_flash("success", "Ajuste registrado.")
                     except Exception as exc:
                         _set_flash("error", f"Erro ao registrar ajuste: {exc}")
@@ -2230,7 +2283,7 @@ def page_log() -> None:
 
 
 def main() -> None:
-    init_db()
+    ensure_schema()
     st.set_page_config(page_title="JR Escala", layout="wide")
     _init_state()
     _inject_css()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+import copy
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import Any
+
+# Etiqueta = (tabela, data_iso). data_iso None indica que a entrada depende da
+# tabela inteira, independente da data alterada.
+Etiqueta = tuple[str, str | None]
+
+
+class CacheEtiquetado:
+    def __init__(self, max_itens: int = 512) -> None:
+        self.max_itens = max_itens
+        self._lock = threading.Lock()
+        self._itens: OrderedDict[Hashable, tuple[Any, float, tuple[Etiqueta, ...]]] = OrderedDict()
+        self._por_tabela: dict[str, dict[str | None, set[Hashable]]] = {}
+        self._geracao = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidacoes = 0
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def obter(
+        self,
+        chave: Hashable,
+        carregar: Callable[[], Any],
+        etiquetas: Iterable[Etiqueta],
+        ttl: float,
+    ) -> Any:
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[1] > agora:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return copy.deepcopy(item[0])
+            if item is not None:
+                self._remover(chave)
+                self.evictions += 1
+            self.misses += 1
+            geracao = self._geracao
+
+        valor = carregar()
+
+        with self._lock:
+            # Uma invalidacao durante a carga torna o valor suspeito: devolve sem guardar.
+            if geracao == self._geracao:
+                if chave in self._itens:
+                    self._remover(chave)
+                etiquetas = tuple(etiquetas)
+                self._itens[chave] = (valor, time.monotonic() + ttl, etiquetas)
+                for tabela, data_iso in etiquetas:
+                    self._por_tabela.setdefault(tabela, {}).setdefault(data_iso, set()).add(chave)
+                while len(self._itens) > self.max_itens:
+                    self._remover(next(iter(self._itens)))
+                    self.evictions += 1
+        return copy.deepcopy(valor)
+
+    def invalidar(self, tabela: str, inicio: str | None = None, fim: str | None = None) -> int:
+        # Sem inicio: toda a tabela. Com inicio: datas em [inicio, fim] (fim None =
+        # sem limite) mais as entradas que dependem da tabela inteira.
+        with self._lock:
+            self._geracao += 1
+            por_data = self._por_tabela.get(tabela)
+            if not por_data:
+                return 0
+            chaves: set[Hashable] = set()
+            for data_iso, itens in por_data.items():
+                if (
+                    inicio is None
+                    or data_iso is None
+                    or (data_iso >= inicio and (fim is None or data_iso <= fim))
+                ):
+                    chaves.update(itens)
+            for chave in chaves:
+                self._remover(chave)
+            self.invalidacoes += len(chaves)
+            return len(chaves)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._geracao += 1
+            self.invalidacoes += len(self._itens)
+            self._itens.clear()
+            self._por_tabela.clear()
+
+    def estatisticas(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "itens": len(self._itens),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidacoes": self.invalidacoes,
+            }
+
+    def _remover(self, chave: Hashable) -> None:
+        item = self._itens.pop(chave, None)
+        if item is None:
+            return
+        for tabela, data_iso in item[2]:
+            por_data = self._por_tabela.get(tabela)
+            if not por_data:
+                continue
+            itens = por_data.get(data_iso)
+            if itens is None:
+                continue
+            itens.discard(chave)
+            if not itens:
+                del por_data[data_iso]
+            if not por_data:
+                del self._por_tabela[tabela]
+
+
+# Compartilhado por todas as sessoes do processo, como o st.cache_data.
+cache_app = CacheEtiquetado()
+
+
+def _serializar(valor: Any) -> Any:
+    if isinstance(valor, (set, frozenset)):
+        return sorted(valor, key=repr)
+    # Datas, Path, Decimal...: os relatorios desenham str(valor).
+    return str(valor)
+
+
+class CacheArquivos:
+    # Cache em disco enderecado pelo conteudo das entradas: a chave e o hash delas
+    # e o arquivo fica como "<chave>-<nome>". LRU pelo mtime (renovado a cada hit),
+    # limitado em bytes. Varios processos podem dividir a mesma pasta.
+    def __init__(self, pasta: Path, max_bytes: int) -> None:
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._itens: OrderedDict[str, tuple[Path, int]] | None = None
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def chave(*partes: Any) -> str:
+        texto = json.dumps(partes, sort_keys=True, default=_serializar, ensure_ascii=False)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def obter(self, chave: str) -> tuple[str, bytes] | None:
+        # (nome, conteudo) ou None.
+        with self._lock:
+            self._carregar_indice()
+            item = self._itens.get(chave) or self._procurar(chave)
+            if item is not None:
+                caminho = item[0]
+                try:
+                    conteudo = caminho.read_bytes()
+                    os.utime(caminho)
+                except OSError:
+                    self._esquecer(chave)
+                else:
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    return caminho.name[len(chave) + 1 :], conteudo
+            self.misses += 1
+            return None
+
+    def guardar(self, chave: str, nome: str, conteudo: bytes) -> Path:
+        with self._lock:
+            self._carregar_indice()
+            self.pasta.mkdir(parents=True, exist_ok=True)
+            caminho = self.pasta / f"{chave}-{nome}"
+            # Escrita atomica: outro processo nunca le um arquivo pela metade.
+            fd, temporario = tempfile.mkstemp(dir=self.pasta, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as arquivo:
+                    arquivo.write(conteudo)
+                os.replace(temporario, caminho)
+            except BaseException:
+                Path(temporario).unlink(missing_ok=True)
+                raise
+            self._esquecer(chave)
+            self._itens[chave] = (caminho, len(conteudo))
+            self._total += len(conteudo)
+            if self._total > self.max_bytes:
+                # Outros processos tambem gravam aqui: recontar antes de apagar.
+                self._itens = None
+                self._carregar_indice()
+                self._despejar(manter=chave)
+            return caminho
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._carregar_indice()
+            for chave in list(self._itens):
+                self._apagar(chave)
+
+    def estatisticas(self) -> dict[str, int]:
+        with self._lock:
+            self._carregar_indice()
+            return {
+                "itens": len(self._itens),
+                "bytes": self._total,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _carregar_indice(self) -> None:
+        if self._itens is not None:
+            return
+        encontrados = []
+        if self.pasta.is_dir():
+            for caminho in self.pasta.iterdir():
+                chave, separador, _ = caminho.name.partition("-")
+                if not separador or len(chave) != 64:
+                    continue
+                try:
+                    info = caminho.stat()
+                except OSError:
+                    continue
+                encontrados.append((info.st_mtime, chave, caminho, info.st_size))
+        encontrados.sort()
+        self._itens = OrderedDict((chave, (caminho, tamanho)) for _, chave, caminho, tamanho in encontrados)
+        self._total = sum(tamanho for _, tamanho in self._itens.values())
+
+    def _procurar(self, chave: str) -> tuple[Path, int] | None:
+        # Arquivo gravado por outro processo depois que o indice foi montado.
+        if not self.pasta.is_dir():
+            return None
+        for caminho in self.pasta.glob(f"{chave}-*"):
+            try:
+                tamanho = caminho.stat().st_size
+            except OSError:
+                continue
+            self._itens[chave] = (caminho, tamanho)
+            self._total += tamanho
+            return caminho, tamanho
+        return None
+
+    def _despejar(self, manter: str) -> None:
+        for chave in list(self._itens):
+            if self._total <= self.max_bytes:
+                break
+            if chave != manter:
+                self._apagar(chave)
+                self.evictions += 1
+
+    def _apagar(self, chave: str) -> None:
+        item = self._itens.get(chave)
+        if item is not None:
+            item[0].unlink(missing_ok=True)
+        self._esquecer(chave)
+
+    def _esquecer(self, chave: str) -> None:
+        item = self._itens.pop(chave, None)
+        if item is not None:
+            self._total -= item[1]
@@ -1,8 +1,19 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import logging
 import os
 import re
 import sqlite3
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 try:
@@ -14,9 +25,11 @@ except Exception:  # psycopg2 pode nao estar instalado localmente
 try:
     import psycopg
     from psycopg import rows as pg_rows
+    from psycopg.types.string import TextLoader
 except Exception:  # psycopg (v3) pode nao estar instalado localmente
     psycopg = None
     pg_rows = None
+    TextLoader = None
 
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -33,6 +46,23 @@ DATABASE_URL = (
 )
 USE_POSTGRES = bool(DATABASE_URL)
 
+POOL_MIN_SIZE = int(os.environ.get("JR_ESCALA_DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.environ.get("JR_ESCALA_DB_POOL_MAX", "5"))
+POOL_TIMEOUT = float(os.environ.get("JR_ESCALA_DB_POOL_TIMEOUT", "30"))
+POOL_IDLE_TIMEOUT = float(os.environ.get("JR_ESCALA_DB_POOL_IDLE_TIMEOUT", "240"))
+POOL_HEALTHCHECK_AFTER = float(os.environ.get("JR_ESCALA_DB_POOL_HEALTHCHECK", "30"))
+SCHEMA_RECHECK = os.environ.get("JR_ESCALA_SCHEMA_RECHECK", "").strip().lower() in ("1", "true", "yes")
+QUERY_METRICS = os.environ.get("JR_ESCALA_QUERY_METRICS", "").strip().lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.environ.get("JR_ESCALA_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.environ.get("JR_ESCALA_SLOW_QUERY_LOG", "").strip()
+# Poolers em modo transaction (PgBouncer < 1.21, ou com max_prepared_statements = 0)
+# nao mantem prepared statements entre transacoes: desligados por padrao quando a
+# URL aponta para um (endpoint "-pooler" do Neon, host pgbouncer ou porta 6432).
+_URL_POOLER = bool(DATABASE_URL) and bool(re.search(r"-pooler\.|pgbouncer|:6432\b", DATABASE_URL, re.IGNORECASE))
+PREPARED_STATEMENTS = os.environ.get(
+    "JR_ESCALA_PREPARED_STATEMENTS", "0" if _URL_POOLER else "1"
+).strip().lower() not in ("0", "false", "no")
+
 if USE_POSTGRES and psycopg2:
     DBError = psycopg2.Error
 elif USE_POSTGRES and psycopg:
@@ -46,34 +76,298 @@ def ensure_dirs() -> None:
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def _translate_query(query: str) -> str:
+# Instrumentacao opcional (JR_ESCALA_QUERY_METRICS): latencia, linhas e funcao
+# chamadora por comando, tempo de aquisicao de conexao e log de consultas lentas.
+# Desligada, cada comando paga so o teste do booleano.
+
+_slow_logger = logging.getLogger("jr_escala.slow_queries")
+_slow_logger_ready = False
+
+
+def _slow_log():
+    global _slow_logger_ready
+    if not _slow_logger_ready:
+        _slow_logger_ready = True
+        if SLOW_QUERY_LOG:
+            handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            _slow_logger.addHandler(handler)
+            _slow_logger.setLevel(logging.INFO)
+    return _slow_logger
+
+
+def _normalize_statement(query: str) -> str:
+    texto = " ".join(query.split())
+    # IN (?, ?, ...) e VALUES multi-linha variam com o tamanho do lote.
+    texto = re.sub(r"\?(?:\s*,\s*\?)+", "?, ...", texto)
+    texto = re.sub(r"(\([^()]*\))(?:\s*,\s*\([^()]*\))+", r"\1, ...", texto)
+    return texto[:300]
+
+
+def _calling_function() -> str:
+    # Primeira funcao publica dos modulos web.* fora daqui (ex.: services.verificar_disponibilidade);
+    # sem ela, o primeiro frame fora de db.
+    frame = sys._getframe(2)
+    primeiro = None
+    while frame is not None:
+        modulo = frame.f_globals.get("__name__", "")
+        if modulo != __name__ and not modulo.startswith(("contextlib", "psycopg", "sqlite3")):
+            nome = frame.f_code.co_name
+            if primeiro is None:
+                primeiro = f"{modulo}.{nome}"
+            if modulo.startswith("web.") and not nome.startswith("_"):
+                return f"{modulo}.{nome}"
+        frame = frame.f_back
+    return primeiro or "?"
+
+
+class QueryStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            # (funcao, comando) -> [execucoes, segundos, maximo, linhas]
+            self._statements: dict[tuple[str, str], list] = {}
+            self._acquire = [0, 0.0, 0.0]
+            self.slow = 0
+            self.since = time.time()
+
+    def record(self, query: str, elapsed: float, rows: int) -> list:
+        caller = _calling_function()
+        statement = query.name if isinstance(query, Statement) else _normalize_statement(query)
+        with self._lock:
+            entry = self._statements.get((caller, statement))
+            if entry is None:
+                entry = self._statements[(caller, statement)] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            if rows > 0:
+                entry[3] += rows
+            lenta = elapsed * 1000 >= SLOW_QUERY_MS
+            if lenta:
+                self.slow += 1
+        if lenta:
+            _slow_log().warning(
+                "%.1f ms | linhas=%s | %s | %s",
+                elapsed * 1000,
+                rows if rows >= 0 else "?",
+                caller,
+                statement,
+            )
+        return entry
+
+    def add_rows(self, entry: list, rows: int) -> None:
+        with self._lock:
+            entry[3] += rows
+
+    def record_acquire(self, elapsed: float) -> None:
+        with self._lock:
+            self._acquire[0] += 1
+            self._acquire[1] += elapsed
+            self._acquire[2] = max(self._acquire[2], elapsed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            itens = list(self._statements.items())
+            acquire = list(self._acquire)
+            slow = self.slow
+            since = self.since
+        statements = [
+            {
+                "caller": caller,
+                "statement": statement,
+                "count": count,
+                "total_ms": total * 1000,
+                "avg_ms": total * 1000 / count,
+                "max_ms": maximo * 1000,
+                "rows": rows,
+            }
+            for (caller, statement), (count, total, maximo, rows) in itens
+        ]
+        statements.sort(key=lambda item: item["total_ms"], reverse=True)
+        callers: dict[str, dict] = {}
+        for item in statements:
+            agregado = callers.setdefault(
+                item["caller"], {"caller": item["caller"], "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0}
+            )
+            agregado["count"] += item["count"]
+            agregado["total_ms"] += item["total_ms"]
+            agregado["max_ms"] = max(agregado["max_ms"], item["max_ms"])
+            agregado["rows"] += item["rows"]
+        return {
+            "enabled": QUERY_METRICS,
+            "since": since,
+            "threshold_ms": SLOW_QUERY_MS,
+            "slow": slow,
+            "acquire": {
+                "count": acquire[0],
+                "total_ms": acquire[1] * 1000,
+                "avg_ms": acquire[1] * 1000 / acquire[0] if acquire[0] else 0.0,
+                "max_ms": acquire[2] * 1000,
+            },
+            "callers": sorted(callers.values(), key=lambda item: item["total_ms"], reverse=True),
+            "statements": statements,
+        }
+
+
+query_stats = QueryStats()
+
+
+def set_query_metrics(enabled: bool) -> None:
+    global QUERY_METRICS
+    QUERY_METRICS = enabled
+
+
+@contextmanager
+def _timed_statement(cur, query: str):
+    if not QUERY_METRICS:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        query_stats.record(query, time.perf_counter() - inicio, getattr(cur, "rowcount", -1))
+
+
+class _TimedSqliteCursor(sqlite3.Cursor):
+    # No SQLite o rowcount de SELECT e -1: as linhas sao somadas conforme o fetch.
+    _entry = None
+
+    def execute(self, sql, parameters=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._entry = query_stats.record(sql, time.perf_counter() - inicio, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._entry = query_stats.record(sql, time.perf_counter() - inicio, self.rowcount)
+
+    def _count(self, rows: int) -> None:
+        if rows and self._entry is not None:
+            query_stats.add_rows(self._entry, rows)
+
+    def fetchone(self):
+        row = super().fetchone()
+        self._count(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._count(len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        self._count(1)
+        return row
+
+
+class _SqliteConnection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = _TimedSqliteCursor if QUERY_METRICS else sqlite3.Cursor
+        return super().cursor(factory)
+
+
+_INSERT_OR_IGNORE = re.compile(r"\bINSERT\s+OR\s+IGNORE\b", flags=re.IGNORECASE)
+_COLLATE_NOCASE = re.compile(r"COLLATE\s+NOCASE", flags=re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def _translate_text(query: str) -> str:
     if not USE_POSTGRES:
         return query
     texto = query
-    if re.search(r"\bINSERT\s+OR\s+IGNORE\b", texto, flags=re.IGNORECASE):
-        texto = re.sub(r"\bINSERT\s+OR\s+IGNORE\b", "INSERT", texto, flags=re.IGNORECASE)
+    if _INSERT_OR_IGNORE.search(texto):
+        texto = _INSERT_OR_IGNORE.sub("INSERT", texto)
         texto = texto.rstrip().rstrip(";")
         texto = f"{texto} ON CONFLICT DO NOTHING;"
-    texto = re.sub(r"COLLATE\s+NOCASE", "", texto, flags=re.IGNORECASE)
+    texto = _COLLATE_NOCASE.sub("", texto)
     texto = texto.replace("?", "%s")
     return texto
 
 
+class Statement(str):
+    # SQL declarado uma vez (no import do modulo que o usa) e ja traduzido para o
+    # dialeto ativo. Continua sendo str: funciona onde um texto SQL e aceito.
+    def __new__(cls, name: str, text: str):
+        obj = super().__new__(cls, text)
+        obj.name = name
+        obj.translated = _translate_text(str(obj))
+        return obj
+
+
+STATEMENTS: dict[str, Statement] = {}
+
+
+def statement(name: str, text: str) -> Statement:
+    registrado = STATEMENTS.get(name)
+    if registrado is not None:
+        if registrado != text:
+            raise ValueError(f"Comando SQL {name!r} ja registrado com outro texto.")
+        return registrado
+    STATEMENTS[name] = Statement(name, text)
+    return STATEMENTS[name]
+
+
+def _translate_query(query: str) -> str:
+    # Comandos registrados ja vem traduzidos; o texto livre passa pelo cache.
+    if isinstance(query, Statement):
+        return query.translated
+    if not USE_POSTGRES:
+        return query
+    return _translate_text(query)
+
+
+# Colunas de data: DATE no Postgres, texto ISO validado (AAAA-MM-DD) no SQLite.
+DATE_COLUMNS: dict[str, tuple[str, ...]] = {
+    "folgas": ("data", "data_fim", "data_saida"),
+    "ferias": ("data_inicio", "data_fim"),
+    "carregamentos": ("data", "data_saida", "data_inicio_viagem", "data_fim_viagem"),
+    "oficinas": ("data", "data_saida"),
+    "bloqueios": ("data_inicio", "data_fim"),
+    "rotas_suprimidas": ("data",),
+    "escala_cd": ("data",),
+}
+
+
 if psycopg2:
+    # DATE volta como texto ISO: services continua trabalhando com strings.
+    _DATE_AS_TEXT = psycopg2.extensions.new_type((1082,), "DATE_AS_TEXT", lambda valor, cur: valor)
+
+
     class QmarkCursor(psycopg2.extensions.cursor):
         def execute(self, query, vars=None):
-            return super().execute(_translate_query(query), vars)
+            with _timed_statement(self, query):
+                return super().execute(_translate_query(query), vars)
 
         def executemany(self, query, vars_list):
-            return super().executemany(_translate_query(query), vars_list)
+            with _timed_statement(self, query):
+                return super().executemany(_translate_query(query), vars_list)
 
 
     class QmarkDictCursor(psycopg2.extras.RealDictCursor):
         def execute(self, query, vars=None):
-            return super().execute(_translate_query(query), vars)
+            with _timed_statement(self, query):
+                return super().execute(_translate_query(query), vars)
 
         def executemany(self, query, vars_list):
-            return super().executemany(_translate_query(query), vars_list)
+            with _timed_statement(self, query):
+                return super().executemany(_translate_query(query), vars_list)
 
 
 class _PsycopgCursorWrapper:
@@ -81,10 +375,15 @@ class _PsycopgCursorWrapper:
         self._cur = cur
 
     def execute(self, query, vars=None):
-        return self._cur.execute(_translate_query(query), vars)
+        with _timed_statement(self._cur, query):
+            if PREPARED_STATEMENTS and isinstance(query, Statement):
+                # Prepara no servidor ja na primeira execucao e reaproveita o plano.
+                return self._cur.execute(query.translated, vars, prepare=True)
+            return self._cur.execute(_translate_query(query), vars)
 
     def executemany(self, query, vars_list):
-        return self._cur.executemany(_translate_query(query), vars_list)
+        with _timed_statement(self._cur, query):
+            return self._cur.executemany(_translate_query(query), vars_list)
 
     def __iter__(self):
         return iter(self._cur)
@@ -125,23 +424,602 @@ class _PsycopgConnWrapper:
         return getattr(self._conn, name)
 
 
+class _AsyncPsycopgCursorWrapper:
+    def __init__(self, cur):
+        self._cur = cur
+
+    async def execute(self, query, vars=None):
+        with _timed_statement(self._cur, query):
+            if PREPARED_STATEMENTS and isinstance(query, Statement):
+                return await self._cur.execute(query.translated, vars, prepare=True)
+            return await self._cur.execute(_translate_query(query), vars)
+
+    async def fetchall(self):
+        return await self._cur.fetchall()
+
+    async def fetchone(self):
+        return await self._cur.fetchone()
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class _AsyncPsycopgConnWrapper:
+    def __init__(self, conn, dict_rows: bool):
+        self._conn = conn
+        self._dict_rows = dict_rows
+
+    def cursor(self):
+        if self._dict_rows:
+            return _AsyncPsycopgCursorWrapper(self._conn.cursor(row_factory=pg_rows.dict_row))
+        return _AsyncPsycopgCursorWrapper(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        idle_timeout: float = POOL_IDLE_TIMEOUT,
+        healthcheck_after: float = POOL_HEALTHCHECK_AFTER,
+        on_exhausted=None,
+    ):
+        self._connect = connect
+        # Chamado (com o lock) antes de esperar por uma vaga: pede a quem guarda
+        # conexoes ociosas fora deste pool (pools assincronos) que as feche.
+        self._on_exhausted = on_exhausted
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.healthcheck_after = healthcheck_after
+        self._cond = threading.Condition()
+        self._idle: list[tuple[object, float]] = []
+        self._size = 0
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn, last_used = self._take(deadline)
+            if conn is None:
+                try:
+                    return self._connect()
+                except BaseException:
+                    self._forget()
+                    raise
+            idle_for = time.monotonic() - last_used
+            if idle_for < self.healthcheck_after or self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn, discard: bool = False) -> None:
+        if discard or self._closed or _is_closed(conn):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+    def reserve(self, blocking: bool = True) -> bool:
+        # Vaga para uma conexao aberta fora do pool (pool assincrono): conta em
+        # `size`, de modo que o limite max_size vale para o processo todo.
+        # Devolvida com unreserve() quando essa conexao fecha.
+        deadline = time.monotonic() + self.timeout
+        expired: list = []
+        avisado = False
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Pool de conexoes encerrado.")
+                    expired.extend(self._prune_locked())
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return True
+                    if self._idle:
+                        # A vaga da conexao ociosa passa para quem reservou.
+                        expired.append(self._idle.pop(0)[0])
+                        return True
+                    if not blocking:
+                        return False
+                    avisado = self._wait_locked(deadline, avisado)
+        finally:
+            for conn in expired:
+                _close_quietly(conn)
+
+    def unreserve(self) -> None:
+        self._forget()
+
+    def _take(self, deadline: float):
+        expired: list = []
+        avisado = False
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Pool de conexoes encerrado.")
+                    expired.extend(self._prune_locked())
+                    if self._idle:
+                        return self._idle.pop()
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None, 0.0
+                    avisado = self._wait_locked(deadline, avisado)
+        finally:
+            for conn in expired:
+                _close_quietly(conn)
+
+    def _wait_locked(self, deadline: float, avisado: bool) -> bool:
+        if not avisado and self._on_exhausted is not None:
+            self._on_exhausted()
+        restante = deadline - time.monotonic()
+        if restante <= 0:
+            raise RuntimeError("Tempo esgotado aguardando conexao do pool.")
+        self._cond.wait(restante)
+        return True
+
+    def _prune_locked(self) -> list:
+        # Fecha conexoes ociosas alem do minimo (o Neon derruba conexoes paradas).
+        agora = time.monotonic()
+        expired = []
+        mantidas = []
+        for conn, last_used in self._idle:
+            excedente = self._size - len(expired) > self.min_size
+            if excedente and agora - last_used >= self.idle_timeout:
+                expired.append(conn)
+            else:
+                mantidas.append((conn, last_used))
+        self._idle = mantidas
+        self._size -= len(expired)
+        return expired
+
+    def _is_healthy(self, conn) -> bool:
+        if _is_closed(conn):
+            return False
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, conn) -> None:
+        _close_quietly(conn)
+        self._forget()
+
+    def _forget(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+class AsyncConnectionPool:
+    # Equivalente assincrono do ConnectionPool, preso ao event loop que o criou.
+    # Com `limit`, cada conexao aberta ocupa uma vaga daquele pool sincrono: os
+    # dois juntos nao passam de JR_ESCALA_DB_POOL_MAX conexoes no banco.
+    def __init__(
+        self,
+        connect,
+        max_size: int = POOL_MAX_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        idle_timeout: float = POOL_IDLE_TIMEOUT,
+        healthcheck_after: float = POOL_HEALTHCHECK_AFTER,
+        limit: ConnectionPool | None = None,
+    ):
+        self._connect = connect
+        self._limit = limit
+        self._loop = asyncio.get_running_loop()
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.healthcheck_after = healthcheck_after
+        self._vagas = asyncio.Semaphore(self.max_size)
+        self._idle: list[tuple[object, float]] = []
+        self._closed = False
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def acquire(self):
+        if self._closed:
+            raise RuntimeError("Pool de conexoes encerrado.")
+        try:
+            await asyncio.wait_for(self._vagas.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError("Tempo esgotado aguardando conexao do pool.") from None
+        try:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                idle_for = time.monotonic() - last_used
+                if _is_closed(conn) or idle_for >= self.idle_timeout:
+                    await self._discard(conn)
+                    continue
+                if idle_for < self.healthcheck_after or await self._is_healthy(conn):
+                    return conn
+                await self._discard(conn)
+            await self._reserve()
+            try:
+                return await self._connect()
+            except BaseException:
+                self._unreserve()
+                raise
+        except BaseException:
+            self._vagas.release()
+            raise
+
+    async def release(self, conn, discard: bool = False) -> None:
+        try:
+            if discard or self._closed or _is_closed(conn):
+                await self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._vagas.release()
+
+    async def close(self) -> None:
+        self._closed = True
+        idle = [conn for conn, _ in self._idle]
+        self._idle.clear()
+        for conn in idle:
+            await self._discard(conn)
+
+    def shed_idle(self) -> None:
+        # Chamado de outras threads quando o pool sincrono fica sem vagas.
+        try:
+            self._loop.call_soon_threadsafe(self._shed_idle)
+        except RuntimeError:
+            pass
+
+    def _shed_idle(self) -> None:
+        idle = [conn for conn, _ in self._idle]
+        self._idle.clear()
+        for conn in idle:
+            self._loop.create_task(self._discard(conn))
+
+    async def _reserve(self) -> None:
+        if self._limit is None or self._limit.reserve(blocking=False):
+            return
+        await run_in_thread(self._limit.reserve)
+
+    def _unreserve(self) -> None:
+        if self._limit is not None:
+            self._limit.unreserve()
+
+    async def _discard(self, conn) -> None:
+        await _aclose_quietly(conn)
+        self._unreserve()
+
+    async def _is_healthy(self, conn) -> bool:
+        try:
+            cur = conn.cursor()
+            await cur.execute("SELECT 1")
+            await cur.fetchone()
+            await cur.close()
+            await conn.rollback()
+        except Exception:
+            return False
+        return True
+
+
+def _is_closed(conn) -> bool:
+    return bool(getattr(conn, "closed", False)) or bool(getattr(conn, "broken", False))
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+async def _aclose_quietly(conn) -> None:
+    try:
+        await conn.close()
+    except Exception:
+        pass
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+_sqlite_local = threading.local()
+_async_pools: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_async_loop: asyncio.AbstractEventLoop | None = None
+_async_loop_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_executor_conns: list[sqlite3.Connection] = []
+
+
+def _connect_postgres():
+    sslmode = os.environ.get("JR_ESCALA_DB_SSLMODE", "require")
+    if psycopg2 is not None:
+        conn = psycopg2.connect(DATABASE_URL, sslmode=sslmode, cursor_factory=QmarkCursor)
+        psycopg2.extensions.register_type(_DATE_AS_TEXT, conn)
+        return conn
+    if psycopg is not None:
+        conn = psycopg.connect(DATABASE_URL, sslmode=sslmode)
+        conn.adapters.register_loader("date", TextLoader)
+        if not PREPARED_STATEMENTS:
+            # Poolers sem suporte a prepared statements (PgBouncer antigo em modo transacao).
+            conn.prepare_threshold = None
+        return conn
+    raise RuntimeError("Driver PostgreSQL nao instalado (psycopg2/psycopg).")
+
+
+async def _connect_postgres_async():
+    sslmode = os.environ.get("JR_ESCALA_DB_SSLMODE", "require")
+    conn = await psycopg.AsyncConnection.connect(DATABASE_URL, sslmode=sslmode)
+    conn.adapters.register_loader("date", TextLoader)
+    if not PREPARED_STATEMENTS:
+        conn.prepare_threshold = None
+    return conn
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                ensure_dirs()
+                _pool = ConnectionPool(_connect_postgres, on_exhausted=_shed_async_pools)
+    return _pool
+
+
+def _shed_async_pools() -> None:
+    for pool in list(_async_pools.values()):
+        pool.shed_idle()
+
+
+def get_async_pool() -> AsyncConnectionPool:
+    # Um pool por event loop: conexoes assincronas nao podem trocar de loop.
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        ensure_dirs()
+        pool = _async_pools[loop] = AsyncConnectionPool(_connect_postgres_async, limit=get_pool())
+    return pool
+
+
+def _sqlite_connection() -> sqlite3.Connection:
+    conn = getattr(_sqlite_local, "conn", None)
+    if conn is None:
+        ensure_dirs()
+        # Threads do executor: a conexao e fechada por close_connections, em outra thread.
+        do_executor = getattr(_sqlite_local, "executor", False)
+        conn = sqlite3.connect(DB_PATH, factory=_SqliteConnection, check_same_thread=not do_executor)
+        conn.execute("PRAGMA foreign_keys = ON;")
+        _sqlite_local.conn = conn
+        _sqlite_local.depth = 0
+        if do_executor:
+            with _executor_lock:
+                _executor_conns.append(conn)
+    return conn
+
+
+def close_connections() -> None:
+    global _pool, _async_loop
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+    conn = getattr(_sqlite_local, "conn", None)
+    if conn is not None:
+        _sqlite_local.conn = None
+        _close_quietly(conn)
+    with _async_loop_lock:
+        loop, _async_loop = _async_loop, None
+    if loop is not None:
+        try:
+            asyncio.run_coroutine_threadsafe(_close_async_pools(), loop).result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+    _close_executor()
+
+
+def _close_executor() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    with _executor_lock:
+        conns = list(_executor_conns)
+        _executor_conns.clear()
+    for conn in conns:
+        _close_quietly(conn)
+
+
+async def _close_async_pools() -> None:
+    pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+atexit.register(close_connections)
+
+
+@contextmanager
 def get_connection(dict_rows: bool = False):
-    ensure_dirs()
     if USE_POSTGRES:
-        sslmode = os.environ.get("JR_ESCALA_DB_SSLMODE", "require")
-        if psycopg2 is not None:
-            cursor_factory = QmarkDictCursor if dict_rows else QmarkCursor
-            conn = psycopg2.connect(DATABASE_URL, sslmode=sslmode, cursor_factory=cursor_factory)
-            return conn
-        if psycopg is not None:
-            conn = psycopg.connect(DATABASE_URL, sslmode=sslmode)
-            return _PsycopgConnWrapper(conn, dict_rows)
-        raise RuntimeError("Driver PostgreSQL nao instalado (psycopg2/psycopg).")
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = ON;")
-    if dict_rows:
-        conn.row_factory = sqlite3.Row
-    return conn
+        pool = get_pool()
+        inicio = time.perf_counter()
+        conn = pool.acquire()
+        if QUERY_METRICS:
+            query_stats.record_acquire(time.perf_counter() - inicio)
+        descartar = False
+        try:
+            if psycopg2 is not None:
+                conn.cursor_factory = QmarkDictCursor if dict_rows else QmarkCursor
+                yield conn
+            else:
+                yield _PsycopgConnWrapper(conn, dict_rows)
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                descartar = True
+            raise
+        finally:
+            pool.release(conn, discard=descartar)
+        return
+
+    # SQLite: uma conexao persistente por thread, reentrante.
+    inicio = time.perf_counter()
+    conn = _sqlite_connection()
+    if QUERY_METRICS:
+        query_stats.record_acquire(time.perf_counter() - inicio)
+    row_factory_anterior = conn.row_factory
+    conn.row_factory = sqlite3.Row if dict_rows else None
+    externo = _sqlite_local.depth == 0
+    _sqlite_local.depth += 1
+    try:
+        yield conn
+        if externo:
+            conn.commit()
+    except BaseException:
+        if externo:
+            conn.rollback()
+        raise
+    finally:
+        _sqlite_local.depth -= 1
+        conn.row_factory = row_factory_anterior
+
+
+# Camada assincrona: PostgreSQL com psycopg 3 usa AsyncConnection; SQLite (ou
+# so psycopg2 instalado) roda as consultas em threads com a conexao sincrona.
+ASYNC_POSTGRES = USE_POSTGRES and psycopg is not None
+
+
+@asynccontextmanager
+async def get_async_connection(dict_rows: bool = False):
+    if not ASYNC_POSTGRES:
+        raise RuntimeError("Conexao assincrona requer PostgreSQL com psycopg 3.")
+    pool = get_async_pool()
+    inicio = time.perf_counter()
+    conn = await pool.acquire()
+    if QUERY_METRICS:
+        query_stats.record_acquire(time.perf_counter() - inicio)
+    descartar = False
+    try:
+        yield _AsyncPsycopgConnWrapper(conn, dict_rows)
+        await conn.commit()
+    except BaseException:
+        try:
+            await conn.rollback()
+        except Exception:
+            descartar = True
+        raise
+    finally:
+        await pool.release(conn, discard=descartar)
+
+
+def _fetch_all(query: str, params: tuple, dict_rows: bool) -> list:
+    with get_connection(dict_rows=dict_rows) as conn:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        rows = cur.fetchall()
+    return [dict(row) for row in rows] if dict_rows else [tuple(row) for row in rows]
+
+
+def _init_executor_thread() -> None:
+    _sqlite_local.executor = True
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=POOL_MAX_SIZE,
+                thread_name_prefix="jr-escala-db",
+                initializer=_init_executor_thread,
+            )
+        return _executor
+
+
+async def run_in_thread(func, *args):
+    # Codigo sincrono de banco chamado da camada assincrona. Executor proprio (e
+    # nao asyncio.to_thread) para que close_connections feche as conexoes
+    # SQLite por thread que ele abriu.
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+
+async def fetch_all_async(query: str, params: tuple = (), dict_rows: bool = False) -> list:
+    # Cada chamada usa a propria conexao: varias podem rodar juntas com asyncio.gather.
+    if not ASYNC_POSTGRES:
+        return await run_in_thread(_fetch_all, query, params, dict_rows)
+    async with get_async_connection(dict_rows=dict_rows) as conn:
+        cur = conn.cursor()
+        await cur.execute(query, params)
+        rows = await cur.fetchall()
+    return [dict(row) for row in rows] if dict_rows else [tuple(row) for row in rows]
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="jr-escala-async", daemon=True).start()
+            _async_loop = loop
+        return _async_loop
+
+
+def run_async(coro):
+    # Para codigo sincrono (Streamlit): executa no loop de fundo, onde o pool
+    # assincrono sobrevive entre chamadas.
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+@contextmanager
+def pipeline(conn):
+    # psycopg3: os comandos do bloco seguem juntos ate o sync na saida (um
+    # round-trip); erros aparecem no fim do bloco. psycopg2 e SQLite: execucao normal.
+    abrir = getattr(conn, "pipeline", None) if isinstance(conn, _PsycopgConnWrapper) else None
+    if abrir is None or not psycopg.Pipeline.is_supported():
+        yield
+        return
+    with abrir():
+        yield
+
+
+def lock_transaction(conn, key: int, subkey: int = 0) -> None:
+    # Serializa escritores concorrentes ate o fim da transacao corrente: advisory
+    # lock no Postgres; no SQLite, antecipa o lock de escrita (BEGIN IMMEDIATE).
+    if USE_POSTGRES:
+        conn.cursor().execute("SELECT pg_advisory_xact_lock(?, ?);", (key, subkey))
+    elif not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE;")
 
 
 def insert_and_get_id(cur, query: str, params: tuple) -> int | None:
@@ -158,6 +1036,230 @@ def insert_and_get_id(cur, query: str, params: tuple) -> int | None:
     return cur.lastrowid
 
 
+def _add_column(cur, table: str, column: str, definition: str) -> None:
+    if USE_POSTGRES:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition};")
+        return
+    cur.execute(f"PRAGMA table_info({table});")
+    if column not in {row[1] for row in cur.fetchall()}:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+
+
+def _add_travel_columns(cur) -> None:
+    _add_column(cur, "carregamentos", "duracao_efetiva", "INTEGER")
+    _add_column(cur, "carregamentos", "data_inicio_viagem", "TEXT")
+    _add_column(cur, "carregamentos", "data_fim_viagem", "TEXT")
+
+
+def _backfill_travel_columns(cur) -> None:
+    # As regras de saida e duracao ficam em services; import tardio evita ciclo.
+    from .services import recalcular_viagens
+
+    recalcular_viagens(cur)
+
+
+_DATA_ISO = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$")
+_DATA_LEGADA = re.compile(r"^[0-9]{2}/[0-9]{2}/[0-9]{4}$")
+_MAX_DATAS_INVALIDAS_LISTADAS = 50
+
+
+def _data_convertivel(valor: str) -> bool:
+    try:
+        if _DATA_ISO.match(valor):
+            datetime.strptime(valor, "%Y-%m-%d")
+        elif _DATA_LEGADA.match(valor):
+            datetime.strptime(valor, "%d/%m/%Y")
+        else:
+            return False
+    except ValueError:
+        return False
+    return True
+
+
+def _verificar_datas_convertiveis(cur, colunas: dict[str, dict[str, bool]]) -> None:
+    # Antes de converter: valores fora dos dois formatos, datas impossiveis
+    # (2024-02-30) e texto vazio em coluna NOT NULL param a migracao com a lista
+    # das linhas a corrigir, em vez de erro no ALTER ou dado trocado por NULL.
+    invalidas: list[str] = []
+    for table, obrigatorias in colunas.items():
+        for col, obrigatoria in obrigatorias.items():
+            cur.execute(f"SELECT id, {col} FROM {table} WHERE {col} IS NOT NULL;")
+            for registro_id, valor in cur.fetchall():
+                valor = str(valor).strip(" ")  # mesmo corte do TRIM do SQL
+                if (valor or obrigatoria) and not _data_convertivel(valor):
+                    invalidas.append(f"{table}.{col} id={registro_id}: {valor!r}")
+    if invalidas:
+        listadas = invalidas[:_MAX_DATAS_INVALIDAS_LISTADAS]
+        if len(invalidas) > len(listadas):
+            listadas.append(f"... e mais {len(invalidas) - len(listadas)}")
+        raise RuntimeError(
+            f"Migracao de datas interrompida: {len(invalidas)} valor(es) nao convertem para AAAA-MM-DD. "
+            "Corrija (ou limpe as colunas opcionais) e inicie de novo:\n" + "\n".join(listadas)
+        )
+
+
+def _convert_date_columns(cur) -> None:
+    # Datas dd/mm/aaaa legadas viram ISO; texto vazio em coluna opcional vira NULL.
+    if USE_POSTGRES:
+        texto: dict[str, dict[str, bool]] = {}
+        for table in DATE_COLUMNS:
+            cur.execute(
+                """
+                SELECT column_name, is_nullable FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = ? AND data_type = 'text';
+                """,
+                (table,),
+            )
+            texto[table] = {
+                row[0]: row[1] == "NO" for row in cur.fetchall() if row[0] in DATE_COLUMNS[table]
+            }
+        _verificar_datas_convertiveis(cur, texto)
+        for table, columns in DATE_COLUMNS.items():
+            # Depois da verificacao, so texto vazio (coluna opcional) cai fora do CASE.
+            alteracoes = [
+                f"ALTER COLUMN {col} TYPE DATE USING (CASE "
+                f"WHEN TRIM({col}) ~ '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}$' THEN CAST(TRIM({col}) AS DATE) "
+                f"WHEN TRIM({col}) ~ '^[0-9]{{2}}/[0-9]{{2}}/[0-9]{{4}}$' THEN TO_DATE(TRIM({col}), 'DD/MM/YYYY') "
+                "END)"
+                for col in columns
+                if col in texto[table]
+            ]
+            if alteracoes:
+                cur.execute(f"ALTER TABLE {table} {', '.join(alteracoes)};")
+        return
+
+    # SQLite nao acrescenta CHECK a tabela existente sem recria-la; os triggers
+    # aplicam a mesma regra (valor igual a date(valor)) em bancos novos e antigos.
+    colunas: dict[str, dict[str, bool]] = {}
+    for table, columns in DATE_COLUMNS.items():
+        cur.execute(f"PRAGMA table_info({table});")
+        notnull = {row[1]: bool(row[3]) for row in cur.fetchall()}
+        colunas[table] = {col: notnull[col] for col in columns if col in notnull}
+    _verificar_datas_convertiveis(cur, colunas)
+    for table, columns in DATE_COLUMNS.items():
+        obrigatorias = {col for col, obrigatoria in colunas[table].items() if obrigatoria}
+        for col in columns:
+            cur.execute(f"UPDATE {table} SET {col} = TRIM({col}) WHERE {col} <> TRIM({col});")
+            cur.execute(
+                f"""
+                UPDATE {table}
+                SET {col} = substr({col}, 7, 4) || '-' || substr({col}, 4, 2) || '-' || substr({col}, 1, 2)
+                WHERE {col} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+                """
+            )
+            if col not in obrigatorias:
+                cur.execute(f"UPDATE {table} SET {col} = NULL WHERE {col} = '';")
+        # INSERT confere todas as colunas; UPDATE, um trigger por coluna, so a
+        # que foi alterada.
+        gatilhos = [("datas_insert", "INSERT", " AND ".join(f"NEW.{col} IS date(NEW.{col})" for col in columns))]
+        gatilhos += [(f"{col}_update", f"UPDATE OF {col}", f"NEW.{col} IS date(NEW.{col})") for col in columns]
+        for nome, evento, condicao in gatilhos:
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{nome}
+                BEFORE {evento} ON {table}
+                WHEN NOT ({condicao})
+                BEGIN
+                    SELECT RAISE(ABORT, 'Data invalida em {table}: use AAAA-MM-DD.');
+                END;
+                """
+            )
+
+
+# Migracoes versionadas. Cada passo e um comando SQL valido em SQLite e
+# Postgres ou uma funcao que recebe o cursor. Nunca altere uma migracao ja
+# publicada: acrescente uma nova versao no fim da lista.
+MIGRATIONS: list[tuple[int, str, list]] = [
+    (
+        1,
+        "indices de acesso por data",
+        [
+            # carregamentos, folgas e oficinas ja tem indice por data via UNIQUE(data, ...).
+            "CREATE INDEX IF NOT EXISTS idx_escala_cd_data ON escala_cd (data);",
+            "CREATE INDEX IF NOT EXISTS idx_carregamentos_data_saida ON carregamentos (data_saida);",
+            "CREATE INDEX IF NOT EXISTS idx_folgas_saida_efetiva ON folgas ((COALESCE(data_saida, data)));",
+            "CREATE INDEX IF NOT EXISTS idx_oficinas_saida_efetiva ON oficinas ((COALESCE(data_saida, data)));",
+            "CREATE INDEX IF NOT EXISTS idx_ferias_periodo ON ferias (data_inicio, data_fim);",
+            "CREATE INDEX IF NOT EXISTS idx_bloqueios_periodo ON bloqueios (data_inicio, data_fim);",
+        ],
+    ),
+    (
+        2,
+        "indices de chaves estrangeiras",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_bloqueios_carregamento ON bloqueios (carregamento_id);",
+            "CREATE INDEX IF NOT EXISTS idx_bloqueios_colaborador ON bloqueios (colaborador_id);",
+            "CREATE INDEX IF NOT EXISTS idx_ajustes_rotas_carregamento ON ajustes_rotas (carregamento_id, id);",
+            "CREATE INDEX IF NOT EXISTS idx_ferias_colaborador ON ferias (colaborador_id);",
+            "CREATE INDEX IF NOT EXISTS idx_carregamentos_motorista ON carregamentos (motorista_id);",
+            "CREATE INDEX IF NOT EXISTS idx_carregamentos_ajudante ON carregamentos (ajudante_id);",
+            "CREATE INDEX IF NOT EXISTS idx_rotas_semanais_dia ON rotas_semanais (dia_semana);",
+        ],
+    ),
+    (
+        3,
+        "indice keyset do LOG",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_carregamentos_data_id ON carregamentos (data, id);",
+        ],
+    ),
+    (
+        4,
+        "colunas de viagem em carregamentos",
+        [
+            _add_travel_columns,
+            _backfill_travel_columns,
+            "CREATE INDEX IF NOT EXISTS idx_carregamentos_viagem ON carregamentos (data_fim_viagem, data_inicio_viagem);",
+        ],
+    ),
+    (
+        5,
+        "colunas de data nativas",
+        [
+            _convert_date_columns,
+        ],
+    ),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+_MIGRATION_LOCK_ID = 7301
+
+
+def get_schema_version(cur) -> int:
+    cur.execute("SELECT MAX(version) FROM schema_version;")
+    row = cur.fetchone()
+    return int(row[0] or 0) if row else 0
+
+
+def apply_migrations(cur) -> int:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        );
+        """
+    )
+    if USE_POSTGRES:
+        # Serializa migracoes de processos concorrentes ate o fim da transacao.
+        cur.execute("SELECT pg_advisory_xact_lock(?);", (_MIGRATION_LOCK_ID,))
+    atual = get_schema_version(cur)
+    for versao, nome, passos in MIGRATIONS:
+        if versao <= atual:
+            continue
+        for passo in passos:
+            if callable(passo):
+                passo(cur)
+            else:
+                cur.execute(passo)
+        cur.execute(
+            "INSERT OR IGNORE INTO schema_version (version, name, applied_at) VALUES (?, ?, ?);",
+            (versao, nome, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        atual = versao
+    return atual
+
+
 def init_db() -> None:
     ensure_dirs()
     if USE_POSTGRES:
@@ -305,6 +1407,7 @@ def init_db() -> None:
                 "ALTER TABLE carregamentos ADD COLUMN IF NOT EXISTS revisado INTEGER NOT NULL DEFAULT 0;"
             )
             cur.execute("ALTER TABLE folgas ADD COLUMN IF NOT EXISTS data_saida TEXT;")
+            apply_migrations(cur)
             conn.commit()
         return
 
@@ -465,4 +1568,36 @@ def init_db() -> None:
         colunas_folgas = {row[1] for row in cur.fetchall()}
         if "data_saida" not in colunas_folgas:
             cur.execute("ALTER TABLE folgas ADD COLUMN data_saida TEXT;")
+        apply_migrations(cur)
         conn.commit()
+
+
+_schema_lock = threading.Lock()
+_schema_cached: int | None = None
+
+
+def read_schema_version() -> int:
+    try:
+        with get_connection() as conn:
+            return get_schema_version(conn.cursor())
+    except DBError:
+        return 0
+
+
+def ensure_schema(force: bool = False) -> int:
+    # Executa o DDL no maximo uma vez por processo; depois so devolve a versao em cache.
+    # Pre-condicao dos services: as consultas de disponibilidade comparam datas ISO,
+    # o que so vale depois da migracao 5 (datas dd/mm/aaaa normalizadas).
+    global _schema_cached
+    if _schema_cached is not None and not force:
+        return _schema_cached
+    with _schema_lock:
+        if _schema_cached is not None and not force:
+            return _schema_cached
+        forcar = force or (_schema_cached is None and SCHEMA_RECHECK)
+        versao = 0 if forcar else read_schema_version()
+        if versao < SCHEMA_VERSION:
+            init_db()
+            versao = read_schema_version()
+        _schema_cached = versao
+    return versao
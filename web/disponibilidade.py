@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Hashable, Iterable, Sequence
+from datetime import date, timedelta
+import threading
+
+import numpy as np
+
+# Intervalos semiabertos [inicio, fim) em ordinais de data (date.toordinal()).
+# Cada intervalo pertence a uma chave (colaborador ou placa) e a uma etiqueta
+# que identifica o registro de origem, para remocao e para o "ignorar".
+
+Chave = Hashable
+Etiqueta = tuple[str, object]
+
+# Intervalos mais longos que isto (ferias de meses, data_fim digitada errada)
+# ficam numa lista a parte: na lista ordenada, a busca volta no maximo esse
+# tanto de dias antes do inicio consultado.
+MAX_DIAS_INTERVALO_CURTO = 62
+
+
+class _ListaIntervalos:
+    __slots__ = ("inicios", "itens", "maior", "longos")
+
+    def __init__(self) -> None:
+        self.inicios: list[int] = []
+        self.itens: list[tuple[int, int, Etiqueta]] = []
+        self.maior = 0
+        self.longos: list[tuple[int, int, Etiqueta]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.itens or self.longos)
+
+    def inserir(self, inicio: int, fim: int, etiqueta: Etiqueta) -> None:
+        if fim - inicio > MAX_DIAS_INTERVALO_CURTO:
+            self.longos.append((inicio, fim, etiqueta))
+            return
+        pos = bisect_right(self.inicios, inicio)
+        self.inicios.insert(pos, inicio)
+        self.itens.insert(pos, (inicio, fim, etiqueta))
+        self.maior = max(self.maior, fim - inicio)
+
+    def remover(self, inicio: int, etiqueta: Etiqueta) -> None:
+        for pos, item in enumerate(self.longos):
+            if item[0] == inicio and item[2] == etiqueta:
+                del self.longos[pos]
+                return
+        pos = bisect_left(self.inicios, inicio)
+        while pos < len(self.inicios) and self.inicios[pos] == inicio:
+            item = self.itens[pos]
+            if item[2] == etiqueta:
+                del self.inicios[pos]
+                del self.itens[pos]
+                if item[1] - item[0] >= self.maior:
+                    self.maior = max((fim - ini for ini, fim, _ in self.itens), default=0)
+                return
+            pos += 1
+
+    def sobrepostos(self, inicio: int, fim: int) -> Iterable[tuple[int, int, Etiqueta]]:
+        # Candidatos comecam antes de `fim` e no maximo `maior` dias antes de `inicio`.
+        pos = bisect_left(self.inicios, fim) - 1
+        limite = inicio - self.maior
+        while pos >= 0 and self.inicios[pos] >= limite:
+            item = self.itens[pos]
+            if item[1] > inicio:
+                yield item
+            pos -= 1
+        for item in self.longos:
+            if item[0] < fim and item[1] > inicio:
+                yield item
+
+
+class IndiceIntervalos:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._por_chave: dict[Chave, _ListaIntervalos] = {}
+        self._por_etiqueta: dict[Etiqueta, list[tuple[Chave, int, int]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(itens) for itens in self._por_etiqueta.values())
+
+    def __contains__(self, etiqueta: Etiqueta) -> bool:
+        return etiqueta in self._por_etiqueta
+
+    def chaves(self) -> list[Chave]:
+        with self._lock:
+            return list(self._por_chave)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._por_chave.clear()
+            self._por_etiqueta.clear()
+
+    def adicionar(self, etiqueta: Etiqueta, chave: Chave, inicio: int, fim: int) -> None:
+        if fim <= inicio:
+            return
+        with self._lock:
+            lista = self._por_chave.get(chave)
+            if lista is None:
+                lista = self._por_chave[chave] = _ListaIntervalos()
+            lista.inserir(inicio, fim, etiqueta)
+            self._por_etiqueta.setdefault(etiqueta, []).append((chave, inicio, fim))
+
+    def remover(self, etiqueta: Etiqueta) -> None:
+        with self._lock:
+            for chave, inicio, _ in self._por_etiqueta.pop(etiqueta, []):
+                lista = self._por_chave.get(chave)
+                if lista is None:
+                    continue
+                lista.remover(inicio, etiqueta)
+                if not lista:
+                    del self._por_chave[chave]
+
+    def substituir(self, etiqueta: Etiqueta, intervalos: Iterable[tuple[Chave, int, int]]) -> None:
+        with self._lock:
+            self.remover(etiqueta)
+            for chave, inicio, fim in intervalos:
+                self.adicionar(etiqueta, chave, inicio, fim)
+
+    def intervalos(
+        self,
+        chave: Chave,
+        inicio: int,
+        fim: int,
+        ignorar: set[Etiqueta] | None = None,
+    ) -> list[tuple[int, int, Etiqueta]]:
+        with self._lock:
+            lista = self._por_chave.get(chave)
+            if lista is None:
+                return []
+            encontrados = [
+                item for item in lista.sobrepostos(inicio, fim) if not ignorar or item[2] not in ignorar
+            ]
+        encontrados.sort()
+        return encontrados
+
+    def ocupado(
+        self,
+        chave: Chave,
+        inicio: int,
+        fim: int | None = None,
+        ignorar: set[Etiqueta] | None = None,
+    ) -> bool:
+        fim = inicio + 1 if fim is None else fim
+        with self._lock:
+            lista = self._por_chave.get(chave)
+            if lista is None:
+                return False
+            for item in lista.sobrepostos(inicio, fim):
+                if not ignorar or item[2] not in ignorar:
+                    return True
+        return False
+
+    def ocupacoes(
+        self,
+        inicio: int,
+        fim: int,
+        ignorar: set[Etiqueta] | None = None,
+    ) -> list[tuple[Chave, int, int]]:
+        encontrados: list[tuple[Chave, int, int]] = []
+        with self._lock:
+            for chave, lista in self._por_chave.items():
+                for item_inicio, item_fim, etiqueta in lista.sobrepostos(inicio, fim):
+                    if not ignorar or etiqueta not in ignorar:
+                        encontrados.append((chave, item_inicio, item_fim))
+        return encontrados
+
+    def chaves_ocupadas(
+        self,
+        inicio: int,
+        fim: int | None = None,
+        ignorar: set[Etiqueta] | None = None,
+    ) -> set[Chave]:
+        fim = inicio + 1 if fim is None else fim
+        ocupadas: set[Chave] = set()
+        with self._lock:
+            for chave, lista in self._por_chave.items():
+                for item in lista.sobrepostos(inicio, fim):
+                    if not ignorar or item[2] not in ignorar:
+                        ocupadas.add(chave)
+                        break
+        return ocupadas
+
+
+def pintar_ocupacao(
+    linhas: int,
+    dias: int,
+    linha_idx: Sequence[int],
+    inicios: Sequence[int],
+    fins: Sequence[int],
+) -> np.ndarray:
+    # Soma de diferencas: +1 no inicio e -1 no fim de cada intervalo (colunas
+    # relativas ao primeiro dia); a soma acumulada > 0 marca os dias ocupados.
+    ocupado = np.zeros((linhas, dias), dtype=bool)
+    if not len(linha_idx) or not linhas or not dias:
+        return ocupado
+    linha_arr = np.asarray(linha_idx, dtype=np.intp)
+    inicio_arr = np.clip(np.asarray(inicios, dtype=np.intp), 0, dias)
+    fim_arr = np.clip(np.asarray(fins, dtype=np.intp), 0, dias)
+    validos = fim_arr > inicio_arr
+    diferencas = np.zeros((linhas, dias + 1), dtype=np.int32)
+    np.add.at(diferencas, (linha_arr[validos], inicio_arr[validos]), 1)
+    np.add.at(diferencas, (linha_arr[validos], fim_arr[validos]), -1)
+    return np.cumsum(diferencas, axis=1)[:, :dias] > 0
+
+
+class MatrizDisponibilidade:
+    def __init__(self, inicio: date, chaves: Sequence[Chave], livre: np.ndarray) -> None:
+        self.inicio = inicio
+        self.chaves = list(chaves)
+        self.livre = livre
+        self._linhas = {chave: pos for pos, chave in enumerate(self.chaves)}
+
+    @property
+    def total_dias(self) -> int:
+        return int(self.livre.shape[1])
+
+    @property
+    def dias(self) -> list[str]:
+        return [(self.inicio + timedelta(days=pos)).isoformat() for pos in range(self.total_dias)]
+
+    def coluna(self, dia: date | str) -> int | None:
+        if isinstance(dia, str):
+            try:
+                dia = date.fromisoformat(dia)
+            except ValueError:
+                return None
+        pos = (dia - self.inicio).days
+        return pos if 0 <= pos < self.total_dias else None
+
+    def linha(self, chave: Chave) -> np.ndarray | None:
+        pos = self._linhas.get(chave)
+        return None if pos is None else self.livre[pos]
+
+    def dias_livres(self) -> dict[Chave, int]:
+        return dict(zip(self.chaves, self.livre.sum(axis=1).tolist()))
+
+    def primeiro_dia_livre(self, chave: Chave, a_partir: date | str | None = None) -> str | None:
+        linha = self.linha(chave)
+        inicio = 0 if a_partir is None else self.coluna(a_partir)
+        if linha is None or inicio is None:
+            return None
+        livres = np.flatnonzero(linha[inicio:])
+        if not livres.size:
+            return None
+        return (self.inicio + timedelta(days=inicio + int(livres[0]))).isoformat()
+
+    def livres_em_todos(self, dias: Iterable[date | str]) -> list[Chave]:
+        colunas = [self.coluna(dia) for dia in dias]
+        if any(col is None for col in colunas):
+            return []
+        if not colunas:
+            return list(self.chaves)
+        todos = self.livre[:, colunas].all(axis=1)
+        return [self.chaves[pos] for pos in np.flatnonzero(todos)]
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import date, datetime
+from functools import lru_cache
+import inspect
+import io
+import os
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Callable, Iterable
 
 from PIL import Image, ImageColor, ImageDraw, ImageFont
 from openpyxl import Workbook
 from openpyxl.styles import Font
 
+from .cache import CacheArquivos
 from .db import FONT_PATH, LOGO_PATH, REPORTS_DIR
 from .services import (
     COR_AZUL,
@@ -22,7 +28,93 @@ from .services import (
 )
 
 
+MIME_PNG = "image/png"
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Aumente ao mudar o desenho dos relatorios: invalida as imagens ja guardadas.
+VERSAO_MODELO_RELATORIO = 1
+REPORT_CACHE_MB = float(os.environ.get("JR_ESCALA_REPORT_CACHE_MB", "100"))
+
+cache_relatorios = CacheArquivos(REPORTS_DIR / "cache", int(REPORT_CACHE_MB * 1024 * 1024))
+
+
+@dataclass(frozen=True)
+class RelatorioGerado:
+    # Relatorio renderizado em memoria; salvar() grava em REPORTS_DIR quando um
+    # arquivo e necessario.
+    nome_arquivo: str
+    conteudo: bytes
+    mime: str
+
+    def abrir(self) -> io.BytesIO:
+        return io.BytesIO(self.conteudo)
+
+    def salvar(self, pasta: Path | None = None) -> Path:
+        pasta = pasta or REPORTS_DIR
+        pasta.mkdir(parents=True, exist_ok=True)
+        caminho = pasta / self.nome_arquivo
+        caminho.write_bytes(self.conteudo)
+        return caminho
+
+
+def _imagem_para_png(imagem: Image.Image, nome_arquivo: str) -> RelatorioGerado:
+    buffer = io.BytesIO()
+    imagem.save(buffer, format="PNG")
+    return RelatorioGerado(nome_arquivo, buffer.getvalue(), MIME_PNG)
+
+
+def _versao_recursos() -> tuple:
+    # Trocar a fonte ou o logo tambem muda a imagem gerada.
+    versoes: list[int | None] = []
+    for caminho in (FONT_PATH, LOGO_PATH):
+        try:
+            versoes.append(caminho.stat().st_mtime_ns)
+        except OSError:
+            versoes.append(None)
+    return (VERSAO_MODELO_RELATORIO, *versoes)
+
+
+def _chave_relatorio(tipo: str, parametros: dict[str, Any]) -> str:
+    return cache_relatorios.chave(tipo, _versao_recursos(), parametros)
+
+
+def _buscar_em_cache(chave: str) -> RelatorioGerado | None:
+    encontrado = cache_relatorios.obter(chave)
+    if encontrado is None:
+        return None
+    nome_arquivo, conteudo = encontrado
+    return RelatorioGerado(nome_arquivo, conteudo, MIME_PNG)
+
+
+def _relatorio_em_cache(tipo: str, parametros: dict[str, Any], desenhar: Callable[[], RelatorioGerado]) -> RelatorioGerado:
+    if cache_relatorios.max_bytes <= 0:
+        return desenhar()
+    chave = _chave_relatorio(tipo, parametros)
+    encontrado = _buscar_em_cache(chave)
+    if encontrado is not None:
+        return encontrado
+    relatorio = desenhar()
+    try:
+        cache_relatorios.guardar(chave, relatorio.nome_arquivo, relatorio.conteudo)
+    except OSError:
+        pass  # disco cheio/sem permissao: o relatorio sai do mesmo jeito
+    return relatorio
+
+
+def _argumentos(funcao: Callable, args: tuple, kwargs: dict) -> dict[str, Any]:
+    ligados = inspect.signature(funcao).bind(*args, **kwargs)
+    ligados.apply_defaults()
+    return dict(ligados.arguments)
+
+
 def carregar_fonte(tamanho: int, bold: bool = False) -> ImageFont.FreeTypeFont:
+    # Cache do processo: abrir a fonte variavel e aplicar o peso custa mais que desenhar
+    # o texto. A fonte devolvida e compartilhada; nao altere a variacao dela.
+    return _carregar_fonte(int(tamanho), bool(bold))
+
+
+@lru_cache(maxsize=64)
+def _carregar_fonte(tamanho: int, bold: bool) -> ImageFont.FreeTypeFont:
     # Use a single variable font with weight variation when available.
     try:
         fonte = ImageFont.truetype(str(FONT_PATH), tamanho)
@@ -43,17 +135,131 @@ def carregar_fonte(tamanho: int, bold: bool = False) -> ImageFont.FreeTypeFont:
 
 
 def criar_gradiente_horizontal(largura: int, altura: int, cor_inicio: str, cor_fim: str) -> Image.Image:
-    img = Image.new("RGB", (largura, altura), cor_inicio)
-    r1, g1, b1 = ImageColor.getrgb(cor_inicio)
-    r2, g2, b2 = ImageColor.getrgb(cor_fim)
-    draw = ImageDraw.Draw(img)
+    # Monta uma linha de pixels e estica na vertical (mesmas cores do desenho coluna a coluna).
+    r1, g1, b1 = ImageColor.getrgb(cor_inicio)[:3]
+    r2, g2, b2 = ImageColor.getrgb(cor_fim)[:3]
+    linha = bytearray()
     for x in range(largura):
         ratio = x / max(largura - 1, 1)
-        r = int(r1 + (r2 - r1) * ratio)
-        g = int(g1 + (g2 - g1) * ratio)
-        b = int(b1 + (b2 - b1) * ratio)
-        draw.line([(x, 0), (x, altura)], fill=(r, g, b))
-    return img
+        linha += bytes(
+            (
+                int(r1 + (r2 - r1) * ratio),
+                int(g1 + (g2 - g1) * ratio),
+                int(b1 + (b2 - b1) * ratio),
+            )
+        )
+    img = Image.frombytes("RGB", (largura, 1), bytes(linha))
+    return img.resize((largura, max(altura, 1)), Image.NEAREST)
+
+
+@lru_cache(maxsize=8)
+def _gradiente_cabecalho(largura: int, altura: int, cor_inicio: str, cor_fim: str) -> Image.Image:
+    # Compartilhado entre relatorios: so e usado como origem de paste.
+    return criar_gradiente_horizontal(largura, altura, cor_inicio, cor_fim)
+
+
+def carregar_logo(tamanho: int) -> Image.Image | None:
+    # Logo ja convertido e redimensionado; None sem arquivo (ou arquivo invalido).
+    try:
+        modificado = LOGO_PATH.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _carregar_logo(str(LOGO_PATH), modificado, tamanho)
+
+
+@lru_cache(maxsize=8)
+def _carregar_logo(caminho: str, modificado: int, tamanho: int) -> Image.Image | None:
+    try:
+        with Image.open(caminho) as logo_img:
+            return logo_img.convert("RGBA").resize((tamanho, tamanho))
+    except OSError:
+        return None
+
+
+def limpar_cache_recursos() -> None:
+    _carregar_fonte.cache_clear()
+    _gradiente_cabecalho.cache_clear()
+    _carregar_logo.cache_clear()
+    layout_texto.cache_clear()
+
+
+class LayoutTexto:
+    # Metricas (avanco, borda esquerda, borda direita) de glifos e palavras de uma
+    # fonte, medidas uma vez. As larguras somam: a linha "a b" mede
+    # avanco("a") + avanco(" ") + borda direita("b") - borda esquerda("a"), o mesmo
+    # que o textbbox da linha inteira.
+    MAX_PALAVRAS = 20000
+
+    def __init__(self, fonte: ImageFont.ImageFont) -> None:
+        self.fonte = fonte
+        self._draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+        # Com raqm ha kerning/ligaduras dentro da palavra: ai so a palavra inteira vale.
+        self._por_glifo = getattr(fonte, "layout_engine", None) == ImageFont.Layout.BASIC
+        self._glifos: dict[str, tuple[float, float, float]] = {}
+        self._palavras: dict[str, tuple[float, float, float]] = {}
+        self.espaco = self._medir(" ")[0]
+
+    def _medir(self, texto: str) -> tuple[float, float, float]:
+        bbox = self._draw.textbbox((0, 0), texto, font=self.fonte)
+        return self._draw.textlength(texto, font=self.fonte), bbox[0], bbox[2]
+
+    def _glifo(self, caractere: str) -> tuple[float, float, float]:
+        metricas = self._glifos.get(caractere)
+        if metricas is None:
+            metricas = self._glifos[caractere] = self._medir(caractere)
+        return metricas
+
+    def palavra(self, palavra: str) -> tuple[float, float, float]:
+        metricas = self._palavras.get(palavra)
+        if metricas is not None:
+            return metricas
+        if self._por_glifo:
+            avanco = 0.0
+            borda_esq = borda_dir = 0.0
+            for idx, caractere in enumerate(palavra):
+                glifo_avanco, glifo_esq, glifo_dir = self._glifo(caractere)
+                if idx == 0:
+                    borda_esq = glifo_esq
+                borda_dir = avanco + glifo_dir
+                avanco += glifo_avanco
+            metricas = (avanco, borda_esq, borda_dir)
+        else:
+            metricas = self._medir(palavra)
+        if len(self._palavras) >= self.MAX_PALAVRAS:
+            self._palavras.clear()
+        self._palavras[palavra] = metricas
+        return metricas
+
+    def largura(self, texto: str) -> float:
+        return sum(largura for _, largura in self.quebrar(texto, float("inf")))
+
+    def quebrar(self, texto: str, largura_max: float) -> list[tuple[str, float]]:
+        # Guloso, uma passada: cada linha sai com a largura (textbbox) ja calculada.
+        # Uma palavra maior que largura_max fica sozinha na linha, sem corte.
+        linhas: list[tuple[str, float]] = []
+        atual: list[str] = []
+        avanco = borda_esq = largura = 0.0
+        for palavra in texto.split():
+            p_avanco, p_esq, p_dir = self.palavra(palavra)
+            if atual:
+                tentativa = avanco + self.espaco + p_dir - borda_esq
+                if tentativa <= largura_max:
+                    atual.append(palavra)
+                    avanco += self.espaco + p_avanco
+                    largura = tentativa
+                    continue
+                linhas.append((" ".join(atual), largura))
+            atual = [palavra]
+            avanco, borda_esq, largura = p_avanco, p_esq, p_dir - p_esq
+        if atual:
+            linhas.append((" ".join(atual), largura))
+        return linhas
+
+
+@lru_cache(maxsize=64)
+def layout_texto(fonte: ImageFont.ImageFont) -> LayoutTexto:
+    # As fontes vem do cache de carregar_fonte, entao o layout acompanha a fonte.
+    return LayoutTexto(fonte)
 
 
 def medir_texto(draw: ImageDraw.ImageDraw, texto: str, fonte: ImageFont.ImageFont):
@@ -106,6 +312,10 @@ def desenhar_texto_cabecalho(
 
 
 def exportar_log_para_excel(registros: list[dict]) -> Path:
+    return renderizar_log_excel(registros).salvar()
+
+
+def renderizar_log_excel(registros: list[dict]) -> RelatorioGerado:
     wb = Workbook()
     ws = wb.active
     ws.title = "LOG"
@@ -140,14 +350,28 @@ def exportar_log_para_excel(registros: list[dict]) -> Path:
                 item.get("resumo"),
             ]
         )
-    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
     nome_arquivo = f"log_escala_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    caminho = REPORTS_DIR / nome_arquivo
-    wb.save(caminho)
-    return caminho
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return RelatorioGerado(nome_arquivo, buffer.getvalue(), MIME_XLSX)
 
 
-def exportar_relatorio_imagem(
+def exportar_relatorio_imagem(*args, **kwargs) -> Path:
+    # Mesmos parametros de _desenhar_relatorio_imagem.
+    return renderizar_relatorio_imagem(*args, **kwargs).salvar()
+
+
+def renderizar_relatorio_imagem(*args, **kwargs) -> RelatorioGerado:
+    # Mesmos parametros de _desenhar_relatorio_imagem; o cabecalho traz a data de hoje.
+    parametros = _argumentos(_desenhar_relatorio_imagem, args, kwargs)
+    return _relatorio_em_cache(
+        "imagem",
+        {**parametros, "gerado_em": date.today()},
+        lambda: _desenhar_relatorio_imagem(**parametros),
+    )
+
+
+def _desenhar_relatorio_imagem(
     aba_nome: str,
     titulo: str,
     colunas: list[str],
@@ -157,7 +381,7 @@ def exportar_relatorio_imagem(
     col_widths: list[float] | None = None,
     highlight_col: int | None = None,
     highlight_colors: list[str | None] | None = None,
-) -> Path:
+) -> RelatorioGerado:
     if not linhas:
         linhas = [[DISPLAY_VAZIO for _ in colunas]]
 
@@ -184,13 +408,9 @@ def exportar_relatorio_imagem(
 
     draw.rectangle([0, 0, largura, header_altura], fill=COR_AZUL)
     draw.rectangle([0, 0, 360, header_altura], fill=COR_VERMELHA)
-    if LOGO_PATH.exists():
-        try:
-            with Image.open(LOGO_PATH) as logo_img:
-                logo_rel = logo_img.convert("RGBA").resize((35, 35))
-            imagem.paste(logo_rel, (25, 15), logo_rel)
-        except OSError:
-            draw.text((50, 30), "JR", fill="white", font=font_logo)
+    logo_rel = carregar_logo(35)
+    if logo_rel is not None:
+        imagem.paste(logo_rel, (25, 15), logo_rel)
     else:
         draw.text((50, 30), "JR", fill="white", font=font_logo)
     draw.text((100, 15), titulo.upper(), fill="white", font=font_header)
@@ -212,23 +432,10 @@ def exportar_relatorio_imagem(
             draw.text((1000, offset), linha, fill="white", font=font_sub)
             offset += 15
 
+    layout_tabela = layout_texto(font_table)
+
     def quebrar_texto(texto: str, largura_max: float):
-        if not texto:
-            return [DISPLAY_VAZIO]
-        palavras = texto.split()
-        linhas_q = []
-        atual = ""
-        for palavra in palavras:
-            tentativa = (atual + " " + palavra).strip()
-            largura_t, _ = medir_texto(draw, tentativa, font_table)
-            if largura_t <= largura_max - 20:
-                atual = tentativa
-            else:
-                if atual:
-                    linhas_q.append(atual)
-                atual = palavra
-        if atual:
-            linhas_q.append(atual)
+        linhas_q = [linha_q for linha_q, _ in layout_tabela.quebrar(texto or "", largura_max - 20)]
         return linhas_q or [DISPLAY_VAZIO]
 
     y = tabela_top
@@ -296,14 +503,38 @@ def exportar_relatorio_imagem(
         font=font_sub,
     )
 
-    nome_arquivo = f"relatorio_JR_{aba_nome}_{data_referencia}.png"
-    caminho = REPORTS_DIR / nome_arquivo
-    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
-    imagem.save(caminho)
-    return caminho
+    return _imagem_para_png(imagem, f"relatorio_JR_{aba_nome}_{data_referencia}.png")
+
+
+def gerar_relatorio_moderno(*args, **kwargs) -> Path:
+    # Mesmos parametros de _desenhar_relatorio_moderno.
+    return renderizar_relatorio_moderno(*args, **kwargs).salvar()
+
+
+def renderizar_relatorio_moderno(*args, **kwargs) -> RelatorioGerado:
+    # Mesmos parametros de _desenhar_relatorio_moderno.
+    parametros, chave = _parametros_relatorio_moderno(args, kwargs)
+    return _relatorio_em_cache("moderno", chave, lambda: _desenhar_relatorio_moderno(**parametros))
+
+
+def _relatorio_moderno_em_cache(*args, **kwargs) -> RelatorioGerado | None:
+    # So consulta o cache (sem desenhar): o lote separa o que ainda falta gerar.
+    if cache_relatorios.max_bytes <= 0:
+        return None
+    _, chave = _parametros_relatorio_moderno(args, kwargs)
+    return _buscar_em_cache(_chave_relatorio("moderno", chave))
 
 
-def gerar_relatorio_moderno(
+def _parametros_relatorio_moderno(args: tuple, kwargs: dict) -> tuple[dict[str, Any], dict[str, Any]]:
+    # Sem datas, o nome do arquivo usa a data de hoje: entra na chave do cache.
+    parametros = _argumentos(_desenhar_relatorio_moderno, args, kwargs)
+    chave = dict(parametros)
+    if not (parametros["arquivo_data_iso"] or parametros["data_principal_iso"]):
+        chave["gerado_em"] = date.today()
+    return parametros, chave
+
+
+def _desenhar_relatorio_moderno(
     arquivo_stub: str,
     titulo_header: str,
     linha_principal_rotulo: str,
@@ -319,7 +550,7 @@ def gerar_relatorio_moderno(
     highlight_colors: list[str | None] | None = None,
     arquivo_data_iso: str | None = None,
     fallback_highlight: bool = True,
-) -> Path:
+) -> RelatorioGerado:
     if not linhas:
         linhas = [[DISPLAY_VAZIO for _ in colunas]]
 
@@ -343,34 +574,20 @@ def gerar_relatorio_moderno(
     font_footer = carregar_fonte(13, bold=True)
     line_height = getattr(font_table, "size", 13) + 6
 
-    dummy_draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    layout_tabela = layout_texto(font_table)
 
-    def quebrar_texto(texto: str | None, largura_coluna: int) -> list[str]:
+    def quebrar_texto(texto: str | None, largura_coluna: int) -> list[tuple[str, float]]:
+        # Linhas com a largura de cada uma, usada depois no alinhamento.
         if texto is None:
             conteudo = DISPLAY_VAZIO
         else:
             conteudo = str(texto)
         conteudo = conteudo.strip()
         if conteudo == "":
-            return [""]
-        palavras = conteudo.split()
-        linhas_resultado: list[str] = []
-        atual = ""
-        while palavras:
-            palavra = palavras.pop(0)
-            tentativa = (atual + " " + palavra).strip()
-            largura_t, _ = medir_texto(dummy_draw, tentativa, font_table)
-            if largura_t <= largura_coluna - 24:
-                atual = tentativa
-            else:
-                if atual:
-                    linhas_resultado.append(atual)
-                atual = palavra
-        if atual:
-            linhas_resultado.append(atual)
-        return linhas_resultado or [DISPLAY_VAZIO]
+            return [("", 0)]
+        return layout_tabela.quebrar(conteudo, largura_coluna - 24)
 
-    linhas_processadas: list[tuple[int, list[list[str]], str | None]] = []
+    linhas_processadas: list[tuple[int, list[list[tuple[str, float]]], str | None]] = []
     total_altura_tabela = table_header_altura
     for idx_linha, linha in enumerate(linhas):
         celulas = []
@@ -392,17 +609,13 @@ def gerar_relatorio_moderno(
 
     imagem = Image.new("RGB", (largura, altura), "#F1F3F6")
     draw = ImageDraw.Draw(imagem)
-    grad = criar_gradiente_horizontal(largura, header_altura, COR_AZUL, COR_AZUL_GRADIENTE_FIM)
+    grad = _gradiente_cabecalho(largura, header_altura, COR_AZUL, COR_AZUL_GRADIENTE_FIM)
     imagem.paste(grad, (0, 0))
 
     logo_pos = (margem, 35)
-    if LOGO_PATH.exists():
-        try:
-            with Image.open(LOGO_PATH) as logo_img:
-                logo_rel = logo_img.convert("RGBA").resize((80, 80))
-            imagem.paste(logo_rel, logo_pos, logo_rel)
-        except OSError:
-            draw.text((logo_pos[0], logo_pos[1] + 20), "JR", fill="#FFFFFF", font=font_titulo)
+    logo_rel = carregar_logo(80)
+    if logo_rel is not None:
+        imagem.paste(logo_rel, logo_pos, logo_rel)
     else:
         draw.text((logo_pos[0], logo_pos[1] + 20), "JR", fill="#FFFFFF", font=font_titulo)
 
@@ -465,7 +678,7 @@ def gerar_relatorio_moderno(
                 if cor_marcador:
                     cel_bg = cor_marcador
                 elif fallback_highlight:
-                    primeira_linha = (linhas_texto[0] or "").strip()
+                    primeira_linha = (linhas_texto[0][0] or "").strip()
                     if primeira_linha and primeira_linha not in ("0", DISPLAY_VAZIO):
                         cel_bg = "#FFF2B2"
             draw.rectangle([x, y, x + largura_coluna, y + altura_linha], fill=cel_bg)
@@ -480,9 +693,7 @@ def gerar_relatorio_moderno(
                     outline=borda_cor,
                 )
             text_y = y + 8
-            for linha_texto in linhas_texto:
-                texto = linha_texto
-                texto_w, _ = medir_texto(draw, texto, font_table)
+            for texto, texto_w in linhas_texto:
                 if col_idx in col_align_center:
                     texto_x = x + (largura_coluna - texto_w) / 2
                 else:
@@ -500,11 +711,7 @@ def gerar_relatorio_moderno(
     )
 
     arquivo_base = arquivo_data_iso or data_principal_iso or date.today().isoformat()
-    nome_arquivo = f"relatorio_JR_{arquivo_stub}_{arquivo_base}.png"
-    caminho = REPORTS_DIR / nome_arquivo
-    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
-    imagem.save(caminho)
-    return caminho
+    return _imagem_para_png(imagem, f"relatorio_JR_{arquivo_stub}_{arquivo_base}.png")
 
 
 def _linha_relatorio_carregamento(item: dict) -> tuple[list[str], str | None]:
@@ -520,6 +727,7 @@ def _linha_relatorio_carregamento(item: dict) -> tuple[list[str], str | None]:
     ajudante_nome = formatar_ajudante_nome(
         item.get("ajudante_nome") or DISPLAY_VAZIO,
         item.get("ajudante_id"),
+        item.get("ajudante_funcao"),
     )
     obs_padrao = (item.get("observacao") or "").strip()
     obs_extra = (item.get("observacao_extra") or "").strip()
@@ -548,16 +756,16 @@ def _linha_relatorio_carregamento(item: dict) -> tuple[list[str], str | None]:
     return valores, (item.get("observacao_cor") or "").strip() or None
 
 
-def desenhar_relatorio_carregamentos(
+def _parametros_relatorio_carregamentos(
     data_carreg_iso: str,
     data_saida_iso: str,
     linhas: list[list[str]],
     total_registros: int,
     cores_obs: list[str | None] | None = None,
-) -> Path:
+) -> dict[str, Any]:
     colunas = ["Nº", "Placa", "Rota", "Motorista", "Ajudante", "Obs."]
     col_widths = [0.08, 0.12, 0.25, 0.2, 0.2, 0.15]
-    return gerar_relatorio_moderno(
+    return dict(
         arquivo_stub="carregamentos",
         titulo_header="JR Escala - Carregamentos",
         linha_principal_rotulo="Carregamento",
@@ -576,7 +784,7 @@ def desenhar_relatorio_carregamentos(
     )
 
 
-def gerar_relatorio_oficinas(data_iso: str, data_saida_iso: str, registros: list[dict]) -> Path:
+def _parametros_relatorio_oficinas(data_iso: str, data_saida_iso: str, registros: list[dict]) -> dict[str, Any]:
     linhas: list[list[str]] = []
     cores: list[str | None] = []
     for item in registros:
@@ -589,7 +797,7 @@ def gerar_relatorio_oficinas(data_iso: str, data_saida_iso: str, registros: list
         )
         cores.append(item.get("observacao_cor"))
 
-    return gerar_relatorio_moderno(
+    return dict(
         arquivo_stub="oficinas",
         titulo_header="JR Escala - Oficinas",
         linha_principal_rotulo="Oficina",
@@ -608,7 +816,7 @@ def gerar_relatorio_oficinas(data_iso: str, data_saida_iso: str, registros: list
     )
 
 
-def gerar_relatorio_escala_cd(data_iso: str, data_saida_iso: str, registros: list[dict]) -> Path:
+def _parametros_relatorio_escala_cd(data_iso: str, data_saida_iso: str, registros: list[dict]) -> dict[str, Any]:
     linhas = [
         [
             item.get("motorista_nome") or DISPLAY_VAZIO,
@@ -617,7 +825,7 @@ def gerar_relatorio_escala_cd(data_iso: str, data_saida_iso: str, registros: lis
         ]
         for item in registros
     ]
-    return gerar_relatorio_moderno(
+    return dict(
         arquivo_stub="escala_cd",
         titulo_header="JR Escala - Escala (CD)",
         linha_principal_rotulo="Escala (CD)",
@@ -633,7 +841,7 @@ def gerar_relatorio_escala_cd(data_iso: str, data_saida_iso: str, registros: lis
     )
 
 
-def gerar_relatorio_folgas(data_iso: str, data_saida_iso: str | None, registros: list[dict]) -> Path:
+def _parametros_relatorio_folgas(data_iso: str, data_saida_iso: str | None, registros: list[dict]) -> dict[str, Any]:
     motoristas: list[str] = []
     ajudantes: list[str] = []
     for registro in registros:
@@ -657,7 +865,7 @@ def gerar_relatorio_folgas(data_iso: str, data_saida_iso: str | None, registros:
             ajudantes[idx] if idx < len(ajudantes) else "",
         ])
     header_iso = data_saida_iso or data_iso
-    return gerar_relatorio_moderno(
+    return dict(
         arquivo_stub="folgas",
         titulo_header="FOLGA:",
         linha_principal_rotulo="Data",
@@ -675,3 +883,52 @@ def gerar_relatorio_folgas(data_iso: str, data_saida_iso: str | None, registros:
         fallback_highlight=False,
     )
 
+
+def desenhar_relatorio_carregamentos(
+    data_carreg_iso: str,
+    data_saida_iso: str,
+    linhas: list[list[str]],
+    total_registros: int,
+    cores_obs: list[str | None] | None = None,
+) -> Path:
+    parametros = _parametros_relatorio_carregamentos(
+        data_carreg_iso, data_saida_iso, linhas, total_registros, cores_obs
+    )
+    return gerar_relatorio_moderno(**parametros)
+
+
+def renderizar_relatorio_carregamentos(
+    data_carreg_iso: str,
+    data_saida_iso: str,
+    linhas: list[list[str]],
+    total_registros: int,
+    cores_obs: list[str | None] | None = None,
+) -> RelatorioGerado:
+    parametros = _parametros_relatorio_carregamentos(
+        data_carreg_iso, data_saida_iso, linhas, total_registros, cores_obs
+    )
+    return renderizar_relatorio_moderno(**parametros)
+
+
+def gerar_relatorio_oficinas(data_iso: str, data_saida_iso: str, registros: list[dict]) -> Path:
+    return gerar_relatorio_moderno(**_parametros_relatorio_oficinas(data_iso, data_saida_iso, registros))
+
+
+def renderizar_relatorio_oficinas(data_iso: str, data_saida_iso: str, registros: list[dict]) -> RelatorioGerado:
+    return renderizar_relatorio_moderno(**_parametros_relatorio_oficinas(data_iso, data_saida_iso, registros))
+
+
+def gerar_relatorio_escala_cd(data_iso: str, data_saida_iso: str, registros: list[dict]) -> Path:
+    return gerar_relatorio_moderno(**_parametros_relatorio_escala_cd(data_iso, data_saida_iso, registros))
+
+
+def renderizar_relatorio_escala_cd(data_iso: str, data_saida_iso: str, registros: list[dict]) -> RelatorioGerado:
+    return renderizar_relatorio_moderno(**_parametros_relatorio_escala_cd(data_iso, data_saida_iso, registros))
+
+
+def gerar_relatorio_folgas(data_iso: str, data_saida_iso: str | None, registros: list[dict]) -> Path:
+    return gerar_relatorio_moderno(**_parametros_relatorio_folgas(data_iso, data_saida_iso, registros))
+
+
+def renderizar_relatorio_folgas(data_iso: str, data_saida_iso: str | None, registros: list[dict]) -> RelatorioGerado:
+    return renderizar_relatorio_moderno(**_parametros_relatorio_folgas(data_iso, data_saida_iso, registros))
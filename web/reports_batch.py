@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+import io
+import json
+import multiprocessing
+import os
+import time
+from typing import Any, Iterable
+import zipfile
+
+from . import services as svc
+from .reports import (
+    RelatorioGerado,
+    _linha_relatorio_carregamento,
+    _parametros_relatorio_carregamentos,
+    _parametros_relatorio_escala_cd,
+    _parametros_relatorio_folgas,
+    _parametros_relatorio_oficinas,
+    _relatorio_moderno_em_cache,
+    renderizar_relatorio_moderno,
+)
+
+TIPOS_RELATORIO = ("carregamentos", "oficinas", "escala_cd", "folgas")
+MAX_DIAS_LOTE = 31
+MIME_ZIP = "application/zip"
+# Ate quantos desenhos pendentes o lote roda no proprio processo: subir o pool
+# (spawn + import do Pillow) custa mais que desenhar um ou dois relatorios.
+MAX_DESENHOS_SEM_PROCESSOS = 2
+
+
+@dataclass
+class TempoRelatorio:
+    tipo: str
+    data_iso: str
+    nome_arquivo: str
+    coleta_ms: float
+    render_ms: float
+    tamanho: int
+    em_cache: bool = False
+
+
+@dataclass
+class LoteRelatorios:
+    arquivo: RelatorioGerado
+    tempos: list[TempoRelatorio] = field(default_factory=list)
+    coleta_ms: float = 0.0
+    total_ms: float = 0.0
+
+
+def _parametros_relatorio(tipo: str, data_iso: str) -> dict[str, Any]:
+    # Os mesmos dados que cada pagina usa no botao "Gerar relatorio", com as datas
+    # de saida padrao.
+    data_saida_iso = svc.calcular_data_saida_padrao(data_iso) or data_iso
+    if tipo == "carregamentos":
+        linhas: list[list[str]] = []
+        cores: list[str | None] = []
+        registros = svc.listar_carregamentos(data_iso)
+        for item in registros:
+            valores, cor = _linha_relatorio_carregamento(item)
+            linhas.append(valores)
+            cores.append(cor)
+        return _parametros_relatorio_carregamentos(data_iso, data_saida_iso, linhas, len(registros), cores)
+    if tipo == "oficinas":
+        registros = svc.listar_oficinas_por_data_saida(data_saida_iso)
+        return _parametros_relatorio_oficinas(data_iso, data_saida_iso, registros)
+    if tipo == "escala_cd":
+        return _parametros_relatorio_escala_cd(data_iso, data_saida_iso, svc.listar_escala_cd(data_iso))
+    if tipo == "folgas":
+        registros = svc.listar_folgas_por_data_saida(data_saida_iso)
+        return _parametros_relatorio_folgas(data_iso, data_saida_iso, registros)
+    raise ValueError(f"Tipo de relatório desconhecido: {tipo}")
+
+
+def _renderizar(parametros: dict[str, Any]) -> tuple[RelatorioGerado, float]:
+    # Roda nos processos do pool: so desenha, sem acesso ao banco.
+    inicio = time.perf_counter()
+    relatorio = renderizar_relatorio_moderno(**parametros)
+    return relatorio, (time.perf_counter() - inicio) * 1000
+
+
+def _datas_lote(inicio: str, fim: str | None) -> list[str]:
+    data_inicio = svc.parse_date(inicio)
+    data_fim = svc.parse_date(fim) if fim else data_inicio
+    if not data_inicio or not data_fim:
+        raise ValueError("Data inválida.")
+    if data_inicio > data_fim:
+        raise ValueError("Data inicial não pode ser posterior à data final.")
+    dias = (data_fim - data_inicio).days + 1
+    if dias > MAX_DIAS_LOTE:
+        raise ValueError(f"Período máximo de {MAX_DIAS_LOTE} dias por lote.")
+    return [(data_inicio + timedelta(days=offset)).isoformat() for offset in range(dias)]
+
+
+def gerar_relatorios_lote(
+    inicio: str,
+    fim: str | None = None,
+    tipos: Iterable[str] = TIPOS_RELATORIO,
+    processos: int | None = None,
+) -> LoteRelatorios:
+    inicio_lote = time.perf_counter()
+    datas = _datas_lote(inicio, fim)
+    tipos = [tipo for tipo in TIPOS_RELATORIO if tipo in set(tipos)]
+    if not tipos:
+        raise ValueError("Nenhum tipo de relatório selecionado.")
+
+    # Coleta no processo atual (uma conexao); o desenho, que segura o GIL, vai para
+    # processos separados.
+    tarefas: list[tuple[str, str, dict[str, Any], float]] = []
+    for data_iso in datas:
+        for tipo in tipos:
+            inicio_coleta = time.perf_counter()
+            parametros = _parametros_relatorio(tipo, data_iso)
+            tarefas.append((tipo, data_iso, parametros, (time.perf_counter() - inicio_coleta) * 1000))
+    coleta_ms = (time.perf_counter() - inicio_lote) * 1000
+
+    # O cache e consultado aqui: so os relatorios que faltam vao para o desenho.
+    renderizados: list[tuple[RelatorioGerado, float] | None] = []
+    pendentes: list[int] = []
+    for pos, (_, _, parametros, _) in enumerate(tarefas):
+        relatorio = _relatorio_moderno_em_cache(**parametros)
+        renderizados.append(None if relatorio is None else (relatorio, 0.0))
+        if relatorio is None:
+            pendentes.append(pos)
+
+    processos = max(1, min(processos or os.cpu_count() or 1, len(pendentes)))
+    if len(pendentes) <= MAX_DESENHOS_SEM_PROCESSOS:
+        processos = 1
+    if processos == 1:
+        desenhados = [_renderizar(tarefas[pos][2]) for pos in pendentes]
+    else:
+        # spawn: o filho nao herda conexoes abertas nem as threads do Streamlit.
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as executor:
+            desenhados = list(executor.map(_renderizar, [tarefas[pos][2] for pos in pendentes]))
+    for pos, desenhado in zip(pendentes, desenhados):
+        renderizados[pos] = desenhado
+    pendentes_set = set(pendentes)
+
+    tempos: list[TempoRelatorio] = []
+    buffer = io.BytesIO()
+    # PNG ja e comprimido: ZIP_STORED evita recomprimir.
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as arquivo_zip:
+        for pos, ((tipo, data_iso, _, coleta_item_ms), (relatorio, render_ms)) in enumerate(zip(tarefas, renderizados)):
+            nome = relatorio.nome_arquivo if len(datas) == 1 else f"{data_iso}/{relatorio.nome_arquivo}"
+            arquivo_zip.writestr(nome, relatorio.conteudo)
+            tempos.append(
+                TempoRelatorio(
+                    tipo=tipo,
+                    data_iso=data_iso,
+                    nome_arquivo=nome,
+                    coleta_ms=round(coleta_item_ms, 1),
+                    render_ms=round(render_ms, 1),
+                    tamanho=len(relatorio.conteudo),
+                    em_cache=pos not in pendentes_set,
+                )
+            )
+        total_ms = (time.perf_counter() - inicio_lote) * 1000
+        resumo = {
+            "inicio": datas[0],
+            "fim": datas[-1],
+            "processos": processos,
+            "desenhados": len(pendentes),
+            "coleta_ms": round(coleta_ms, 1),
+            "total_ms": round(total_ms, 1),
+            "relatorios": [asdict(tempo) for tempo in tempos],
+        }
+        arquivo_zip.writestr("tempos.json", json.dumps(resumo, indent=2, ensure_ascii=False))
+
+    sufixo = datas[0] if len(datas) == 1 else f"{datas[0]}_{datas[-1]}"
+    return LoteRelatorios(
+        arquivo=RelatorioGerado(f"relatorios_JR_{sufixo}.zip", buffer.getvalue(), MIME_ZIP),
+        tempos=tempos,
+        coleta_ms=coleta_ms,
+        total_ms=(time.perf_counter() - inicio_lote) * 1000,
+    )
@@ -1,15 +1,29 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable
 import os
 import re
+import threading
+import time
 
 from PIL import Image, ImageOps
 
-from .db import DBError, UPLOAD_DIR, get_connection, insert_and_get_id
+from .db import (
+    DBError,
+    UPLOAD_DIR,
+    get_connection,
+    insert_and_get_id,
+    lock_transaction,
+    pipeline,
+    statement,
+)
+from .disponibilidade import IndiceIntervalos, MatrizDisponibilidade, pintar_ocupacao
 
 COR_AZUL = "#1B5FAF"
 COR_AZUL_CLARO = "#1990FF"
@@ -38,6 +52,19 @@ VALOR_SEM_CAMINHAO = "Sem caminhão"
 MOTORISTA_AJUDANTE_TAG = "(.mot)"
 AVISO_NENHUM_COLAB = "Nenhum colaborador disponível para este dia."
 
+INDICE_DISPONIBILIDADE_ATIVO = os.environ.get("JR_ESCALA_INDICE_DISPONIBILIDADE", "1").strip().lower() not in (
+    "0",
+    "false",
+    "no",
+)
+INDICE_DISPONIBILIDADE_TTL = float(os.environ.get("JR_ESCALA_INDICE_TTL", "300"))
+
+LOG_PAGINA_TAMANHO = int(os.environ.get("JR_ESCALA_LOG_PAGINA", "25"))
+MAX_DIAS_PRE_GERACAO = int(os.environ.get("JR_ESCALA_MAX_DIAS_PRE_GERACAO", "62"))
+
+_LOCK_ROTAS_SEMANAIS = 7302
+_LOTE_INSERCAO = 500
+
 OBSERVACAO_OPCOES = [
     "0",
     "ROTA 1 DIA (BATE E VOLTA)",
@@ -123,12 +150,59 @@ def _safe_fetch(cur, query: str, params: Iterable[Any] = ()):
     return cur.fetchall()
 
 
+def _fetch_dicts(cur, query: str, params: Iterable[Any] = ()) -> list[dict]:
+    # Para cursores sem dict_rows: monta os dicts a partir de cursor.description.
+    rows = _safe_fetch(cur, query, params)
+    colunas = [col[0] for col in cur.description or ()]
+    return [dict(zip(colunas, row)) for row in rows]
+
+
+class UnidadeDeTrabalho:
+    # Uma conexao e uma transacao compartilhadas por varias funcoes de servico.
+    # Os ajustes do indice de disponibilidade so rodam depois do commit.
+    def __init__(self, conn) -> None:
+        self.conn = conn
+        self._apos_commit: list[tuple[Callable[..., Any], tuple]] = []
+
+    def cursor(self):
+        return self.conn.cursor()
+
+    def apos_commit(self, funcao: Callable[..., Any], *args: Any) -> None:
+        self._apos_commit.append((funcao, args))
+
+
+@contextmanager
+def unidade_de_trabalho():
+    with get_connection() as conn:
+        transacao = UnidadeDeTrabalho(conn)
+        yield transacao
+    for funcao, args in transacao._apos_commit:
+        funcao(*args)
+
+
+@contextmanager
+def _transacao(transacao: UnidadeDeTrabalho | None):
+    if transacao is not None:
+        yield transacao
+        return
+    with unidade_de_trabalho() as propria:
+        yield propria
+
+
+# As datas chegam do banco como texto ISO e se repetem muito entre as linhas;
+# o cache evita reinterpretar o mesmo texto a cada registro.
+@lru_cache(maxsize=8192)
 def parse_date(value: str | None) -> date | None:
     if not value:
         return None
     raw = value.strip()
     if not raw:
         return None
+    if len(raw) == 10 and raw[4] == "-" and raw[7] == "-":
+        try:
+            return date.fromisoformat(raw)
+        except ValueError:
+            return None
     for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
         try:
             return datetime.strptime(raw, fmt).date()
@@ -149,6 +223,7 @@ def data_iso_para_extenso(data_iso: str | None) -> str:
     return f"{nome_dia}, {data_dt.day:02d} de {nome_mes} de {data_dt.year}"
 
 
+@lru_cache(maxsize=8192)
 def data_iso_para_br(data_iso: str | None) -> str:
     if not data_iso:
         return DISPLAY_VAZIO
@@ -263,7 +338,330 @@ def obter_dia_semana_por_data(data_iso: str) -> str:
 # Disponibilidade
 
 
-def verificar_disponibilidade(data_iso: str, ignorar: dict[str, int] | None = None) -> dict[str, set[Any]]:
+def _dados_viagem(
+    data_registro: str | None,
+    data_saida: str | None,
+    observacao: str | None,
+    duracao_ajuste: int | None,
+) -> tuple[int, str | None, str | None]:
+    # (duracao_efetiva, data_inicio_viagem, data_fim_viagem) gravados no
+    # carregamento: saida informada (ou padrao) limitada ao registro e duracao
+    # do ajuste mais recente ou da observacao padrao.
+    if duracao_ajuste is not None:
+        dias = int(duracao_ajuste)
+    else:
+        dias = OBSERVACAO_DURACAO.get((observacao or "").strip(), 0)
+    data_registro_dt = parse_date(data_registro)
+    data_saida_dt = parse_date(data_saida)
+    if not data_registro_dt and not data_saida_dt:
+        return dias, None, None
+    if not data_registro_dt:
+        data_registro_dt = data_saida_dt
+    if not data_saida_dt:
+        dias_padrao = 3 if data_registro_dt.weekday() == 4 else 1
+        data_saida_dt = data_registro_dt + timedelta(days=dias_padrao)
+    if data_saida_dt < data_registro_dt:
+        data_saida_dt = data_registro_dt
+    fim_viagem = data_saida_dt + timedelta(days=dias)
+    return dias, data_saida_dt.isoformat(), fim_viagem.isoformat()
+
+
+def _periodos_carregamento(
+    data_registro: str | None,
+    duracao: int | None,
+    inicio_viagem: str | None,
+    fim_viagem: str | None,
+) -> list[tuple[date, date]]:
+    # Periodos [inicio, fim) em que o carregamento prende equipe e caminhao:
+    # o dia do registro e a viagem gravada. Duracao negativa libera tudo.
+    if duracao is None or duracao < 0:
+        return []
+    inicio_dt = parse_date(inicio_viagem)
+    fim_dt = parse_date(fim_viagem)
+    registro_dt = parse_date(data_registro) or inicio_dt
+    if not registro_dt:
+        return []
+    periodos = [(registro_dt, registro_dt + timedelta(days=1))]
+    if inicio_dt and fim_dt and fim_dt > inicio_dt:
+        periodos.append((inicio_dt, fim_dt))
+    return periodos
+
+
+_SQL_GRAVAR_VIAGEM = statement(
+    "gravar_viagem",
+    """
+    UPDATE carregamentos
+    SET duracao_efetiva = ?, data_inicio_viagem = ?, data_fim_viagem = ?
+    WHERE id = ?;
+    """,
+)
+
+
+def recalcular_viagens(cur, filtro: str = "", params: tuple = ()) -> int:
+    # Regrava as colunas de viagem dos carregamentos que casam com o filtro.
+    where = f"WHERE {filtro}" if filtro else ""
+    rows = _safe_fetch(
+        cur,
+        f"""
+        SELECT car.id,
+               car.data,
+               car.data_saida,
+               car.observacao,
+               (
+                   SELECT a.duracao_nova
+                   FROM ajustes_rotas a
+                   WHERE a.carregamento_id = car.id
+                   ORDER BY a.id DESC
+                   LIMIT 1
+               ) AS duracao_ajuste
+        FROM carregamentos car
+        {where}
+        """,
+        params,
+    )
+    valores = [
+        (*_dados_viagem(data_registro, data_saida, observacao, duracao_ajuste), car_id)
+        for car_id, data_registro, data_saida, observacao, duracao_ajuste in rows
+    ]
+    if valores:
+        cur.executemany(_SQL_GRAVAR_VIAGEM, valores)
+    return len(valores)
+
+
+def _dia_ordinal(valor: str | None) -> int | None:
+    data = parse_date(valor)
+    return data.toordinal() if data else None
+
+
+def _dia_ordinal_exato(valor: str | None) -> int | None:
+    # Folgas, oficinas e escala sao consultadas por igualdade de texto (data = ?).
+    data = parse_date(valor)
+    if not data or data.isoformat() != valor:
+        return None
+    return data.toordinal()
+
+
+def _intervalos_ferias(row) -> list[tuple]:
+    _, col_id, inicio, fim = row
+    d_inicio, d_fim = _dia_ordinal(inicio), _dia_ordinal(fim)
+    if not col_id or d_inicio is None or d_fim is None:
+        return []
+    return [(("colaborador", col_id), d_inicio, d_fim + 1)]
+
+
+def _intervalos_folga(row) -> list[tuple]:
+    _, col_id, data_registro = row
+    dia = _dia_ordinal_exato(data_registro)
+    if not col_id or dia is None:
+        return []
+    return [(("colaborador", col_id), dia, dia + 1)]
+
+
+def _intervalos_oficina(row) -> list[tuple]:
+    _, mot_id, placa, data_registro = row
+    dia = _dia_ordinal_exato(data_registro)
+    if dia is None:
+        return []
+    chaves = []
+    if mot_id:
+        chaves.append(("colaborador", mot_id))
+    if placa:
+        chaves.append(("placa", placa.upper()))
+    return [(chave, dia, dia + 1) for chave in chaves]
+
+
+def _intervalos_escala_cd(row) -> list[tuple]:
+    _, mot_id, aju_id, data_registro = row
+    dia = _dia_ordinal_exato(data_registro)
+    if dia is None:
+        return []
+    return [(("colaborador", col_id), dia, dia + 1) for col_id in (mot_id, aju_id) if col_id]
+
+
+def _intervalos_bloqueio(row) -> list[tuple]:
+    _, col_id, inicio, fim, car_id = row
+    d_inicio, d_fim = _dia_ordinal(inicio), _dia_ordinal(fim)
+    if car_id or not col_id or d_inicio is None or d_fim is None:
+        return []
+    return [(("colaborador", col_id), d_inicio, d_fim)]
+
+
+def _intervalos_carregamento(row) -> list[tuple]:
+    _, data_registro, mot_id, aju_id, placa, duracao, inicio_viagem, fim_viagem = row
+    chaves = [("colaborador", col_id) for col_id in (mot_id, aju_id) if col_id]
+    if placa:
+        chaves.append(("placa", placa.upper()))
+    return [
+        (chave, inicio.toordinal(), fim.toordinal())
+        for inicio, fim in _periodos_carregamento(data_registro, duracao, inicio_viagem, fim_viagem)
+        for chave in chaves
+    ]
+
+
+# etiqueta -> (SELECT base, filtro da carga completa, coluna id, conversor).
+# A etiqueta coincide com a chave usada em `ignorar`.
+_FONTES_INDICE = {
+    "ferias_id": (
+        "SELECT id, colaborador_id, data_inicio, data_fim FROM ferias",
+        "",
+        "id",
+        _intervalos_ferias,
+    ),
+    "folga_id": (
+        "SELECT id, colaborador_id, data FROM folgas",
+        "",
+        "id",
+        _intervalos_folga,
+    ),
+    "oficina_id": (
+        "SELECT id, motorista_id, placa, data FROM oficinas",
+        "",
+        "id",
+        _intervalos_oficina,
+    ),
+    "escala_cd_id": (
+        "SELECT id, motorista_id, ajudante_id, data FROM escala_cd",
+        "",
+        "id",
+        _intervalos_escala_cd,
+    ),
+    "bloqueio": (
+        "SELECT id, colaborador_id, data_inicio, data_fim, carregamento_id FROM bloqueios",
+        "carregamento_id IS NULL OR carregamento_id = 0",
+        "id",
+        _intervalos_bloqueio,
+    ),
+    "carregamento_id": (
+        """
+        SELECT car.id,
+               car.data,
+               car.motorista_id,
+               car.ajudante_id,
+               car.placa,
+               car.duracao_efetiva,
+               car.data_inicio_viagem,
+               car.data_fim_viagem
+        FROM carregamentos car
+        """,
+        "car.duracao_efetiva >= 0",
+        "car.id",
+        _intervalos_carregamento,
+    ),
+}
+
+_indice_disponibilidade: IndiceIntervalos | None = None
+_indice_carregado_em = 0.0
+# Cada escrita no indice (ou descarte) avanca a geracao; uma carga completa que
+# comecou antes disso pode nao ter visto a escrita e nao e guardada.
+_indice_geracao = 0
+_indice_lock = threading.RLock()
+_indice_carga_lock = threading.Lock()
+
+
+def _carregar_indice_disponibilidade() -> IndiceIntervalos:
+    indice = IndiceIntervalos()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        for etiqueta, (sql, filtro, _, conversor) in _FONTES_INDICE.items():
+            query = f"{sql} WHERE {filtro}" if filtro else sql
+            for row in _safe_fetch(cur, query):
+                for chave, inicio, fim in conversor(tuple(row)):
+                    indice.adicionar((etiqueta, row[0]), chave, inicio, fim)
+    return indice
+
+
+def _indice_valido() -> IndiceIntervalos | None:
+    with _indice_lock:
+        if time.monotonic() - _indice_carregado_em >= INDICE_DISPONIBILIDADE_TTL:
+            return None
+        return _indice_disponibilidade
+
+
+def obter_indice_disponibilidade() -> IndiceIntervalos | None:
+    global _indice_disponibilidade, _indice_carregado_em
+    if not INDICE_DISPONIBILIDADE_ATIVO:
+        return None
+    indice = _indice_valido()
+    if indice is not None:
+        return indice
+    # A carga le o banco fora de _indice_lock: leituras e atualizacoes do indice
+    # atual nao esperam por ela. Cargas simultaneas se enfileiram aqui.
+    with _indice_carga_lock:
+        indice = _indice_valido()
+        if indice is not None:
+            return indice
+        with _indice_lock:
+            geracao = _indice_geracao
+        indice = _carregar_indice_disponibilidade()
+        with _indice_lock:
+            if _indice_geracao == geracao:
+                _indice_disponibilidade = indice
+                _indice_carregado_em = time.monotonic()
+    return indice
+
+
+def invalidar_indice_disponibilidade() -> None:
+    global _indice_disponibilidade, _indice_geracao
+    with _indice_lock:
+        _indice_disponibilidade = None
+        _indice_geracao += 1
+
+
+def _atualizar_indice(etiqueta: str, registro_id: int | None) -> None:
+    if not registro_id:
+        return
+    coluna = _FONTES_INDICE[etiqueta][2]
+    _recarregar_no_indice(etiqueta, f"{coluna} = ?", (registro_id,), {registro_id})
+
+
+def _atualizar_indice_carregamentos_periodo(inicio: str, fim: str) -> None:
+    _recarregar_no_indice("carregamento_id", "car.data BETWEEN ? AND ?", (inicio, fim))
+
+
+def _recarregar_no_indice(etiqueta: str, filtro: str, params: tuple, ids: set | None = None) -> None:
+    # Substitui no indice os registros que casam com o filtro; os `ids` que nao
+    # voltarem do banco (apagados) saem do indice. A consulta roda sem o lock.
+    global _indice_geracao
+    with _indice_lock:
+        _indice_geracao += 1
+        indice = _indice_disponibilidade
+    if indice is None:
+        return
+    sql, _, _, conversor = _FONTES_INDICE[etiqueta]
+    try:
+        with get_connection() as conn:
+            rows = _safe_fetch(conn.cursor(), f"{sql} WHERE {filtro}", params)
+    except DBError:
+        invalidar_indice_disponibilidade()
+        return
+    with _indice_lock:
+        if _indice_disponibilidade is not indice:
+            # Descartado ou recarregado depois do commit: ja reflete o banco.
+            return
+        for row in rows:
+            indice.substituir((etiqueta, row[0]), conversor(tuple(row)))
+        for registro_id in (ids or set()) - {row[0] for row in rows}:
+            indice.substituir((etiqueta, registro_id), [])
+
+
+def verificar_disponibilidade(
+    data_iso: str,
+    ignorar: dict[str, int] | None = None,
+    *,
+    usar_indice: bool = True,
+) -> dict[str, set[Any]]:
+    # usar_indice=False para as conferencias antes de gravar: o indice em memoria
+    # nao ve escritas de outros processos (ex.: scripts/pre_gerar_rotas.py) ate o TTL.
+    return _verificar_disponibilidade(None, data_iso, ignorar, usar_indice)
+
+
+def _verificar_disponibilidade(
+    cur,
+    data_iso: str,
+    ignorar: dict[str, int] | None = None,
+    usar_indice: bool = True,
+) -> dict[str, set[Any]]:
+    # `cur` permite reaproveitar a conexao de quem chama; None abre uma propria.
     resultado: dict[str, set[Any]] = {
         "motoristas": set(),
         "ajudantes": set(),
@@ -275,147 +673,263 @@ def verificar_disponibilidade(data_iso: str, ignorar: dict[str, int] | None = No
         return resultado
 
     ignorar = ignorar or {}
+    if usar_indice and data_iso == alvo.isoformat() and _disponibilidade_pelo_indice(alvo, ignorar, resultado):
+        return resultado
+
+    if cur is None:
+        with get_connection() as conn:
+            _marcar_indisponiveis(conn.cursor(), alvo, data_iso, ignorar, resultado)
+    else:
+        _marcar_indisponiveis(cur, alvo, data_iso, ignorar, resultado)
+    return resultado
+
+
+def _disponibilidade_pelo_indice(alvo: date, ignorar: dict[str, int], resultado: dict[str, set[Any]]) -> bool:
+    # False quando o indice esta desligado: a disponibilidade sai das consultas por dia.
+    indice = obter_indice_disponibilidade()
+    if indice is None:
+        return False
+    etiquetas = {(chave, valor) for chave, valor in ignorar.items()}
+    for tipo, valor in indice.chaves_ocupadas(alvo.toordinal(), ignorar=etiquetas):
+        if tipo == "placa":
+            resultado["caminhoes"].add(valor)
+        else:
+            resultado["motoristas"].add(valor)
+            resultado["ajudantes"].add(valor)
+    return True
+
+
+# As consultas abaixo comparam datas como texto ISO (ou DATE no Postgres): exigem
+# db.ensure_schema() (migracao 5) antes do primeiro acesso, como fazem o app e
+# os scripts ao iniciar.
+_SQL_FERIAS_NO_DIA = statement(
+    "ferias_no_dia",
+    """
+    SELECT id, colaborador_id
+    FROM ferias
+    WHERE data_inicio <= ? AND data_fim >= ?
+    """,
+)
+_SQL_FOLGAS_NO_DIA = statement(
+    "folgas_no_dia",
+    "SELECT id, colaborador_id FROM folgas WHERE data = ?",
+)
+_SQL_OFICINAS_NO_DIA = statement(
+    "oficinas_no_dia",
+    "SELECT id, motorista_id, placa FROM oficinas WHERE data = ?",
+)
+_SQL_ESCALA_CD_NO_DIA = statement(
+    "escala_cd_no_dia",
+    "SELECT id, motorista_id, ajudante_id FROM escala_cd WHERE data = ?",
+)
+# Bloqueios gerados por carregamento sao cobertos pelo proprio carregamento.
+_SQL_BLOQUEIOS_NO_DIA = statement(
+    "bloqueios_no_dia",
+    """
+    SELECT colaborador_id
+    FROM bloqueios
+    WHERE (carregamento_id IS NULL OR carregamento_id = 0)
+    AND data_inicio <= ? AND data_fim > ?
+    """,
+)
+_SQL_CARREGAMENTOS_NO_DIA = statement(
+    "carregamentos_no_dia",
+    """
+    SELECT id, data, motorista_id, ajudante_id, placa
+    FROM carregamentos
+    WHERE duracao_efetiva >= 0
+    AND (data = ? OR (data_inicio_viagem <= ? AND data_fim_viagem > ?))
+    """,
+)
+
+
+def _consultas_indisponiveis(alvo_iso: str, data_iso: str) -> list[tuple[str, tuple]]:
+    # Na ordem esperada por _aplicar_indisponiveis.
+    return [
+        (_SQL_FERIAS_NO_DIA, (alvo_iso, alvo_iso)),
+        (_SQL_FOLGAS_NO_DIA, (data_iso,)),
+        (_SQL_OFICINAS_NO_DIA, (data_iso,)),
+        (_SQL_ESCALA_CD_NO_DIA, (data_iso,)),
+        (_SQL_BLOQUEIOS_NO_DIA, (alvo_iso, alvo_iso)),
+        (_SQL_CARREGAMENTOS_NO_DIA, (alvo_iso, alvo_iso, alvo_iso)),
+    ]
+
+
+def _aplicar_indisponiveis(
+    linhas: list[list],
+    ignorar: dict[str, int],
+    resultado: dict[str, set[Any]],
+) -> None:
+    ferias, folgas, oficinas, escalas, bloqueios, carregamentos = linhas
+
+    for ferias_id, col_id in ferias:
+        if not col_id or ignorar.get("ferias_id") == ferias_id:
+            continue
+        resultado["motoristas"].add(col_id)
+        resultado["ajudantes"].add(col_id)
 
+    for folga_id, col_id in folgas:
+        if not col_id or ignorar.get("folga_id") == folga_id:
+            continue
+        resultado["motoristas"].add(col_id)
+        resultado["ajudantes"].add(col_id)
+
+    for ofi_id, mot_id, placa in oficinas:
+        if ignorar.get("oficina_id") == ofi_id:
+            continue
+        if mot_id:
+            resultado["motoristas"].add(mot_id)
+            resultado["ajudantes"].add(mot_id)
+        if placa:
+            resultado["caminhoes"].add(placa.upper())
+
+    for escala_id, mot_id, aju_id in escalas:
+        if ignorar.get("escala_cd_id") == escala_id:
+            continue
+        if mot_id:
+            resultado["motoristas"].add(mot_id)
+            resultado["ajudantes"].add(mot_id)
+        if aju_id:
+            resultado["ajudantes"].add(aju_id)
+            resultado["motoristas"].add(aju_id)
+
+    for (col_id,) in bloqueios:
+        if not col_id:
+            continue
+        resultado["motoristas"].add(col_id)
+        resultado["ajudantes"].add(col_id)
+
+    for car_id, data_registro, mot_id, aju_id, placa in carregamentos:
+        if ignorar.get("carregamento_id") == car_id:
+            continue
+        if mot_id:
+            resultado["motoristas"].add(mot_id)
+            resultado["ajudantes"].add(mot_id)
+        if aju_id:
+            resultado["ajudantes"].add(aju_id)
+            resultado["motoristas"].add(aju_id)
+        if placa:
+            resultado["caminhoes"].add(placa.upper())
+
+
+def _marcar_indisponiveis(
+    cur,
+    alvo: date,
+    data_iso: str,
+    ignorar: dict[str, int],
+    resultado: dict[str, set[Any]],
+) -> None:
+    linhas = [
+        _safe_fetch(cur, query, params)
+        for query, params in _consultas_indisponiveis(alvo.isoformat(), data_iso)
+    ]
+    _aplicar_indisponiveis(linhas, ignorar, resultado)
+
+
+def _intervalos_periodo(inicio: date, fim: date, ignorar: dict[str, int]) -> list[tuple]:
+    # Intervalos (chave, inicio, fim) que tocam [inicio, fim], ja sem os ignorados.
+    etiquetas = set(ignorar.items())
+    inicio_ord, fim_ord = inicio.toordinal(), fim.toordinal() + 1
+    indice = obter_indice_disponibilidade()
+    if indice is not None:
+        return indice.ocupacoes(inicio_ord, fim_ord, ignorar=etiquetas)
+
+    inicio_iso, fim_iso = inicio.isoformat(), fim.isoformat()
+    intervalos: list[tuple] = []
     with get_connection() as conn:
         cur = conn.cursor()
+        filtros = {
+            "ferias_id": ("data_inicio <= ? AND data_fim >= ?", (fim_iso, inicio_iso)),
+            "folga_id": ("data BETWEEN ? AND ?", (inicio_iso, fim_iso)),
+            "oficina_id": ("data BETWEEN ? AND ?", (inicio_iso, fim_iso)),
+            "escala_cd_id": ("data BETWEEN ? AND ?", (inicio_iso, fim_iso)),
+            "bloqueio": (
+                "(carregamento_id IS NULL OR carregamento_id = 0) AND data_inicio <= ? AND data_fim > ?",
+                (fim_iso, inicio_iso),
+            ),
+            "carregamento_id": (
+                "car.duracao_efetiva >= 0 AND (car.data BETWEEN ? AND ? "
+                "OR (car.data_inicio_viagem <= ? AND car.data_fim_viagem > ?))",
+                (inicio_iso, fim_iso, fim_iso, inicio_iso),
+            ),
+        }
+        for etiqueta, (sql, _, _, conversor) in _FONTES_INDICE.items():
+            filtro, params = filtros[etiqueta]
+            for row in _safe_fetch(cur, f"{sql} WHERE {filtro}", params):
+                if (etiqueta, row[0]) in etiquetas:
+                    continue
+                for chave, ini, fim_intervalo in conversor(tuple(row)):
+                    if ini < fim_ord and fim_intervalo > inicio_ord:
+                        intervalos.append((chave, ini, fim_intervalo))
+    return intervalos
 
-        ajustes_atuais: dict[int, int] = {}
-        for car_id, duracao_nova in _safe_fetch(
-            cur,
-            """
-            SELECT a.carregamento_id, a.duracao_nova
-            FROM ajustes_rotas a
-            INNER JOIN (
-                SELECT carregamento_id, MAX(id) AS max_id
-                FROM ajustes_rotas
-                GROUP BY carregamento_id
-            ) ult
-            ON ult.carregamento_id = a.carregamento_id
-            AND ult.max_id = a.id
-            """,
-        ):
-            ajustes_atuais[car_id] = duracao_nova
 
-        for ferias_id, col_id, inicio, fim in _safe_fetch(
-            cur,
-            "SELECT id, colaborador_id, data_inicio, data_fim FROM ferias",
-        ):
-            if not col_id or ignorar.get("ferias_id") == ferias_id:
-                continue
-            d_inicio = parse_date(inicio)
-            d_fim = parse_date(fim)
-            if d_inicio and d_fim and d_inicio <= alvo <= d_fim:
-                resultado["motoristas"].add(col_id)
-                resultado["ajudantes"].add(col_id)
+def verificar_disponibilidade_periodo(
+    inicio: str,
+    fim: str,
+    ignorar: dict[str, int] | None = None,
+) -> dict[str, dict[str, set[Any]]]:
+    # Mesmo resultado de verificar_disponibilidade para cada dia de [inicio, fim],
+    # calculado com uma unica leitura dos intervalos do periodo.
+    d_inicio = parse_date((inicio or "").strip())
+    d_fim = parse_date((fim or "").strip())
+    if not d_inicio or not d_fim or d_fim < d_inicio:
+        return {}
 
-        for folga_id, col_id in _safe_fetch(
-            cur,
-            "SELECT id, colaborador_id FROM folgas WHERE data = ?",
-            (data_iso,),
-        ):
-            if not col_id or ignorar.get("folga_id") == folga_id:
-                continue
-            resultado["motoristas"].add(col_id)
-            resultado["ajudantes"].add(col_id)
+    base = d_inicio.toordinal()
+    total = d_fim.toordinal() - base + 1
+    colaboradores: list[set[Any]] = [set() for _ in range(total)]
+    caminhoes: list[set[Any]] = [set() for _ in range(total)]
+    for (tipo, valor), ini, fim_intervalo in _intervalos_periodo(d_inicio, d_fim, ignorar or {}):
+        destino = caminhoes if tipo == "placa" else colaboradores
+        for pos in range(max(ini - base, 0), min(fim_intervalo - base, total)):
+            destino[pos].add(valor)
+
+    return {
+        (d_inicio + timedelta(days=pos)).isoformat(): {
+            "motoristas": set(colaboradores[pos]),
+            "ajudantes": colaboradores[pos],
+            "caminhoes": caminhoes[pos],
+        }
+        for pos in range(total)
+    }
 
-        for ofi_id, mot_id, placa in _safe_fetch(
-            cur,
-            "SELECT id, motorista_id, placa FROM oficinas WHERE data = ?",
-            (data_iso,),
-        ):
-            if ignorar.get("oficina_id") == ofi_id:
-                continue
-            if mot_id:
-                resultado["motoristas"].add(mot_id)
-                resultado["ajudantes"].add(mot_id)
-            if placa:
-                resultado["caminhoes"].add(placa.upper())
 
-        for escala_id, mot_id, aju_id in _safe_fetch(
-            cur,
-            "SELECT id, motorista_id, ajudante_id FROM escala_cd WHERE data = ?",
-            (data_iso,),
-        ):
-            if ignorar.get("escala_cd_id") == escala_id:
-                continue
-            if mot_id:
-                resultado["motoristas"].add(mot_id)
-                resultado["ajudantes"].add(mot_id)
-            if aju_id:
-                resultado["ajudantes"].add(aju_id)
-                resultado["motoristas"].add(aju_id)
-
-        for _, col_id, inicio, fim, car_id in _safe_fetch(
-            cur,
-            """
-            SELECT id, colaborador_id, data_inicio, data_fim, carregamento_id
-            FROM bloqueios
-            """,
-        ):
-            if not col_id:
-                continue
-            if car_id:
-                if ignorar.get("carregamento_id") == car_id:
-                    continue
-                continue
-            d_inicio = parse_date(inicio)
-            d_fim = parse_date(fim)
-            if d_inicio and d_fim and d_inicio <= alvo < d_fim:
-                resultado["motoristas"].add(col_id)
-                resultado["ajudantes"].add(col_id)
-
-        for (
-            car_id,
-            data_registro,
-            data_saida,
-            mot_id,
-            aju_id,
-            placa,
-            observacao,
-        ) in _safe_fetch(
-            cur,
-            """
-            SELECT id, data, data_saida, motorista_id, ajudante_id, placa, observacao
-            FROM carregamentos
-            """,
-        ):
-            if ignorar.get("carregamento_id") == car_id:
-                continue
-            data_registro_dt = parse_date(data_registro)
-            data_saida_dt = parse_date(data_saida)
-            if not data_registro_dt and not data_saida_dt:
-                continue
-            if not data_registro_dt:
-                data_registro_dt = data_saida_dt
-            if not data_saida_dt and data_registro_dt:
-                dias_padrao = 3 if data_registro_dt.weekday() == 4 else 1
-                data_saida_dt = data_registro_dt + timedelta(days=dias_padrao)
-            if data_saida_dt and data_registro_dt and data_saida_dt < data_registro_dt:
-                data_saida_dt = data_registro_dt
-            dias = ajustes_atuais.get(
-                car_id, OBSERVACAO_DURACAO.get((observacao or "").strip(), 0)
-            )
-            if dias < 0:
-                continue
-            duracao_dias = max(dias, 0)
-            bloquear_registro = data_registro_dt == alvo if data_registro_dt else False
-            bloquear_viagem = False
-            if duracao_dias > 0:
-                inicio_viagem = data_saida_dt or data_registro_dt
-                if inicio_viagem:
-                    fim_viagem = inicio_viagem + timedelta(days=duracao_dias)
-                    bloquear_viagem = inicio_viagem <= alvo < fim_viagem
-            if bloquear_registro or bloquear_viagem:
-                if mot_id:
-                    resultado["motoristas"].add(mot_id)
-                    resultado["ajudantes"].add(mot_id)
-                if aju_id:
-                    resultado["ajudantes"].add(aju_id)
-                    resultado["motoristas"].add(aju_id)
-                if placa:
-                    resultado["caminhoes"].add(placa.upper())
+def montar_matriz_disponibilidade(
+    inicio: str,
+    fim: str,
+    ignorar: dict[str, int] | None = None,
+) -> MatrizDisponibilidade | None:
+    # Uma linha por colaborador ativo ("colaborador", id) e por caminhao ativo
+    # ("placa", PLACA), uma coluna por dia de [inicio, fim]; True = livre.
+    d_inicio = parse_date((inicio or "").strip())
+    d_fim = parse_date((fim or "").strip())
+    if not d_inicio or not d_fim or d_fim < d_inicio:
+        return None
 
-    return resultado
+    with get_connection() as conn:
+        cur = conn.cursor()
+        colaboradores = _safe_fetch(cur, "SELECT id FROM colaboradores WHERE ativo = 1 ORDER BY nome, id")
+        placas = _safe_fetch(cur, "SELECT placa FROM caminhoes WHERE ativo = 1 ORDER BY placa")
+    chaves: list[tuple] = [("colaborador", row[0]) for row in colaboradores]
+    chaves.extend(("placa", row[0].upper()) for row in placas if row[0])
+    linhas = {chave: pos for pos, chave in enumerate(chaves)}
+
+    base = d_inicio.toordinal()
+    linha_idx: list[int] = []
+    inicios: list[int] = []
+    fins: list[int] = []
+    for chave, ini, fim_intervalo in _intervalos_periodo(d_inicio, d_fim, ignorar or {}):
+        pos = linhas.get(chave)
+        if pos is None:
+            continue
+        linha_idx.append(pos)
+        inicios.append(ini - base)
+        fins.append(fim_intervalo - base)
+
+    total = d_fim.toordinal() - base + 1
+    ocupado = pintar_ocupacao(len(chaves), total, linha_idx, inicios, fins)
+    return MatrizDisponibilidade(d_inicio, chaves, ~ocupado)
 
 
 # Colaboradores
@@ -497,17 +1011,30 @@ def excluir_colaborador(colaborador_id: int) -> str | None:
         cur.execute("SELECT foto FROM colaboradores WHERE id = ?;", (colaborador_id,))
         row = cur.fetchone()
         foto = row["foto"] if row else None
-        cur.execute("DELETE FROM folgas WHERE colaborador_id = ?;", (colaborador_id,))
-        cur.execute("DELETE FROM ferias WHERE colaborador_id = ?;", (colaborador_id,))
-        cur.execute("DELETE FROM bloqueios WHERE colaborador_id = ?;", (colaborador_id,))
-        cur.execute("UPDATE carregamentos SET motorista_id = NULL WHERE motorista_id = ?;", (colaborador_id,))
-        cur.execute("UPDATE carregamentos SET ajudante_id = NULL WHERE ajudante_id = ?;", (colaborador_id,))
-        cur.execute("UPDATE escala_cd SET motorista_id = NULL WHERE motorista_id = ?;", (colaborador_id,))
-        cur.execute("UPDATE escala_cd SET ajudante_id = NULL WHERE ajudante_id = ?;", (colaborador_id,))
-        cur.execute("UPDATE oficinas SET motorista_id = NULL WHERE motorista_id = ?;", (colaborador_id,))
-        cur.execute("DELETE FROM colaboradores WHERE id = ?;", (colaborador_id,))
+        with pipeline(conn):
+            cur.execute("DELETE FROM folgas WHERE colaborador_id = ?;", (colaborador_id,))
+            cur.execute("DELETE FROM ferias WHERE colaborador_id = ?;", (colaborador_id,))
+            cur.execute("DELETE FROM bloqueios WHERE colaborador_id = ?;", (colaborador_id,))
+            cur.execute("UPDATE carregamentos SET motorista_id = NULL WHERE motorista_id = ?;", (colaborador_id,))
+            cur.execute("UPDATE carregamentos SET ajudante_id = NULL WHERE ajudante_id = ?;", (colaborador_id,))
+            cur.execute("UPDATE escala_cd SET motorista_id = NULL WHERE motorista_id = ?;", (colaborador_id,))
+            cur.execute("UPDATE escala_cd SET ajudante_id = NULL WHERE ajudante_id = ?;", (colaborador_id,))
+            cur.execute("UPDATE oficinas SET motorista_id = NULL WHERE motorista_id = ?;", (colaborador_id,))
+            cur.execute("DELETE FROM colaboradores WHERE id = ?;", (colaborador_id,))
         conn.commit()
-        return foto or None
+    invalidar_indice_disponibilidade()
+    return foto or None
+
+
+_SQL_COLABORADORES_FUNCAO = statement(
+    "colaboradores_funcao",
+    """
+    SELECT id, nome, funcao, observacao, foto
+    FROM colaboradores
+    WHERE ativo = 1 AND lower(funcao) = ?
+    ORDER BY nome;
+    """,
+)
 
 
 def listar_colaboradores_por_funcao(
@@ -517,15 +1044,7 @@ def listar_colaboradores_por_funcao(
 ) -> list[dict]:
     with get_connection(dict_rows=True) as conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT id, nome, funcao, observacao, foto
-            FROM colaboradores
-            WHERE ativo = 1 AND lower(funcao) = ?
-            ORDER BY nome;
-            """,
-            (funcao.lower(),),
-        )
+        cur.execute(_SQL_COLABORADORES_FUNCAO, (funcao.lower(),))
         colaboradores = []
         for row in cur.fetchall():
             dados = dict(row)
@@ -540,15 +1059,18 @@ def listar_colaboradores_por_funcao(
     return [col for col in colaboradores if col["id"] not in indisponiveis]
 
 
-def formatar_ajudante_nome(nome: str, colaborador_id: int | None) -> str:
+def formatar_ajudante_nome(nome: str, colaborador_id: int | None, funcao: str | None = None) -> str:
+    # `funcao` vem do JOIN (aj.funcao) nas listagens; sem ela, consulta o colaborador.
     if not colaborador_id:
         return nome
     if not nome or nome == DISPLAY_VAZIO:
         return nome or DISPLAY_VAZIO
-    dados = obter_colaborador_por_id(colaborador_id)
-    if not dados:
-        return nome
-    funcao = (dados.get("funcao") or "").lower()
+    if funcao is None:
+        dados = obter_colaborador_por_id(colaborador_id)
+        if not dados:
+            return nome
+        funcao = dados.get("funcao")
+    funcao = (funcao or "").lower()
     if funcao.startswith("motor") and MOTORISTA_AJUDANTE_TAG not in nome:
         return f"{nome} {MOTORISTA_AJUDANTE_TAG}"
     return nome
@@ -655,9 +1177,7 @@ def listar_caminhoes(ativos_only: bool = True) -> list[dict]:
     with get_connection(dict_rows=True) as conn:
         cur = conn.cursor()
         if ativos_only:
-            cur.execute(
-                "SELECT id, placa, modelo, observacao, ativo FROM caminhoes WHERE ativo = 1 ORDER BY placa;"
-            )
+            cur.execute(_SQL_CAMINHOES_ATIVOS)
         else:
             cur.execute(
                 "SELECT id, placa, modelo, observacao, ativo FROM caminhoes ORDER BY ativo DESC, placa;"
@@ -694,7 +1214,7 @@ def listar_caminhoes_ativos() -> list[dict]:
 def placa_em_manutencao(placa: str, data_iso: str) -> bool:
     if not placa:
         return False
-    indisponiveis = verificar_disponibilidade(data_iso).get("caminhoes", set())
+    indisponiveis = verificar_disponibilidade(data_iso, usar_indice=False).get("caminhoes", set())
     return placa.upper() in indisponiveis
 
 
@@ -731,32 +1251,36 @@ def salvar_folga(
             ),
         )
         conn.commit()
-        return novo_id
+    _atualizar_indice("folga_id", novo_id)
+    return novo_id
+
+
+_SQL_FOLGAS_DIA = statement(
+    "folgas_dia",
+    """
+    SELECT
+        f.id AS folga_id,
+        c.id AS colaborador_id,
+        c.nome,
+        c.funcao,
+        f.data,
+        f.data_fim,
+        f.data_saida,
+        f.observacao_padrao,
+        f.observacao_extra,
+        f.observacao_cor
+    FROM folgas f
+    INNER JOIN colaboradores c ON c.id = f.colaborador_id
+    WHERE f.data = ?
+    ORDER BY c.nome;
+    """,
+)
 
 
 def listar_folgas(data_iso: str) -> list[dict]:
     with get_connection(dict_rows=True) as conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT
-                f.id AS folga_id,
-                c.id AS colaborador_id,
-                c.nome,
-                c.funcao,
-                f.data,
-                f.data_fim,
-                f.data_saida,
-                f.observacao_padrao,
-                f.observacao_extra,
-                f.observacao_cor
-            FROM folgas f
-            INNER JOIN colaboradores c ON c.id = f.colaborador_id
-            WHERE f.data = ?
-            ORDER BY c.nome;
-            """,
-            (data_iso,),
-        )
+        cur.execute(_SQL_FOLGAS_DIA, (data_iso,))
         return [dict(row) for row in cur.fetchall()]
 
 
@@ -823,6 +1347,7 @@ def editar_folga(
             ),
         )
         conn.commit()
+    _atualizar_indice("folga_id", folga_id)
 
 
 def remover_folga(folga_id: int) -> None:
@@ -830,6 +1355,7 @@ def remover_folga(folga_id: int) -> None:
         cur = conn.cursor()
         cur.execute("DELETE FROM folgas WHERE id = ?;", (folga_id,))
         conn.commit()
+    _atualizar_indice("folga_id", folga_id)
 
 # Férias
 
@@ -855,7 +1381,8 @@ def adicionar_ferias(colaborador_id: int, data_inicio: str, data_fim: str, obser
             (colaborador_id, data_inicio, data_fim, observacao_db),
         )
         conn.commit()
-        return novo_id
+    _atualizar_indice("ferias_id", novo_id)
+    return novo_id
 
 
 def atualizar_ferias(registro_id: int, colaborador_id: int, data_inicio: str, data_fim: str, observacao: str | None) -> None:
@@ -872,6 +1399,7 @@ def atualizar_ferias(registro_id: int, colaborador_id: int, data_inicio: str, da
             (colaborador_id, data_inicio, data_fim, observacao_db, registro_id),
         )
         conn.commit()
+    _atualizar_indice("ferias_id", registro_id)
 
 
 def remover_ferias(registro_id: int) -> None:
@@ -879,6 +1407,7 @@ def remover_ferias(registro_id: int) -> None:
         cur = conn.cursor()
         cur.execute("DELETE FROM ferias WHERE id = ?;", (registro_id,))
         conn.commit()
+    _atualizar_indice("ferias_id", registro_id)
 
 
 def listar_ferias() -> list[dict]:
@@ -913,11 +1442,12 @@ def listar_ferias() -> list[dict]:
 # Bloqueios
 
 
-def remover_bloqueios_por_carregamento(carregamento_id: int) -> None:
-    with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM bloqueios WHERE carregamento_id = ?;", (carregamento_id,))
-        conn.commit()
+def remover_bloqueios_por_carregamento(
+    carregamento_id: int,
+    transacao: UnidadeDeTrabalho | None = None,
+) -> None:
+    with _transacao(transacao) as uow:
+        uow.cursor().execute("DELETE FROM bloqueios WHERE carregamento_id = ?;", (carregamento_id,))
 
 
 def criar_bloqueios_para_carregamento(
@@ -925,12 +1455,13 @@ def criar_bloqueios_para_carregamento(
     data_iso: str,
     colaborador_ids: list[int | None],
     observacao: str,
+    transacao: UnidadeDeTrabalho | None = None,
 ) -> None:
     dias = OBSERVACAO_DURACAO.get(observacao, 0)
     data_inicio = datetime.strptime(data_iso, "%Y-%m-%d").date()
     data_fim = data_inicio + timedelta(days=dias)
-    with get_connection() as conn:
-        cur = conn.cursor()
+    with _transacao(transacao) as uow:
+        cur = uow.cursor()
         for colaborador_id in colaborador_ids:
             if not colaborador_id:
                 continue
@@ -947,7 +1478,8 @@ def criar_bloqueios_para_carregamento(
                     carregamento_id,
                 ),
             )
-        conn.commit()
+        if not carregamento_id:
+            uow.apos_commit(invalidar_indice_disponibilidade)
 
 
 def limpar_bloqueios_expirados() -> None:
@@ -956,6 +1488,7 @@ def limpar_bloqueios_expirados() -> None:
         cur = conn.cursor()
         cur.execute("DELETE FROM bloqueios WHERE data_fim <= ?;", (hoje,))
         conn.commit()
+    invalidar_indice_disponibilidade()
 
 
 # Carregamentos
@@ -972,6 +1505,7 @@ def salvar_carregamento(
     observacao_cor: str | None = None,
     data_saida: str | None = None,
     revisado: bool = False,
+    transacao: UnidadeDeTrabalho | None = None,
 ) -> int:
     if motorista_id and ajudante_id and motorista_id == ajudante_id:
         raise ValueError("Motorista e ajudante devem ser pessoas diferentes.")
@@ -982,9 +1516,10 @@ def salvar_carregamento(
     observacao_cor_db = observacao_cor.strip() if observacao_cor else None
     data_saida_db = data_saida or calcular_data_saida_carregamento(data_iso) or data_iso
     revisado_db = 1 if revisado else 0
+    duracao, inicio_viagem, fim_viagem = _dados_viagem(data_iso, data_saida_db, observacao_db, None)
 
-    with get_connection() as conn:
-        cur = conn.cursor()
+    with _transacao(transacao) as uow:
+        cur = uow.cursor()
         novo_id = insert_and_get_id(
             cur,
             """
@@ -998,9 +1533,12 @@ def salvar_carregamento(
                 observacao,
                 observacao_extra,
                 observacao_cor,
-                revisado
+                revisado,
+                duracao_efetiva,
+                data_inicio_viagem,
+                data_fim_viagem
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
             """,
             (
                 data_iso,
@@ -1013,10 +1551,13 @@ def salvar_carregamento(
                 observacao_extra_db,
                 observacao_cor_db,
                 revisado_db,
+                duracao,
+                inicio_viagem,
+                fim_viagem,
             ),
         )
-        conn.commit()
-        return novo_id
+        uow.apos_commit(_atualizar_indice, "carregamento_id", novo_id)
+    return novo_id
 
 
 def atualizar_carregamento(
@@ -1030,6 +1571,7 @@ def atualizar_carregamento(
     observacao: str,
     observacao_extra: str | None = None,
     observacao_cor: str | None = None,
+    transacao: UnidadeDeTrabalho | None = None,
 ) -> None:
     placa_db = placa.strip().upper() if placa else None
     observacao_db = observacao.strip() if observacao else None
@@ -1037,8 +1579,8 @@ def atualizar_carregamento(
     observacao_cor_db = observacao_cor.strip() if observacao_cor else None
     data_saida_db = data_saida or calcular_data_saida_carregamento(data_iso) or data_iso
     revisado_db = 1
-    with get_connection() as conn:
-        cur = conn.cursor()
+    with _transacao(transacao) as uow:
+        cur = uow.cursor()
         cur.execute(
             """
             UPDATE carregamentos
@@ -1068,7 +1610,8 @@ def atualizar_carregamento(
                 carregamento_id,
             ),
         )
-        conn.commit()
+        recalcular_viagens(cur, "car.id = ?", (carregamento_id,))
+        uow.apos_commit(_atualizar_indice, "carregamento_id", carregamento_id)
 
 
 def remover_carregamento(carregamento_id: int) -> None:
@@ -1076,61 +1619,225 @@ def remover_carregamento(carregamento_id: int) -> None:
         cur = conn.cursor()
         cur.execute("DELETE FROM carregamentos WHERE id = ?;", (carregamento_id,))
         conn.commit()
+    _atualizar_indice("carregamento_id", carregamento_id)
 
 
-def remover_carregamento_completo(carregamento_id: int) -> None:
-    with get_connection() as conn:
-        cur = conn.cursor()
+def remover_carregamento_completo(
+    carregamento_id: int,
+    transacao: UnidadeDeTrabalho | None = None,
+) -> None:
+    with _transacao(transacao) as uow, pipeline(uow.conn):
+        cur = uow.cursor()
         cur.execute("DELETE FROM bloqueios WHERE carregamento_id = ?;", (carregamento_id,))
         cur.execute("DELETE FROM ajustes_rotas WHERE carregamento_id = ?;", (carregamento_id,))
         cur.execute("DELETE FROM carregamentos WHERE id = ?;", (carregamento_id,))
-        conn.commit()
+        uow.apos_commit(_atualizar_indice, "carregamento_id", carregamento_id)
+
+
+# Operacoes compostas: cada uma em uma unica transacao.
+
+
+def salvar_carregamento_completo(
+    carregamento_id: int | None,
+    data_iso: str,
+    rota_texto: str,
+    placa: str | None,
+    motorista_id: int | None,
+    ajudante_id: int | None,
+    observacao: str,
+    observacao_extra: str | None = None,
+    observacao_cor: str | None = None,
+    data_saida: str | None = None,
+) -> int:
+    # Novo (carregamento_id None) ou edicao: grava o carregamento, suprime a rota
+    # antiga quando ela muda e refaz os bloqueios da equipe.
+    with unidade_de_trabalho() as transacao:
+        if carregamento_id:
+            anterior = obter_carregamento(carregamento_id, transacao=transacao)
+            atualizar_carregamento(
+                carregamento_id,
+                data_iso,
+                data_saida,
+                rota_texto,
+                placa,
+                motorista_id,
+                ajudante_id,
+                observacao,
+                observacao_extra,
+                observacao_cor,
+                transacao=transacao,
+            )
+            if anterior and anterior.get("rota") != rota_texto:
+                registrar_rota_suprimida(anterior.get("data"), anterior.get("rota"), transacao=transacao)
+            remover_bloqueios_por_carregamento(carregamento_id, transacao=transacao)
+        else:
+            carregamento_id = salvar_carregamento(
+                data_iso,
+                rota_texto,
+                placa,
+                motorista_id,
+                ajudante_id,
+                observacao,
+                observacao_extra,
+                observacao_cor,
+                data_saida,
+                revisado=True,
+                transacao=transacao,
+            )
+        criar_bloqueios_para_carregamento(
+            carregamento_id, data_iso, [motorista_id, ajudante_id], observacao, transacao=transacao
+        )
+    return carregamento_id
+
+
+def atualizar_colaboradores_carregamento(
+    carregamento_id: int,
+    motorista_id: int | None,
+    ajudante_id: int | None,
+) -> dict:
+    if motorista_id and ajudante_id and motorista_id == ajudante_id:
+        raise ValueError("Motorista e ajudante devem ser pessoas diferentes.")
+    with unidade_de_trabalho() as transacao:
+        registro = obter_carregamento(carregamento_id, transacao=transacao)
+        if not registro:
+            raise ValueError("Carregamento não encontrado.")
+        data_registro = registro.get("data") or date.today().isoformat()
+        observacao = (registro.get("observacao") or "0").strip() or "0"
+        atualizar_carregamento(
+            carregamento_id,
+            data_registro,
+            registro.get("data_saida"),
+            registro.get("rota") or "",
+            registro.get("placa"),
+            motorista_id,
+            ajudante_id,
+            observacao,
+            registro.get("observacao_extra"),
+            registro.get("observacao_cor"),
+            transacao=transacao,
+        )
+        remover_bloqueios_por_carregamento(carregamento_id, transacao=transacao)
+        criar_bloqueios_para_carregamento(
+            carregamento_id, data_registro, [motorista_id, ajudante_id], observacao, transacao=transacao
+        )
+    return registro
+
+
+def excluir_carregamento_completo(carregamento_id: int, suprimir_rota: bool = True) -> dict | None:
+    # Suprimir a rota impede que o preenchimento automatico recrie o carregamento.
+    with unidade_de_trabalho() as transacao:
+        registro = obter_carregamento(carregamento_id, transacao=transacao)
+        with pipeline(transacao.conn):
+            if registro and suprimir_rota:
+                registrar_rota_suprimida(registro.get("data"), registro.get("rota"), transacao=transacao)
+            remover_carregamento_completo(carregamento_id, transacao=transacao)
+    return registro
+
+
+_SQL_CARREGAMENTOS_DIA = statement(
+    "carregamentos_dia",
+    """
+    SELECT car.id,
+           car.data,
+           car.data_saida,
+           car.rota,
+           car.placa,
+           car.observacao,
+           car.observacao_extra,
+           car.observacao_cor,
+           car.revisado,
+           car.motorista_id,
+           car.ajudante_id,
+           mot.nome AS motorista_nome,
+           aj.nome AS ajudante_nome,
+           aj.funcao AS ajudante_funcao
+    FROM carregamentos car
+    LEFT JOIN colaboradores mot ON mot.id = car.motorista_id
+    LEFT JOIN colaboradores aj ON aj.id = car.ajudante_id
+    WHERE car.data = ?
+    ORDER BY car.rota ASC, car.id ASC;
+    """,
+)
+_SQL_CARREGAMENTO_POR_ID = statement(
+    "carregamento_por_id",
+    """
+    SELECT car.*, mot.nome AS motorista_nome, aj.nome AS ajudante_nome, aj.funcao AS ajudante_funcao
+    FROM carregamentos car
+    LEFT JOIN colaboradores mot ON mot.id = car.motorista_id
+    LEFT JOIN colaboradores aj ON aj.id = car.ajudante_id
+    WHERE car.id = ?;
+    """,
+)
+_SQL_EQUIPE_ATIVA = statement(
+    "equipe_ativa",
+    """
+    SELECT id, nome, funcao, observacao, foto
+    FROM colaboradores
+    WHERE ativo = 1 AND lower(funcao) IN ('motorista', 'ajudante')
+    ORDER BY nome;
+    """,
+)
+_SQL_CAMINHOES_ATIVOS = statement(
+    "caminhoes_ativos",
+    "SELECT id, placa, modelo, observacao, ativo FROM caminhoes WHERE ativo = 1 ORDER BY placa;",
+)
 
 
 def listar_carregamentos(data_iso: str) -> list[dict]:
     with get_connection(dict_rows=True) as conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT car.id,
-                   car.data,
-                   car.data_saida,
-                   car.rota,
-                   car.placa,
-                   car.observacao,
-                   car.observacao_extra,
-                   car.observacao_cor,
-                   car.revisado,
-                   car.motorista_id,
-                   car.ajudante_id,
-                   mot.nome AS motorista_nome,
-                   aj.nome AS ajudante_nome
-            FROM carregamentos car
-            LEFT JOIN colaboradores mot ON mot.id = car.motorista_id
-            LEFT JOIN colaboradores aj ON aj.id = car.ajudante_id
-            WHERE car.data = ?
-            ORDER BY car.rota ASC, car.id ASC;
-            """,
-            (data_iso,),
-        )
+        cur.execute(_SQL_CARREGAMENTOS_DIA, (data_iso,))
         return [dict(row) for row in cur.fetchall()]
 
 
-def obter_carregamento(carregamento_id: int) -> dict | None:
-    with get_connection(dict_rows=True) as conn:
+def obter_carregamento(
+    carregamento_id: int,
+    transacao: UnidadeDeTrabalho | None = None,
+) -> dict | None:
+    with _transacao(transacao) as uow:
+        rows = _fetch_dicts(uow.cursor(), _SQL_CARREGAMENTO_POR_ID, (carregamento_id,))
+    return rows[0] if rows else None
+
+
+@dataclass
+class PacoteDia:
+    data_iso: str
+    carregamentos: list[dict] = field(default_factory=list)
+    motoristas: list[dict] = field(default_factory=list)
+    ajudantes: list[dict] = field(default_factory=list)
+    caminhoes: list[dict] = field(default_factory=list)
+    disponibilidade: dict[str, set[Any]] = field(default_factory=dict)
+
+    def carregamento(self, carregamento_id: int | None) -> dict | None:
+        for item in self.carregamentos:
+            if carregamento_id and item.get("id") == carregamento_id:
+                return dict(item)
+        return None
+
+    def motoristas_disponiveis(self) -> list[dict]:
+        indisponiveis = self.disponibilidade.get("motoristas", set())
+        return [col for col in self.motoristas if col["id"] not in indisponiveis]
+
+    def ajudantes_disponiveis(self) -> list[dict]:
+        indisponiveis = self.disponibilidade.get("ajudantes", set())
+        return [col for col in self.ajudantes if col["id"] not in indisponiveis]
+
+
+def carregar_pacote_dia(data_iso: str) -> PacoteDia:
+    # Tudo o que a pagina de carregamentos usa para uma data, em uma conexao/transacao.
+    pacote = PacoteDia(data_iso=data_iso)
+    with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT car.*, mot.nome AS motorista_nome, aj.nome AS ajudante_nome
-            FROM carregamentos car
-            LEFT JOIN colaboradores mot ON mot.id = car.motorista_id
-            LEFT JOIN colaboradores aj ON aj.id = car.ajudante_id
-            WHERE car.id = ?;
-            """,
-            (carregamento_id,),
-        )
-        row = cur.fetchone()
-        return dict(row) if row else None
+        pacote.carregamentos = _fetch_dicts(cur, _SQL_CARREGAMENTOS_DIA, (data_iso,))
+        for col in _fetch_dicts(cur, _SQL_EQUIPE_ATIVA):
+            col["foto"] = col.get("foto") or None
+            destino = pacote.motoristas if col["funcao"].lower() == "motorista" else pacote.ajudantes
+            destino.append(col)
+        pacote.caminhoes = _fetch_dicts(cur, _SQL_CAMINHOES_ATIVOS)
+        # Pelo cursor (sem o indice em memoria): a disponibilidade ve o mesmo banco
+        # que o resto do pacote, inclusive escritas de outros processos.
+        pacote.disponibilidade = _verificar_disponibilidade(cur, data_iso, usar_indice=False)
+    return pacote
 
 
 def duplicar_carregamento(carregamento_id: int) -> int:
@@ -1198,7 +1905,7 @@ def salvar_oficina(
     data_saida: str | None = None,
     observacao_cor: str | None = None,
 ) -> int:
-    disponibilidade = verificar_disponibilidade(data_iso)
+    disponibilidade = verificar_disponibilidade(data_iso, usar_indice=False)
     indis_colaboradores = disponibilidade.get("motoristas", set()).union(
         disponibilidade.get("ajudantes", set())
     )
@@ -1233,30 +1940,34 @@ def salvar_oficina(
             ),
         )
         conn.commit()
-        return novo_id
+    _atualizar_indice("oficina_id", novo_id)
+    return novo_id
+
+
+_SQL_OFICINAS_DIA = statement(
+    "oficinas_dia",
+    """
+    SELECT ofi.id,
+           ofi.data,
+           ofi.motorista_id,
+           ofi.placa,
+           ofi.observacao,
+           ofi.observacao_extra,
+           ofi.data_saida,
+           ofi.observacao_cor,
+           col.nome AS motorista_nome
+    FROM oficinas ofi
+    LEFT JOIN colaboradores col ON col.id = ofi.motorista_id
+    WHERE ofi.data = ?
+    ORDER BY ofi.id ASC;
+    """,
+)
 
 
 def listar_oficinas(data_iso: str) -> list[dict]:
     with get_connection(dict_rows=True) as conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT ofi.id,
-                   ofi.data,
-                   ofi.motorista_id,
-                   ofi.placa,
-                   ofi.observacao,
-                   ofi.observacao_extra,
-                   ofi.data_saida,
-                   ofi.observacao_cor,
-                   col.nome AS motorista_nome
-            FROM oficinas ofi
-            LEFT JOIN colaboradores col ON col.id = ofi.motorista_id
-            WHERE ofi.data = ?
-            ORDER BY ofi.id ASC;
-            """,
-            (data_iso,),
-        )
+        cur.execute(_SQL_OFICINAS_DIA, (data_iso,))
         return [dict(row) for row in cur.fetchall()]
 
 
@@ -1329,6 +2040,7 @@ def editar_oficina(
             ),
         )
         conn.commit()
+    _atualizar_indice("oficina_id", oficina_id)
 
 
 def excluir_oficina(oficina_id: int) -> None:
@@ -1336,6 +2048,7 @@ def excluir_oficina(oficina_id: int) -> None:
         cur = conn.cursor()
         cur.execute("DELETE FROM oficinas WHERE id = ?;", (oficina_id,))
         conn.commit()
+    _atualizar_indice("oficina_id", oficina_id)
 
 
 # Rotas semanais
@@ -1456,18 +2169,20 @@ def listar_rotas_suprimidas(data_iso: str | None) -> set[str]:
         return {row[0] for row in cur.fetchall()}
 
 
-def registrar_rota_suprimida(data_iso: str | None, rota_texto: str | None) -> None:
+def registrar_rota_suprimida(
+    data_iso: str | None,
+    rota_texto: str | None,
+    transacao: UnidadeDeTrabalho | None = None,
+) -> None:
     data_base = _normalizar_data_iso(data_iso)
     rota = (rota_texto or "").strip()
     if not data_base or not rota:
         return
-    with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
+    with _transacao(transacao) as uow:
+        uow.cursor().execute(
             "INSERT OR IGNORE INTO rotas_suprimidas (data, rota) VALUES (?, ?);",
             (data_base, rota),
         )
-        conn.commit()
 
 
 def limpar_rotas_suprimidas(data_iso: str | None) -> None:
@@ -1485,38 +2200,116 @@ def preencher_carregamentos_automaticos(data_iso: str, data_saida_iso: str | Non
     if not data_base:
         return 0
     data_saida_iso = _normalizar_data_iso(data_saida_iso)
-    rotas_suprimidas = listar_rotas_suprimidas(data_base)
-    rotas = listar_rotas_para_data(data_base)
-    if not rotas:
-        return 0
-    inseridos = 0
-    for rota in rotas:
-        texto_rota = (rota.get("rota") or "").strip()
-        if not texto_rota:
-            continue
-        destino = (rota.get("destino") or "").strip()
-        if destino:
-            texto_rota = f"{texto_rota} - {destino}"
-        if texto_rota in rotas_suprimidas:
-            continue
-        if carregamento_existe_para_rota(data_base, texto_rota):
-            continue
-        observacao_extra = (rota.get("observacao") or "").strip() or None
-        try:
-            salvar_carregamento(
-                data_base,
-                texto_rota,
-                None,
-                None,
-                None,
-                OBSERVACAO_OPCOES[0],
-                observacao_extra=observacao_extra,
-                data_saida=data_saida_iso,
-                revisado=False,
+    with get_connection() as conn:
+        inseridos = _inserir_rotas_semanais(conn, [data_base], data_saida_iso)
+        conn.commit()
+    if inseridos[data_base]:
+        _atualizar_indice_carregamentos_periodo(data_base, data_base)
+    return inseridos[data_base]
+
+
+def pre_gerar_carregamentos(inicio: str, fim: str | None = None) -> dict[str, int]:
+    # Gera as rotas semanais de todo o periodo em uma transacao, com a saida
+    # padrao de cada dia. Devolve {data_iso: inseridos}.
+    data_inicio = parse_date(inicio or "")
+    data_fim = parse_date(fim or "") if fim else data_inicio
+    if not data_inicio or not data_fim:
+        raise ValueError("Informe datas validas (AAAA-MM-DD ou DD/MM/AAAA).")
+    if data_fim < data_inicio:
+        raise ValueError("Data final anterior a data inicial.")
+    total_dias = (data_fim - data_inicio).days + 1
+    if total_dias > MAX_DIAS_PRE_GERACAO:
+        raise ValueError(f"Periodo maximo de {MAX_DIAS_PRE_GERACAO} dias.")
+    datas = [(data_inicio + timedelta(days=pos)).isoformat() for pos in range(total_dias)]
+    with get_connection() as conn:
+        inseridos = _inserir_rotas_semanais(conn, datas)
+        conn.commit()
+    if any(inseridos.values()):
+        _atualizar_indice_carregamentos_periodo(datas[0], datas[-1])
+    return inseridos
+
+
+def _inserir_rotas_semanais(conn, datas: list[str], data_saida_iso: str | None = None) -> dict[str, int]:
+    # Conjunto: rotas semanais dos dias, rotas ja lancadas e suprimidas em uma
+    # consulta cada, depois um INSERT multi-linha. O lock por data impede que dois
+    # despachantes abrindo o mesmo dia vazio dupliquem rotas (placa NULL escapa do
+    # UNIQUE(data, rota, placa)).
+    inseridos = {data_iso: 0 for data_iso in datas}
+    if not datas:
+        return inseridos
+    datas = sorted(set(datas))
+    for data_iso in datas:
+        lock_transaction(conn, _LOCK_ROTAS_SEMANAIS, date.fromisoformat(data_iso).toordinal())
+    cur = conn.cursor()
+    dias_semana = {data_iso: obter_dia_semana_por_data(data_iso) for data_iso in datas}
+    marcadores = ", ".join("?" for _ in set(dias_semana.values()))
+    rotas_por_dia: dict[str, list[tuple]] = {}
+    for dia, rota, destino, observacao in _safe_fetch(
+        cur,
+        f"""
+        SELECT dia_semana, rota, destino, observacao
+        FROM rotas_semanais
+        WHERE dia_semana IN ({marcadores})
+        ORDER BY LOWER(rota) ASC;
+        """,
+        tuple(set(dias_semana.values())),
+    ):
+        rotas_por_dia.setdefault(dia, []).append((rota, destino, observacao))
+    if not rotas_por_dia:
+        return inseridos
+
+    periodo = (datas[0], datas[-1])
+    existentes = set(
+        _safe_fetch(cur, "SELECT data, rota FROM carregamentos WHERE data BETWEEN ? AND ?;", periodo)
+    )
+    existentes.update(
+        _safe_fetch(cur, "SELECT data, rota FROM rotas_suprimidas WHERE data BETWEEN ? AND ?;", periodo)
+    )
+
+    linhas: list[tuple] = []
+    for data_iso in datas:
+        data_saida_db = data_saida_iso or calcular_data_saida_carregamento(data_iso) or data_iso
+        for rota, destino, observacao in rotas_por_dia.get(dias_semana[data_iso], []):
+            texto_rota = (rota or "").strip()
+            if not texto_rota:
+                continue
+            destino = (destino or "").strip()
+            if destino:
+                texto_rota = f"{texto_rota} - {destino}"
+            if (data_iso, texto_rota) in existentes:
+                continue
+            existentes.add((data_iso, texto_rota))
+            observacao_extra = (observacao or "").strip() or None
+            linhas.append(
+                (data_iso, data_saida_db, texto_rota, OBSERVACAO_OPCOES[0], observacao_extra)
+                + _dados_viagem(data_iso, data_saida_db, OBSERVACAO_OPCOES[0], None)
             )
-            inseridos += 1
-        except DBError:
-            continue
+            inseridos[data_iso] += 1
+
+    for inicio in range(0, len(linhas), _LOTE_INSERCAO):
+        lote = linhas[inicio : inicio + _LOTE_INSERCAO]
+        valores = ", ".join("(?, ?, ?, NULL, NULL, NULL, ?, ?, NULL, 0, ?, ?, ?)" for _ in lote)
+        cur.execute(
+            f"""
+            INSERT INTO carregamentos (
+                data,
+                data_saida,
+                rota,
+                placa,
+                motorista_id,
+                ajudante_id,
+                observacao,
+                observacao_extra,
+                observacao_cor,
+                revisado,
+                duracao_efetiva,
+                data_inicio_viagem,
+                data_fim_viagem
+            )
+            VALUES {valores};
+            """,
+            tuple(valor for linha in lote for valor in linha),
+        )
     return inseridos
 
 
@@ -1574,29 +2367,33 @@ def adicionar_escala_cd(data_iso: str, motorista_id: int | None, ajudante_id: in
             (data_iso, motorista_id, ajudante_id, observacao.strip()),
         )
         conn.commit()
-        return novo_id
+    _atualizar_indice("escala_cd_id", novo_id)
+    return novo_id
+
+
+_SQL_ESCALA_CD_DIA = statement(
+    "escala_cd_dia",
+    """
+    SELECT e.id,
+           e.data,
+           e.motorista_id,
+           e.ajudante_id,
+           e.observacao,
+           mot.nome AS motorista_nome,
+           aj.nome AS ajudante_nome
+    FROM escala_cd e
+    LEFT JOIN colaboradores mot ON mot.id = e.motorista_id
+    LEFT JOIN colaboradores aj ON aj.id = e.ajudante_id
+    WHERE e.data = ?
+    ORDER BY e.id ASC;
+    """,
+)
 
 
 def listar_escala_cd(data_iso: str) -> list[dict]:
     with get_connection(dict_rows=True) as conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT e.id,
-                   e.data,
-                   e.motorista_id,
-                   e.ajudante_id,
-                   e.observacao,
-                   mot.nome AS motorista_nome,
-                   aj.nome AS ajudante_nome
-            FROM escala_cd e
-            LEFT JOIN colaboradores mot ON mot.id = e.motorista_id
-            LEFT JOIN colaboradores aj ON aj.id = e.ajudante_id
-            WHERE e.data = ?
-            ORDER BY e.id ASC;
-            """,
-            (data_iso,),
-        )
+        cur.execute(_SQL_ESCALA_CD_DIA, (data_iso,))
         return [dict(row) for row in cur.fetchall()]
 
 
@@ -1629,6 +2426,7 @@ def editar_escala_cd(escala_id: int, motorista_id: int | None, ajudante_id: int
             (motorista_id, ajudante_id, observacao.strip(), escala_id),
         )
         conn.commit()
+    _atualizar_indice("escala_cd_id", escala_id)
 
 
 def excluir_escala_cd(escala_id: int) -> None:
@@ -1636,6 +2434,7 @@ def excluir_escala_cd(escala_id: int) -> None:
         cur = conn.cursor()
         cur.execute("DELETE FROM escala_cd WHERE id = ?;", (escala_id,))
         conn.commit()
+    _atualizar_indice("escala_cd_id", escala_id)
 
 # Ajustes e log
 
@@ -1690,7 +2489,9 @@ def registrar_ajuste_rota(
                 (observacao_ajuste or "").strip() or None,
             ),
         )
+        recalcular_viagens(cur, "car.id = ?", (carregamento_id,))
         conn.commit()
+    _atualizar_indice("carregamento_id", carregamento_id)
 
 
 def atualizar_bloqueios_para_ajuste(
@@ -1714,7 +2515,9 @@ def remover_ajustes_por_carregamento(carregamento_id: int) -> None:
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute("DELETE FROM ajustes_rotas WHERE carregamento_id = ?;", (carregamento_id,))
+        recalcular_viagens(cur, "car.id = ?", (carregamento_id,))
         conn.commit()
+    _atualizar_indice("carregamento_id", carregamento_id)
 
 
 def montar_resumo_ajustes(duracao_planejada: int, ajustes: list[dict]) -> str:
@@ -1735,9 +2538,66 @@ def montar_resumo_ajustes(duracao_planejada: int, ajustes: list[dict]) -> str:
     return resumo
 
 
-def consultar_log_carregamentos(filtros: dict) -> list[dict]:
-    query = [
-        """
+# Status do LOG sobre as colunas de viagem gravadas no carregamento. Ajuste
+# com duracao <= 0 finaliza a rota na hora, mesmo antes da saida.
+_SQL_LOG_EM_ANDAMENTO = (
+    "(car.data_fim_viagem > ? AND (car.duracao_efetiva > 0 OR NOT EXISTS "
+    "(SELECT 1 FROM ajustes_rotas a WHERE a.carregamento_id = car.id)))"
+)
+# Linhas sem placa, motorista e ajudante vao para o fim quando o filtro e "Em andamento".
+_SQL_LOG_VAZIO = (
+    "(CASE WHEN COALESCE(car.placa, '') = '' AND COALESCE(mot.nome, '') = '' "
+    "AND COALESCE(aj.nome, '') = '' THEN 1 ELSE 0 END)"
+)
+_SQL_LOG_FROM = """
+    FROM carregamentos car
+    LEFT JOIN colaboradores mot ON mot.id = car.motorista_id
+    LEFT JOIN colaboradores aj ON aj.id = car.ajudante_id
+"""
+
+
+def _filtros_log_sql(filtros: dict) -> tuple[list[str], list]:
+    condicoes = ["1 = 1"]
+    params: list = []
+    if filtros.get("data_inicio"):
+        condicoes.append("car.data >= ?")
+        params.append(filtros["data_inicio"])
+    if filtros.get("data_fim"):
+        condicoes.append("car.data <= ?")
+        params.append(filtros["data_fim"])
+    if filtros.get("motorista_id"):
+        condicoes.append("car.motorista_id = ?")
+        params.append(filtros["motorista_id"])
+    if filtros.get("placa"):
+        condicoes.append("UPPER(car.placa) = ?")
+        params.append(filtros["placa"].upper())
+    status_filtro = filtros.get("status")
+    if status_filtro == "Em andamento":
+        condicoes.append(_SQL_LOG_EM_ANDAMENTO)
+        params.append(date.today().isoformat())
+    elif status_filtro == "Finalizados":
+        condicoes.append(f"NOT {_SQL_LOG_EM_ANDAMENTO}")
+        params.append(date.today().isoformat())
+    return condicoes, params
+
+
+def _consultar_log(filtros: dict, limite: int | None = None, apos: tuple | None = None) -> list[dict]:
+    condicoes, params = _filtros_log_sql(filtros)
+    vazio_primeiro = filtros.get("status") == "Em andamento"
+    if apos:
+        # Keyset: continua depois da ultima linha da pagina anterior.
+        vazio, data_ultima, id_ultimo = apos
+        condicao = "(car.data < ? OR (car.data = ? AND car.id < ?))"
+        valores = [data_ultima, data_ultima, id_ultimo]
+        if vazio_primeiro:
+            condicao = f"({_SQL_LOG_VAZIO} > ? OR ({_SQL_LOG_VAZIO} = ? AND {condicao}))"
+            valores = [vazio, vazio] + valores
+        condicoes.append(condicao)
+        params.extend(valores)
+    ordem = "car.data DESC, car.id DESC"
+    if vazio_primeiro:
+        ordem = f"{_SQL_LOG_VAZIO} ASC, {ordem}"
+    query = f"""
         SELECT car.id,
                car.data,
                car.data_saida,
@@ -1747,114 +2607,128 @@ def consultar_log_carregamentos(filtros: dict) -> list[dict]:
                car.observacao_extra,
                car.motorista_id,
                car.ajudante_id,
+               car.duracao_efetiva,
+               car.data_inicio_viagem,
+               car.data_fim_viagem,
                mot.nome AS motorista_nome,
-               aj.nome AS ajudante_nome
-        FROM carregamentos car
-        LEFT JOIN colaboradores mot ON mot.id = car.motorista_id
-        LEFT JOIN colaboradores aj ON aj.id = car.ajudante_id
-        WHERE 1 = 1
-        """
-    ]
-    params: list = []
-    if filtros.get("data_inicio"):
-        query.append("AND car.data >= ?")
-        params.append(filtros["data_inicio"])
-    if filtros.get("data_fim"):
-        query.append("AND car.data <= ?")
-        params.append(filtros["data_fim"])
-    if filtros.get("motorista_id"):
-        query.append("AND car.motorista_id = ?")
-        params.append(filtros["motorista_id"])
-    if filtros.get("placa"):
-        query.append("AND UPPER(car.placa) = ?")
-        params.append(filtros["placa"].upper())
-    query.append("ORDER BY car.data DESC, car.id DESC")
+               aj.nome AS ajudante_nome,
+               aj.funcao AS ajudante_funcao,
+               {_SQL_LOG_VAZIO} AS vazio_ordem
+        {_SQL_LOG_FROM}
+        WHERE {" AND ".join(condicoes)}
+        ORDER BY {ordem}
+    """
+    if limite:
+        query += " LIMIT ?"
+        params.append(limite)
 
     with get_connection(dict_rows=True) as conn:
         cur = conn.cursor()
-        cur.execute(" ".join(query), tuple(params))
+        cur.execute(query, tuple(params))
         registros = [dict(row) for row in cur.fetchall()]
 
     ajustes_map = listar_ajustes_por_carregamentos([reg["id"] for reg in registros])
     hoje = date.today()
     resultado: list[dict] = []
-
     for registro in registros:
-        observacao_padrao = (registro.get("observacao") or "0").strip()
-        duracao_planejada = OBSERVACAO_DURACAO.get(observacao_padrao, 0)
-        ajustes = ajustes_map.get(registro["id"], [])
-        duracao_efetiva = ajustes[-1]["duracao_nova"] if ajustes else duracao_planejada
-        data_inicio_iso = obter_data_saida_registro(registro)
-        try:
-            data_inicio_dt = datetime.strptime(data_inicio_iso, "%Y-%m-%d").date()
-        except ValueError:
-            data_inicio_dt = hoje
-            data_inicio_iso = hoje.isoformat()
-        data_fim_dt = data_inicio_dt + timedelta(days=duracao_efetiva)
-        data_fim_iso = data_fim_dt.isoformat()
-
-        finalizado_manual = bool(ajustes) and duracao_efetiva <= 0
-        if finalizado_manual:
-            status = "Finalizado"
-        elif hoje < data_inicio_dt:
-            status = "Em andamento"
-        elif hoje < data_fim_dt:
-            status = "Em andamento"
-        else:
-            status = "Finalizado"
+        item = _montar_registro_log(registro, ajustes_map.get(registro["id"], []), hoje)
+        item["cursor"] = (registro["vazio_ordem"], registro["data"], registro["id"])
+        resultado.append(item)
+    return resultado
 
-        status_filtro = filtros.get("status")
-        if status_filtro and status_filtro != "Todos":
-            if status_filtro == "Em andamento" and status != "Em andamento":
-                continue
-            if status_filtro == "Finalizados" and status != "Finalizado":
-                continue
 
-        restante = max((data_fim_dt - hoje).days, 0)
-        andamento_texto = ""
-        if status == "Em andamento":
-            if restante > 0:
-                andamento_texto = f"{observacao_padrao or 'ROTA'} - faltando {restante}"
-            else:
-                andamento_texto = f"{observacao_padrao or 'ROTA'} - retorna hoje"
-
-        ajudante_nome = formatar_ajudante_nome(
-            registro.get("ajudante_nome") or DISPLAY_VAZIO,
-            registro.get("ajudante_id"),
-        )
-        placa_valor = (registro.get("placa") or "").upper() or DISPLAY_VAZIO
-        motorista_valor = registro.get("motorista_nome") or DISPLAY_VAZIO
-        tem_dados = any(
-            valor and valor != DISPLAY_VAZIO for valor in (placa_valor, motorista_valor, ajudante_nome)
-        )
-        resultado.append(
-            {
-                "id": registro["id"],
-                "data": registro.get("data"),
-                "data_br": data_iso_para_br(registro.get("data")),
-                "data_saida": data_inicio_iso,
-                "data_saida_br": data_iso_para_br(data_inicio_iso),
-                "data_fim": data_fim_iso,
-                "data_fim_br": data_iso_para_br(data_fim_iso),
-                "rota": registro.get("rota") or DISPLAY_VAZIO,
-                "placa": placa_valor,
-                "motorista": motorista_valor,
-                "ajudante": ajudante_nome,
-                "motorista_id": registro.get("motorista_id"),
-                "ajudante_id": registro.get("ajudante_id"),
-                "observacao": observacao_padrao,
-                "duracao_planejada": duracao_planejada,
-                "duracao_efetiva": duracao_efetiva,
-                "status": status,
-                "status_texto": andamento_texto if status == "Em andamento" else "",
-                "resumo": montar_resumo_ajustes(duracao_planejada, ajustes),
-                "ajustes": ajustes,
-                "log_vazio": not tem_dados,
-            }
-        )
+def consultar_log_carregamentos(filtros: dict) -> list[dict]:
+    return _consultar_log(filtros)
 
-    if filtros.get("status") == "Em andamento":
-        resultado.sort(key=lambda item: item.get("log_vazio", False))
 
-    return resultado
+def contar_log_carregamentos(filtros: dict) -> int:
+    condicoes, params = _filtros_log_sql(filtros)
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) {_SQL_LOG_FROM} WHERE {' AND '.join(condicoes)}", tuple(params))
+        row = cur.fetchone()
+    return int(row[0] or 0) if row else 0
+
+
+def consultar_log_carregamentos_pagina(
+    filtros: dict,
+    apos: tuple | None = None,
+    limite: int = LOG_PAGINA_TAMANHO,
+) -> dict:
+    # Pagina do LOG por keyset em (data, id). `proximo` e o cursor da pagina
+    # seguinte (None na ultima); `total` conta todas as linhas do filtro.
+    registros = _consultar_log(filtros, limite + 1, apos)
+    proximo = None
+    if len(registros) > limite:
+        registros = registros[:limite]
+        proximo = registros[-1]["cursor"]
+    return {
+        "registros": registros,
+        "total": contar_log_carregamentos(filtros),
+        "proximo": proximo,
+    }
+
+
+def _montar_registro_log(registro: dict, ajustes: list[dict], hoje: date) -> dict:
+    observacao_padrao = (registro.get("observacao") or "0").strip()
+    duracao_planejada = OBSERVACAO_DURACAO.get(observacao_padrao, 0)
+    duracao_efetiva = registro.get("duracao_efetiva")
+    if duracao_efetiva is None:
+        duracao_efetiva = duracao_planejada
+    data_inicio_dt = parse_date(registro.get("data_inicio_viagem")) or hoje
+    data_fim_dt = parse_date(registro.get("data_fim_viagem")) or data_inicio_dt + timedelta(days=duracao_efetiva)
+    data_inicio_iso = data_inicio_dt.isoformat()
+    data_fim_iso = data_fim_dt.isoformat()
+
+    finalizado_manual = bool(ajustes) and duracao_efetiva <= 0
+    if finalizado_manual:
+        status = "Finalizado"
+    elif hoje < data_inicio_dt:
+        status = "Em andamento"
+    elif hoje < data_fim_dt:
+        status = "Em andamento"
+    else:
+        status = "Finalizado"
+
+    restante = max((data_fim_dt - hoje).days, 0)
+    andamento_texto = ""
+    if status == "Em andamento":
+        if restante > 0:
+            andamento_texto = f"{observacao_padrao or 'ROTA'} - faltando {restante}"
+        else:
+            andamento_texto = f"{observacao_padrao or 'ROTA'} - retorna hoje"
+
+    ajudante_nome = formatar_ajudante_nome(
+        registro.get("ajudante_nome") or DISPLAY_VAZIO,
+        registro.get("ajudante_id"),
+        registro.get("ajudante_funcao") or "",
+    )
+    placa_valor = (registro.get("placa") or "").upper() or DISPLAY_VAZIO
+    motorista_valor = registro.get("motorista_nome") or DISPLAY_VAZIO
+    tem_dados = any(
+        valor and valor != DISPLAY_VAZIO for valor in (placa_valor, motorista_valor, ajudante_nome)
+    )
+    return {
+        "id": registro["id"],
+        "data": registro.get("data"),
+        "data_br": data_iso_para_br(registro.get("data")),
+        "data_saida": data_inicio_iso,
+        "data_saida_br": data_iso_para_br(data_inicio_iso),
+        "data_fim": data_fim_iso,
+        "data_fim_br": data_iso_para_br(data_fim_iso),
+        "rota": registro.get("rota") or DISPLAY_VAZIO,
+        "placa": placa_valor,
+        "motorista": motorista_valor,
+        "ajudante": ajudante_nome,
+        "motorista_id": registro.get("motorista_id"),
+        "ajudante_id": registro.get("ajudante_id"),
+        "observacao": observacao_padrao,
+        "duracao_planejada": duracao_planejada,
+        "duracao_efetiva": duracao_efetiva,
+        "status": status,
+        "status_texto": andamento_texto if status == "Em andamento" else "",
+        "resumo": montar_resumo_ajustes(duracao_planejada, ajustes),
+        "ajustes": ajustes,
+        "log_vazio": not tem_dados,
+    }
 
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from . import services as svc
+from .db import fetch_all_async, run_in_thread
+
+# Versoes assincronas das listagens e da disponibilidade. As consultas de uma
+# pagina rodam juntas (cada uma com sua conexao) e a espera fica limitada pela
+# mais lenta. O SQL e o tratamento das linhas sao os mesmos de services.
+
+
+def _com_foto(colaboradores: list[dict]) -> list[dict]:
+    for col in colaboradores:
+        col["foto"] = col.get("foto") or None
+    return colaboradores
+
+
+async def listar_carregamentos(data_iso: str) -> list[dict]:
+    return await fetch_all_async(svc._SQL_CARREGAMENTOS_DIA, (data_iso,), dict_rows=True)
+
+
+async def listar_folgas(data_iso: str) -> list[dict]:
+    return await fetch_all_async(svc._SQL_FOLGAS_DIA, (data_iso,), dict_rows=True)
+
+
+async def listar_oficinas(data_iso: str) -> list[dict]:
+    return await fetch_all_async(svc._SQL_OFICINAS_DIA, (data_iso,), dict_rows=True)
+
+
+async def listar_escala_cd(data_iso: str) -> list[dict]:
+    return await fetch_all_async(svc._SQL_ESCALA_CD_DIA, (data_iso,), dict_rows=True)
+
+
+async def listar_caminhoes_ativos() -> list[dict]:
+    return await fetch_all_async(svc._SQL_CAMINHOES_ATIVOS, dict_rows=True)
+
+
+async def listar_colaboradores_por_funcao(
+    funcao: str,
+    data_iso: str | None = None,
+    ignorar: dict[str, int] | None = None,
+) -> list[dict]:
+    consulta = fetch_all_async(svc._SQL_COLABORADORES_FUNCAO, (funcao.lower(),), dict_rows=True)
+    if not data_iso:
+        return _com_foto(await consulta)
+
+    colaboradores, disponibilidade = await asyncio.gather(
+        consulta,
+        verificar_disponibilidade(data_iso, ignorar),
+    )
+    chave = "motoristas" if funcao.lower().startswith("motor") else "ajudantes"
+    indisponiveis = disponibilidade.get(chave, set())
+    return [col for col in _com_foto(colaboradores) if col["id"] not in indisponiveis]
+
+
+async def verificar_disponibilidade(data_iso: str, ignorar: dict[str, int] | None = None) -> dict[str, set[Any]]:
+    resultado: dict[str, set[Any]] = {
+        "motoristas": set(),
+        "ajudantes": set(),
+        "caminhoes": set(),
+    }
+    data_iso = (data_iso or "").strip()
+    alvo = svc.parse_date(data_iso)
+    if not alvo:
+        return resultado
+
+    ignorar = ignorar or {}
+    alvo_iso = alvo.isoformat()
+    # A primeira consulta ao indice pode carrega-lo do banco: fora do loop.
+    if data_iso == alvo_iso and await run_in_thread(svc._disponibilidade_pelo_indice, alvo, ignorar, resultado):
+        return resultado
+
+    linhas = await asyncio.gather(
+        *(fetch_all_async(query, params) for query, params in svc._consultas_indisponiveis(alvo_iso, data_iso))
+    )
+    svc._aplicar_indisponiveis(linhas, ignorar, resultado)
+    return resultado
+
+
+async def carregar_pacote_dia(data_iso: str) -> svc.PacoteDia:
+    # Mesmo conteudo de services.carregar_pacote_dia, com as consultas em paralelo
+    # (sem a transacao unica: cada consulta ve o banco no proprio instante). A
+    # pagina Carregamentos usa a versao sincrona, que precisa do retrato unico.
+    carregamentos, equipe, caminhoes, disponibilidade = await asyncio.gather(
+        listar_carregamentos(data_iso),
+        fetch_all_async(svc._SQL_EQUIPE_ATIVA, dict_rows=True),
+        listar_caminhoes_ativos(),
+        verificar_disponibilidade(data_iso),
+    )
+    pacote = svc.PacoteDia(
+        data_iso=data_iso,
+        carregamentos=carregamentos,
+        caminhoes=caminhoes,
+        disponibilidade=disponibilidade,
+    )
+    for col in _com_foto(equipe):
+        destino = pacote.motoristas if col["funcao"].lower() == "motorista" else pacote.ajudantes
+        destino.append(col)
+    return pacote
+
+
+async def carregar_pagina_oficinas(data_iso: str, ignorar: dict[str, int] | None = None) -> dict[str, Any]:
+    registros, disponibilidade, motoristas, caminhoes = await asyncio.gather(
+        listar_oficinas(data_iso),
+        verificar_disponibilidade(data_iso, ignorar),
+        listar_colaboradores_por_funcao("Motorista"),
+        listar_caminhoes_ativos(),
+    )
+    return {
+        "registros": registros,
+        "disponibilidade": disponibilidade,
+        "motoristas": motoristas,
+        "caminhoes": caminhoes,
+    }